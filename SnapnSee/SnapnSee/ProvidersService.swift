@@ -8,6 +8,21 @@ struct ProviderResponse: Codable {
     let link: String?
 }
 
+// One NDJSON line from POST /api/v1/providers/batch
+struct ProviderBatchLine: Codable {
+    let mediaType: String
+    let mediaId: String
+    let statusCode: Int
+    let results: [String: ProviderResponse]?
+
+    enum CodingKeys: String, CodingKey {
+        case mediaType = "media_type"
+        case mediaId = "media_id"
+        case statusCode = "status_code"
+        case results
+    }
+}
+
 // Provider availability result
 enum ProviderAvailability {
     case loading
@@ -24,13 +39,66 @@ class ProvidersService {
     private var cache: [String: (providers: [String], timestamp: Date)] = [:]
     private let cacheExpiration: TimeInterval = 7 * 24 * 60 * 60  // 7 days
 
+    // In-flight watchlist prefetch; single fetches wait for it before hitting the network
+    private var prefetchTask: Task<Void, Never>?
+
     private init() {}
 
+    // Warm the cache for a whole watchlist with one batch request instead of one per row
+    func prefetchProviders(items: [(mediaId: String, mediaType: String)], country: String = "US") {
+        let missing = items.filter { getCachedProviders(mediaId: $0.mediaId) == nil }
+        guard !missing.isEmpty else { return }
+
+        prefetchTask = Task {
+            await fetchProvidersBatch(items: missing, country: country)
+        }
+    }
+
+    private func fetchProvidersBatch(items: [(mediaId: String, mediaType: String)], country: String) async {
+        guard let url = URL(string: "\(Config.API_BASE_URL)/api/v1/providers/batch") else { return }
+
+        var request = URLRequest(url: url)
+        request.httpMethod = "POST"
+        request.setValue("application/json", forHTTPHeaderField: "Content-Type")
+        let body: [String: Any] = [
+            "items": items.map { ["media_type": $0.mediaType, "media_id": $0.mediaId] },
+            "countries": [country]
+        ]
+        request.httpBody = try? JSONSerialization.data(withJSONObject: body)
+
+        do {
+            let (bytes, response) = try await URLSession.shared.bytes(for: request)
+            guard let httpResponse = response as? HTTPURLResponse, httpResponse.statusCode == 200 else {
+                return
+            }
+
+            // Results stream back one JSON object per line as the server resolves them
+            let decoder = JSONDecoder()
+            for try await line in bytes.lines {
+                guard let data = line.data(using: .utf8),
+                      let result = try? decoder.decode(ProviderBatchLine.self, from: data),
+                      result.statusCode == 200,
+                      let providerResponse = result.results?[country] else {
+                    continue
+                }
+                // Like single fetches, don't cache "not streaming anywhere" for 7 days; it may change any day
+                guard providerResponse.available, !providerResponse.providers.isEmpty else {
+                    continue
+                }
+                cacheProviders(mediaId: result.mediaId, providers: providerResponse.providers)
+            }
+        } catch {
+            print("Error prefetching providers: \(error)")
+        }
+    }
+
     // Fetch providers for a media item from our backend
     func fetchProviders(mediaId: String, mediaType: String, country: String = "US") async -> ProviderAvailability {
+        await prefetchTask?.value
+
         // Check cache first
         if let cached = getCachedProviders(mediaId: mediaId) {
-            return .available(cached)
+            return cached.isEmpty ? .unavailable : .available(cached)
         }
 
         // Build URL to our backend
@@ -123,6 +123,12 @@ struct WatchlistView: View {
             }
             .navigationTitle("My Watchlist")
         }
+        .task {
+            // One batch request for every row's providers
+            ProvidersService.shared.prefetchProviders(
+                items: watchlistManager.items.map { (mediaId: $0.id, mediaType: $0.mediaType) }
+            )
+        }
     }
 
     var emptyState: some View {
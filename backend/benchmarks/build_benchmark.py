@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Throughput of the embedding database build: the old sequential loop
+(sleep 0.3s per discover page, one poster download and one CLIP forward pass
+at a time) versus embedding_pipeline, plus a resumed rerun of the pipeline.
+
+Runs against the stub TMDB server. Without --clip, CLIP is replaced by a
+cost model (fixed cost per forward pass plus a cost per image, spent in
+time.sleep so it releases the GIL like torch does); with --clip the real
+ClipEmbedder is used and torch/transformers must be installed.
+
+Usage: python benchmarks/build_benchmark.py [--titles 100] [--tmdb-delay 0.05] [--clip]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import httpx
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.stub_upstreams import create_stub_app, free_port, run_in_thread
+from embedding_pipeline import EmbeddingPipeline, load_shard_keys, merge_shards
+
+
+class CostModelEmbedder:
+    """Stands in for ClipEmbedder: sleeps like a CPU forward pass, returns mean-colour vectors."""
+
+    def __init__(self, forward_ms: float, per_image_ms: float, dim: int = 512):
+        self.forward_ms = forward_ms
+        self.per_image_ms = per_image_ms
+        self.dim = dim
+
+    def embed_batch(self, images: list) -> np.ndarray:
+        time.sleep((self.forward_ms + self.per_image_ms * len(images)) / 1000)
+        colours = np.array([np.asarray(image.resize((8, 8))).mean(axis=(0, 1)) for image in images])
+        vectors = np.tile(colours, (1, self.dim // 3 + 1))[:, :self.dim] + 1.0
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def sequential_build(embedder, api_url: str, image_root: str, titles: int) -> int:
+    """The pre-pipeline builder loop, kept here as the baseline."""
+    embedded = 0
+    with httpx.Client(timeout=30.0) as http:
+        for media_type in ("tv", "movie"):
+            results, page = [], 1
+            while len(results) < titles:
+                data = http.get(f"{api_url}/discover/{media_type}", params={"page": page}).json()
+                if not data["results"]:
+                    break
+                results.extend(data["results"])
+                page += 1
+                time.sleep(0.3)
+            for item in results[:titles]:
+                poster = http.get(f"{image_root}/w500{item['poster_path']}").content
+                embedder.embed_batch([Image.open(BytesIO(poster)).convert("RGB")])
+                embedded += 1
+    return embedded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--titles", type=int, default=100, help="Titles per media type")
+    parser.add_argument("--tmdb-delay", type=float, default=0.05)
+    parser.add_argument("--forward-ms", type=float, default=40.0)
+    parser.add_argument("--per-image-ms", type=float, default=10.0)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--clip", action="store_true", help="Use the real CLIP model")
+    args = parser.parse_args()
+
+    stub = create_stub_app(tmdb_delay=args.tmdb_delay, catalogue_size=args.titles * 2)
+    port = free_port()
+    run_in_thread(stub, port)
+    api_url = f"http://127.0.0.1:{port}/3"
+    image_root = f"http://127.0.0.1:{port}/t/p"
+
+    if args.clip:
+        from embedding_search import ClipEmbedder
+        embedder = ClipEmbedder()
+    else:
+        embedder = CostModelEmbedder(args.forward_ms, args.per_image_ms)
+
+    start = time.perf_counter()
+    count = sequential_build(embedder, api_url, image_root, args.titles)
+    sequential_s = time.perf_counter() - start
+    print(f"sequential: {count} titles in {sequential_s:.1f}s ({count / sequential_s:.1f} titles/s)")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        def pipeline_run():
+            pipeline = EmbeddingPipeline(embedder, work_dir, api_url, image_root, api_key="stub",
+                                         batch_size=args.batch_size, report_every=60)
+            start = time.perf_counter()
+            asyncio.run(pipeline.run({"tv": args.titles, "movie": args.titles}))
+            return time.perf_counter() - start
+
+        posters_before = stub.state.calls["poster"]
+        pipeline_s = pipeline_run()
+        count = len(load_shard_keys(work_dir))
+        print(f"pipeline:   {count} titles in {pipeline_s:.1f}s ({count / pipeline_s:.1f} titles/s, "
+              f"{sequential_s / pipeline_s:.1f}x)")
+
+        # Resume after losing the last shard, as if the run had been killed mid-batch
+        shards = sorted(os.listdir(os.path.join(work_dir, "shards")))
+        os.remove(os.path.join(work_dir, "shards", shards[-1]))
+        lost = count - len(load_shard_keys(work_dir))
+        posters_mid = stub.state.calls["poster"]
+        resume_s = pipeline_run()
+        print(f"resume:     re-embedded {lost} titles in {resume_s:.1f}s with "
+              f"{stub.state.calls['poster'] - posters_mid} poster downloads "
+              f"(first run: {posters_mid - posters_before})")
+
+        output = os.path.join(work_dir, "movie_embeddings.npz")
+        print(f"merged:     {merge_shards(work_dir, output)} rows in {os.path.basename(output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Latency and cost of the recognition cascade (recognizer.py) with the default
+deadline (stages run one after another) and a tight one (stages start
+speculatively in parallel), against local stub upstreams.
+
+The CLIP and OCR stages are simulated with fixed latencies so the run needs
+no model or tesseract. Each upload is tagged so that one third is answered
+by CLIP, one third by OCR and one third only by GPT-4o Vision.
+
+Usage: python benchmarks/cascade_benchmark.py [--requests 30] [--deadline-ms 1200]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from io import BytesIO
+
+import httpx
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.stub_upstreams import create_stub_app, free_port, run_in_thread
+from text_match import TitleTrigramIndex
+
+KINDS = ("clip_embedding", "ocr_text", "gpt4o_vision")
+TAGS = {kind: tuple(250 if n == i else 0 for n in range(3)) for i, kind in enumerate(KINDS)}
+
+
+def tagged_png(kind: str, rng) -> bytes:
+    """Random noise (so the perceptual cache never hits) with a solid corner naming the stage that should answer."""
+    pixels = rng.integers(0, 256, size=(360, 640, 3), dtype=np.uint8)
+    pixels[:120, :120] = TAGS[kind]
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def answering_stage(image: Image.Image) -> str:
+    corner = image.getpixel((4, 4))
+    return KINDS[int(np.argmax(corner[:3]))]
+
+
+class SimulatedEmbedder:
+    def __init__(self, latency_ms: float):
+        self.latency_ms = latency_ms
+
+    def embed(self, image: Image.Image):
+        time.sleep(self.latency_ms / 1000)
+        return answering_stage(image)
+
+
+class SimulatedIndex:
+    def search(self, query, k: int = 5) -> list:
+        similarity = 0.95 if query == "clip_embedding" else 0.7
+        return [{"media_id": "66732", "media_type": "tv", "similarity": similarity}]
+
+
+class SimulatedOCR:
+    def __init__(self, latency_ms: float):
+        self.latency_ms = latency_ms
+
+    def read_lines(self, image: Image.Image) -> list:
+        time.sleep(self.latency_ms / 1000)
+        title = ["Stranger Things"] if answering_stage(image) == "ocr_text" else []
+        return ["Continue Watching", *title, "More Like This"]
+
+
+async def fire(base_url: str, uploads: list, deadline_ms: float = None) -> list:
+    params = {"deadline_ms": deadline_ms} if deadline_ms else {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+        results = []
+        for kind, body in uploads:
+            started = time.perf_counter()
+            response = await http.post("/api/v1/recognize", params=params,
+                                       files={"file": ("frame.png", body, "image/png")})
+            response.raise_for_status()
+            results.append((kind, (time.perf_counter() - started) * 1000, response.json()))
+        return results
+
+
+def summarize(label: str, results: list, vision_calls: int):
+    print(f"\n{label}: {len(results)} requests, {vision_calls} GPT-4o calls")
+    print(f"  {'answered by':<16}{'p50 ms':>9}{'p95 ms':>9}{'cost':>7}  decisions")
+    for kind in KINDS:
+        rows = [(ms, body) for k, ms, body in results if k == kind]
+        latencies = [ms for ms, _ in rows]
+        cost = np.mean([body["cascade"]["cost"] for _, body in rows])
+        decisions = Counter(
+            f"{entry['stage']}={entry['decision']}" for _, body in rows for entry in body["cascade"]["trace"]
+            if entry["decision"] not in ("not_run",)
+        )
+        wrong = sum(1 for _, body in rows if body["cascade"]["stage"] != kind)
+        print(f"  {kind:<16}{np.percentile(latencies, 50):>9.0f}{np.percentile(latencies, 95):>9.0f}"
+              f"{cost:>7.2f}  {dict(decisions)}{f'  ({wrong} answered elsewhere)' if wrong else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--openai-delay", type=float, default=1.0)
+    parser.add_argument("--tmdb-delay", type=float, default=0.05)
+    parser.add_argument("--clip-ms", type=float, default=80)
+    parser.add_argument("--ocr-ms", type=float, default=300)
+    parser.add_argument("--deadline-ms", type=float, default=1200, help="The tight deadline")
+    args = parser.parse_args()
+
+    stub = create_stub_app(args.openai_delay, args.tmdb_delay)
+    stub_port = free_port()
+    run_in_thread(stub, stub_port)
+
+    # Point main.py at the stubs before it is imported
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{stub_port}/v1"
+    os.environ["TMDB_API_KEY"] = "stub"
+    os.environ["TMDB_API_URL"] = f"http://127.0.0.1:{stub_port}/3"
+    os.environ["TMDB_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "tmdb_cache.sqlite3")
+
+    import main as backend
+
+    backend.embedding_stage = (SimulatedEmbedder(args.clip_ms), SimulatedIndex())
+    titles = TitleTrigramIndex(["Stranger Things", "Dark", "The Crown"], np.array(["66732", "70523", "65494"]),
+                               np.array(["tv", "tv", "tv"]))
+    backend.ocr_stage = (SimulatedOCR(args.ocr_ms), titles)
+    api_port = free_port()
+    run_in_thread(backend.app, api_port)
+    base_url = f"http://127.0.0.1:{api_port}"
+
+    rng = np.random.default_rng(0)
+    uploads = [(KINDS[n % 3], tagged_png(KINDS[n % 3], rng)) for n in range(args.requests)]
+    print(f"Simulated stages: CLIP {args.clip_ms:.0f} ms, OCR {args.ocr_ms:.0f} ms, "
+          f"GPT-4o {args.openai_delay * 1000:.0f} ms, TMDB {args.tmdb_delay * 1000:.0f} ms per call")
+
+    for label, deadline_ms in (("default deadline (sequential)", None),
+                               (f"deadline_ms={args.deadline_ms:.0f} (speculative)", args.deadline_ms)):
+        before = stub.state.calls["chat_completions"]
+        results = asyncio.run(fire(base_url, uploads, deadline_ms))
+        summarize(label, results, stub.state.calls["chat_completions"] - before)
+        # Fresh images for the next round so the perceptual cache stays cold
+        uploads = [(kind, tagged_png(kind, rng)) for kind, _ in uploads]
+
+
+if __name__ == "__main__":
+    main()
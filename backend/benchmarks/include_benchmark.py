@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency of recognize + providers, before and after include=.
+
+Before: the client calls /api/v1/recognize, then /api/v1/providers/...
+After:  the client calls /api/v1/recognize?include=providers once, and the
+        server folds providers into the TMDB details call.
+
+Caches are disabled so every iteration pays full upstream latency, and each
+client trip adds --client-rtt seconds to model a phone on cellular.
+
+Usage: python benchmarks/include_benchmark.py [--iterations 20] [--client-rtt 0.15]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import httpx
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.stub_upstreams import create_stub_app, free_port, run_in_thread
+
+
+def sample_jpeg() -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (640, 360), (30, 30, 200)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+async def trip(coro, client_rtt: float):
+    await asyncio.sleep(client_rtt)
+    response = await coro
+    response.raise_for_status()
+    return response.json()
+
+
+async def before(http, image_bytes, client_rtt):
+    result = await trip(http.post("/api/v1/recognize", files={"file": ("f.jpg", image_bytes, "image/jpeg")}), client_rtt)
+    await trip(http.get(f"/api/v1/providers/{result['media_type']}/{result['identified_media_id']}"), client_rtt)
+
+
+async def after(http, image_bytes, client_rtt):
+    result = await trip(http.post(
+        "/api/v1/recognize",
+        params={"include": "providers"},
+        files={"file": ("f.jpg", image_bytes, "image/jpeg")}
+    ), client_rtt)
+    assert result["providers"]["available"]
+
+
+async def measure(base_url, flow, iterations, client_rtt):
+    image_bytes = sample_jpeg()
+    latencies = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            await flow(http, image_bytes, client_rtt)
+            latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--openai-delay", type=float, default=0.5)
+    parser.add_argument("--tmdb-delay", type=float, default=0.1)
+    parser.add_argument("--client-rtt", type=float, default=0.15)
+    args = parser.parse_args()
+
+    stub = create_stub_app(args.openai_delay, args.tmdb_delay)
+    stub_port = free_port()
+    run_in_thread(stub, stub_port)
+
+    os.environ.update({
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+        "TMDB_API_KEY": "stub",
+        "TMDB_API_URL": f"http://127.0.0.1:{stub_port}/3",
+        "TMDB_CACHE_PATH": os.path.join(tempfile.mkdtemp(), "tmdb_cache.sqlite3"),
+        "TMDB_SEARCH_TTL_SECONDS": "0",
+        "TMDB_DETAILS_TTL_SECONDS": "0",
+        "TMDB_PROVIDERS_TTL_SECONDS": "0",
+        "PHASH_CACHE_SIZE": "0",
+    })
+
+    import main as backend
+
+    api_port = free_port()
+    run_in_thread(backend.app, api_port)
+    base_url = f"http://127.0.0.1:{api_port}"
+
+    results = {}
+    for name, flow in (("before", before), ("after", after)):
+        stub.state.calls.clear()
+        median_ms = asyncio.run(measure(base_url, flow, args.iterations, args.client_rtt))
+        upstream = sum(stub.state.calls.values()) / args.iterations
+        results[name] = median_ms
+        print(f"{name:<8} p50 {median_ms:8.1f} ms   client trips {2 if name == 'before' else 1}   "
+              f"upstream calls/op {upstream:.1f}")
+
+    saved = results["before"] - results["after"]
+    print(f"\nSaved {saved:.1f} ms per recognition ({saved / results['before'] * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
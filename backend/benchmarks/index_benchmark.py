@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Recall-vs-latency benchmark for the vector index backends.
+
+Generates a synthetic clustered catalogue of L2-normalised vectors (to mimic
+many near-duplicate posters/stills per title), then compares exact FlatIndex
+search with IVFIndex at several nprobe settings.
+
+Usage: python benchmarks/index_benchmark.py [--size 100000] [--dim 512]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from vector_index import FlatIndex, IVFIndex
+
+
+def synthetic_catalogue(size: int, dim: int, clusters: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=size)
+    vectors = centres[labels] + 1.5 * rng.standard_normal((size, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    # Queries are noisy copies of catalogue entries, like photos of a screen
+    picked = rng.choice(size, size=200, replace=False)
+    queries = vectors[picked] + 0.05 * rng.standard_normal((len(picked), dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, queries
+
+
+def time_queries(search, queries):
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        _, positions = search(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(positions[0])
+    return np.array(results), np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    print(f"Generating {args.size} x {args.dim} synthetic vectors...")
+    vectors, queries = synthetic_catalogue(args.size, args.dim, args.clusters)
+
+    flat = FlatIndex.build(vectors)
+    truth, flat_p50, flat_p95 = time_queries(lambda q: flat.search(q, args.k), queries)
+
+    started = time.perf_counter()
+    ivf = IVFIndex.build(vectors)
+    build_seconds = time.perf_counter() - started
+    print(f"IVF build: {len(ivf.centroids)} lists in {build_seconds:.1f}s\n")
+
+    print(f"{'backend':<16}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p95 ms':>10}")
+    print(f"{'flat':<16}{1.0:>10.3f}{flat_p50:>10.2f}{flat_p95:>10.2f}")
+    for nprobe in args.nprobe:
+        found, p50, p95 = time_queries(lambda q: ivf.search(q, args.k, nprobe=nprobe), queries)
+        recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+        print(f"{'ivf nprobe=' + str(nprobe):<16}{recall:>10.3f}{p50:>10.2f}{p95:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Live camera-frame recognition (/api/v1/recognize/live) against local stub
+upstreams: a client streams low-resolution frames at a fixed rate through a
+sequence of scenes, each held for a while with slight sensor noise.
+
+Half the scenes are answered by the simulated CLIP stage, half only by
+GPT-4o Vision. Reports the time from a scene's first frame to its result,
+GPT-4o calls per scene, and how many frames the server dropped (queue full)
+or skipped as perceptually unchanged.
+
+Usage: python benchmarks/live_benchmark.py [--scenes 8] [--fps 15] [--scene-seconds 2]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+import websockets
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.cascade_benchmark import TAGS, SimulatedEmbedder, SimulatedIndex
+from benchmarks.stub_upstreams import create_stub_app, free_port, run_in_thread
+
+
+def scene_pixels(kind: str, rng) -> np.ndarray:
+    """A smooth random picture (so dHash is stable under noise) with the stage tag in the corner."""
+    coarse = Image.fromarray(rng.integers(0, 256, size=(9, 16, 3), dtype=np.uint8))
+    pixels = np.asarray(coarse.resize((320, 180), Image.BILINEAR)).copy()
+    pixels[:40, :40] = TAGS[kind]
+    return pixels
+
+
+def camera_frame(pixels: np.ndarray, rng) -> bytes:
+    noisy = np.clip(pixels.astype(np.int16) + rng.integers(-3, 4, size=pixels.shape), 0, 255).astype(np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(noisy).save(buffer, format="JPEG", quality=70)
+    return buffer.getvalue()
+
+
+async def stream(url: str, scenes: list, fps: float, scene_seconds: float, rng) -> tuple:
+    """Returns (per-scene (kind, ms to result or None), last frame stats, message counts)."""
+    first_frame = {}  # frame sequence number -> scene index, for each scene's first frame
+    frame_scene = []
+    answered = {}
+    counts = {}
+    stats = {}
+    started = time.perf_counter()
+
+    async with websockets.connect(url, max_size=None) as socket:
+        async def receive():
+            async for raw in socket:
+                message = json.loads(raw)
+                counts[message["type"]] = counts.get(message["type"], 0) + 1
+                stats.update(message.get("frames", {}))
+                if message["type"] in ("result", "no_match"):
+                    scene = frame_scene[message["frame"] - 1]
+                    if scene not in answered:
+                        answered[scene] = time.perf_counter() - first_frame[scene]
+
+        receiver = asyncio.ensure_future(receive())
+        interval = 1 / fps
+        for scene, (kind, pixels) in enumerate(scenes):
+            for n in range(int(scene_seconds * fps)):
+                frame = camera_frame(pixels, rng)
+                if n == 0:
+                    first_frame[scene] = time.perf_counter()
+                frame_scene.append(scene)
+                await socket.send(frame)
+                await asyncio.sleep(max(started + len(frame_scene) * interval - time.perf_counter(), 0))
+        await asyncio.sleep(scene_seconds)
+        receiver.cancel()
+
+    latencies = [(kind, answered[i] * 1000 if i in answered else None) for i, (kind, _) in enumerate(scenes)]
+    return latencies, stats, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenes", type=int, default=8)
+    parser.add_argument("--fps", type=float, default=15)
+    parser.add_argument("--scene-seconds", type=float, default=2.0)
+    parser.add_argument("--openai-delay", type=float, default=1.0)
+    parser.add_argument("--tmdb-delay", type=float, default=0.05)
+    parser.add_argument("--clip-ms", type=float, default=80)
+    args = parser.parse_args()
+
+    stub = create_stub_app(args.openai_delay, args.tmdb_delay)
+    stub_port = free_port()
+    run_in_thread(stub, stub_port)
+
+    # Point main.py at the stubs before it is imported
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{stub_port}/v1"
+    os.environ["TMDB_API_KEY"] = "stub"
+    os.environ["TMDB_API_URL"] = f"http://127.0.0.1:{stub_port}/3"
+    os.environ["TMDB_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "tmdb_cache.sqlite3")
+
+    import main as backend
+
+    backend.embedding_stage = (SimulatedEmbedder(args.clip_ms), SimulatedIndex())
+    api_port = free_port()
+    run_in_thread(backend.app, api_port)
+
+    rng = np.random.default_rng(0)
+    kinds = ["clip_embedding" if n % 2 == 0 else "gpt4o_vision" for n in range(args.scenes)]
+    scenes = [(kind, scene_pixels(kind, rng)) for kind in kinds]
+    print(f"{args.scenes} scenes x {args.scene_seconds:.1f}s at {args.fps:.0f} fps; "
+          f"simulated CLIP {args.clip_ms:.0f} ms, GPT-4o {args.openai_delay * 1000:.0f} ms; "
+          f"vision after {backend.LIVE_STABLE_FRAMES} stable frames")
+
+    url = f"ws://127.0.0.1:{api_port}/api/v1/recognize/live"
+    latencies, stats, counts = asyncio.run(stream(url, scenes, args.fps, args.scene_seconds, rng))
+
+    for kind, label in (("clip_embedding", "CLIP scenes"), ("gpt4o_vision", "GPT-4o scenes")):
+        answered = [ms for k, ms in latencies if k == kind and ms is not None]
+        total = sum(1 for k, _ in latencies if k == kind)
+        line = f"  {label:<14}{len(answered)}/{total} answered"
+        if answered:
+            line += f", scene start -> result p50 {np.percentile(answered, 50):.0f} ms, max {max(answered):.0f} ms"
+        print(line)
+    sent = int(args.scenes * args.scene_seconds * args.fps)
+    print(f"  GPT-4o calls: {stub.state.calls['chat_completions']} for {args.scenes} scenes")
+    print(f"  frames: {sent} sent, {stats.get('received', 0)} received, {stats.get('dropped', 0)} dropped (queue), "
+          f"{stats.get('duplicates', 0)} unchanged, {stats.get('processed', 0)} processed")
+    print(f"  messages: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Reproducible throughput/latency suite for the API against stub upstreams.
+
+Starts the stub OpenAI/TMDB servers (benchmarks/stub_upstreams.py) and the
+API under uvicorn with --workers, each in its own process, then drives
+/api/v1/recognize and /api/v1/providers with a closed loop at each
+concurrency level. Reports RPS, p50/p95/p99 latency, errors and the RSS of
+every worker as a JSON artefact to diff between commits.
+
+By default the perceptual and TMDB caches are disabled so every request
+goes upstream (--warm-caches keeps the configured caches). Point the API at
+stubs you run elsewhere with --openai-base-url/--tmdb-base-url.
+
+Usage:
+    python benchmarks/load_suite.py --workers 2 --concurrency 1,8,32 --duration 10 \\
+        --openai-latency lognormal:1.0:0.3 --tmdb-latency lognormal:0.1:0.5 --output load.json
+    python benchmarks/load_suite.py --baseline load.json --output load-new.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+
+import httpx
+import numpy as np
+from PIL import Image
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.stub_upstreams import Latency, free_port
+
+SCENARIOS = ("recognize", "providers")
+
+
+def upload_pool(count: int, seed: int) -> list:
+    """Distinct screenshot-sized JPEGs, so no two uploads share a perceptual hash."""
+    rng = np.random.default_rng(seed)
+    uploads = []
+    for _ in range(count):
+        coarse = Image.fromarray(rng.integers(0, 256, size=(18, 32, 3), dtype=np.uint8))
+        buffer = BytesIO()
+        coarse.resize((1280, 720), Image.BILINEAR).save(buffer, format="JPEG", quality=85)
+        uploads.append(buffer.getvalue())
+    return uploads
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args[1]} exited with code {process.returncode} before serving")
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout:.0f}s")
+
+
+def rss_mb(pid: int) -> dict:
+    """Current and peak resident memory of a process, from /proc (Linux only)."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as handle:
+            for line in handle:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    values[key] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        return {}
+    return {"rss_mb": values.get("VmRSS"), "peak_rss_mb": values.get("VmHWM")}
+
+
+def worker_pids(master: int) -> list:
+    """The uvicorn worker processes under master, or master itself when it serves alone."""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as handle:
+                fields = handle.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{entry}/cmdline", "rb") as handle:
+                cmdline = handle.read()
+        except OSError:
+            continue
+        if int(fields[1]) == master and b"resource_tracker" not in cmdline:
+            children.append(int(entry))
+    return sorted(children) or [master]
+
+
+def memory_snapshot(master: int) -> dict:
+    return {
+        "master": rss_mb(master),
+        "workers": [rss_mb(pid) for pid in worker_pids(master)],
+    }
+
+
+async def closed_loop(base_url: str, scenario: str, concurrency: int, duration: float, warmup: float,
+                      uploads: list) -> dict:
+    """concurrency clients each send back-to-back requests for warmup + duration seconds."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies, statuses = [], {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as http:
+        started = time.perf_counter()
+        measure_from = started + warmup
+        stop_at = measure_from + duration
+        counter = 0
+
+        async def client():
+            nonlocal counter
+            while (now := time.perf_counter()) < stop_at:
+                counter += 1
+                n = counter
+                try:
+                    if scenario == "recognize":
+                        response = await http.post(
+                            "/api/v1/recognize", params={"include": "providers"},
+                            files={"file": ("frame.jpg", uploads[n % len(uploads)], "image/jpeg")}
+                        )
+                    else:
+                        media_type = "movie" if n % 2 else "tv"
+                        response = await http.get(f"/api/v1/providers/{media_type}/{1000 + n % 5000}")
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                if now >= measure_from:
+                    latencies.append((time.perf_counter() - now) * 1000)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - measure_from
+
+    completed = len(latencies)
+    ok = statuses.get(200, 0)
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": completed,
+        "errors": completed - ok,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "rps": round(completed / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2) if latencies else None,
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2) if latencies else None,
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2) if latencies else None,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list, baseline_path: str):
+    with open(baseline_path) as handle:
+        baseline = {(row["scenario"], row["concurrency"]): row for row in json.load(handle)["results"]}
+    print(f"\nAgainst {baseline_path}:")
+    for row in results:
+        before = baseline.get((row["scenario"], row["concurrency"]))
+        if before is None:
+            continue
+        deltas = []
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            if before.get(key) and row.get(key) is not None:
+                deltas.append(f"{key} {(row[key] / before[key] - 1) * 100:+.1f}%")
+        print(f"  {row['scenario']:<11}c={row['concurrency']:<4}" + ", ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each level")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--openai-latency", default="lognormal:1.0:0.3", help="Seconds or a Latency spec")
+    parser.add_argument("--tmdb-latency", default="lognormal:0.1:0.5")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--tmdb-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-base-url", help="Use an already-running OpenAI stub instead of starting one")
+    parser.add_argument("--tmdb-base-url", help="Use an already-running TMDB stub instead of starting one")
+    parser.add_argument("--warm-caches", action="store_true", help="Keep the perceptual and TMDB caches enabled")
+    parser.add_argument("--uploads", type=int, default=32, help="Distinct images cycled through by recognize")
+    parser.add_argument("--log-level", default="WARNING", help="LOG_LEVEL for the API processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="load_results.json")
+    parser.add_argument("--baseline", help="Earlier --output file to print deltas against")
+    args = parser.parse_args()
+
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+    # Validate the specs here rather than in the stub process
+    openai_latency, tmdb_latency = Latency.parse(args.openai_latency), Latency.parse(args.tmdb_latency)
+
+    scratch = tempfile.mkdtemp()
+    processes = []
+    try:
+        if args.openai_base_url and args.tmdb_base_url:
+            openai_base_url, tmdb_base_url = args.openai_base_url, args.tmdb_base_url
+        else:
+            stub_port = free_port()
+            stub = subprocess.Popen([
+                sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "stub_upstreams.py"),
+                "--port", str(stub_port), "--openai-latency", str(openai_latency),
+                "--tmdb-latency", str(tmdb_latency), "--openai-error-rate", str(args.openai_error_rate),
+                "--tmdb-error-rate", str(args.tmdb_error_rate), "--seed", str(args.seed),
+            ], cwd=BACKEND_DIR)
+            processes.append(stub)
+            wait_for_port(stub_port, stub)
+            openai_base_url = args.openai_base_url or f"http://127.0.0.1:{stub_port}/v1"
+            tmdb_base_url = args.tmdb_base_url or f"http://127.0.0.1:{stub_port}/3"
+
+        env = {
+            **os.environ,
+            "OPENAI_API_KEY": "stub",
+            "OPENAI_BASE_URL": openai_base_url,
+            "TMDB_API_KEY": "stub",
+            "TMDB_API_URL": tmdb_base_url,
+            "TMDB_CACHE_PATH": os.path.join(scratch, "tmdb_cache.sqlite3"),
+            "LOG_LEVEL": args.log_level,
+        }
+        if not args.warm_caches:
+            env.update(PHASH_CACHE_SIZE="0", TMDB_SEARCH_TTL_SECONDS="0", TMDB_DETAILS_TTL_SECONDS="0",
+                       TMDB_PROVIDERS_TTL_SECONDS="0")
+        api_port = free_port()
+        api = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(api_port),
+            "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+        ], cwd=BACKEND_DIR, env=env)
+        processes.append(api)
+        wait_for_port(api_port, api)
+        base_url = f"http://127.0.0.1:{api_port}"
+        # With several workers the port opens before every worker has started
+        for _ in range(args.workers * 4):
+            httpx.get(f"{base_url}/", timeout=30).raise_for_status()
+
+        uploads = upload_pool(args.uploads, args.seed)
+        idle_memory = memory_snapshot(api.pid)
+        print(f"{args.workers} worker(s); OpenAI {openai_latency} s, TMDB {tmdb_latency} s; error rates "
+              f"{args.openai_error_rate:g}/{args.tmdb_error_rate:g}; caches {'warm' if args.warm_caches else 'off'}")
+        print(f"  {'scenario':<11}{'conc':>5}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+              f"{'worker MB':>11}")
+
+        results = []
+        for scenario in scenarios:
+            for concurrency in levels:
+                row = asyncio.run(closed_loop(base_url, scenario, concurrency, args.duration, args.warmup, uploads))
+                row["memory"] = memory_snapshot(api.pid)
+                results.append(row)
+                worker_mb = max((worker["rss_mb"] or 0) for worker in row["memory"]["workers"])
+                print(f"  {scenario:<11}{concurrency:>5}{row['rps']:>9.1f}{row['p50_ms'] or 0:>9.0f}"
+                      f"{row['p95_ms'] or 0:>9.0f}{row['p99_ms'] or 0:>9.0f}{row['errors']:>8}{worker_mb:>11.1f}")
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    artefact = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": {**vars(args), "openai_latency": str(openai_latency), "tmdb_latency": str(tmdb_latency)},
+            "idle_memory": idle_memory,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as handle:
+        json.dump(artefact, handle, indent=2)
+    print(f"\nWrote {args.output}")
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Concurrency load test for /api/v1/recognize against local stub upstreams.
+
+Fires N simultaneous requests at a single uvicorn worker. With a blocking
+pipeline the wall time is roughly N x (per-request latency); with the async
+pipeline the requests overlap and the wall time stays close to one request.
+
+Usage: python benchmarks/load_test.py [--requests 20] [--openai-delay 1.0]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import httpx
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.stub_upstreams import create_stub_app, free_port, run_in_thread
+
+
+def sample_jpeg() -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (640, 360), (200, 30, 30)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+async def fire(base_url: str, count: int, image_bytes: bytes):
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+        async def one():
+            started = time.perf_counter()
+            response = await http.post(
+                "/api/v1/recognize",
+                files={"file": ("frame.jpg", image_bytes, "image/jpeg")}
+            )
+            response.raise_for_status()
+            return started, time.perf_counter()
+
+        return await asyncio.gather(*(one() for _ in range(count)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--openai-delay", type=float, default=1.0)
+    parser.add_argument("--tmdb-delay", type=float, default=0.1)
+    args = parser.parse_args()
+
+    stub_port = free_port()
+    run_in_thread(create_stub_app(args.openai_delay, args.tmdb_delay), stub_port)
+
+    # Point main.py at the stubs before it is imported
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{stub_port}/v1"
+    os.environ["TMDB_API_KEY"] = "stub"
+    os.environ["TMDB_API_URL"] = f"http://127.0.0.1:{stub_port}/3"
+    os.environ["TMDB_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "tmdb_cache.sqlite3")
+
+    import main as backend
+
+    api_port = free_port()
+    run_in_thread(backend.app, api_port)
+
+    timings = asyncio.run(fire(f"http://127.0.0.1:{api_port}", args.requests, sample_jpeg()))
+
+    first_start = min(start for start, _ in timings)
+    last_end = max(end for _, end in timings)
+    wall = last_end - first_start
+    latencies = [end - start for start, end in timings]
+    serial_floor = args.openai_delay + 2 * args.tmdb_delay
+
+    # Count how many requests were in flight at the same moment
+    events = sorted([(start, 1) for start, _ in timings] + [(end, -1) for _, end in timings])
+    in_flight = peak = 0
+    for _, delta in events:
+        in_flight += delta
+        peak = max(peak, in_flight)
+
+    print(f"Requests:              {args.requests}")
+    print(f"Upstream latency:      {serial_floor:.2f}s per request")
+    print(f"Wall time:             {wall:.2f}s")
+    print(f"Serial would take:     {serial_floor * args.requests:.2f}s")
+    print(f"Mean request latency:  {sum(latencies) / len(latencies):.2f}s")
+    print(f"Peak concurrency:      {peak}")
+    print(f"Overlap factor:        {sum(latencies) / wall:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of single-view (poster only) against multi-view (poster,
+backdrops, logo) embedding databases: top-1/top-5 accuracy and search latency
+per pooling mode.
+
+Real mode embeds a local labelled screenshot set with CLIP and searches two
+databases built by build_netflix_database.py (one with --views poster:1):
+
+    python benchmarks/multiview_eval.py --screenshots shots/ --labels shots/labels.csv \\
+        --single single.npz --multi multi.npz
+
+labels.csv rows are "filename,media_type,tmdb_id". --synthetic needs no model
+or data: each title gets a poster and several backdrop-like views around a
+shared title direction, and half the queries are noisy backdrop frames (what a
+paused episode looks like) rather than posters.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from embedding_search import EmbeddingIndex
+from vector_index import POOLING_MODES, FlatIndex
+
+
+def synthetic_views(titles: int, dim: int, backdrops: int, noise: float, seed: int = 0):
+    """(poster vectors, multi-view vectors, view owners, queries, query labels)."""
+    rng = np.random.default_rng(seed)
+
+    def unit(vectors):
+        return (vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)).astype(np.float32)
+
+    centres = rng.standard_normal((titles, dim))
+    posters = unit(centres + 1.2 * rng.standard_normal((titles, dim)))
+    stills = unit(centres[:, None] + 1.2 * rng.standard_normal((titles, backdrops + 1, dim)))
+    views = np.concatenate([posters[:, None], stills[:, :backdrops]], axis=1)
+
+    # Queries: half poster photos, half frames near an unindexed still of the same title
+    labels = rng.choice(titles, size=400)
+    sources = np.where(np.arange(len(labels))[:, None] < len(labels) // 2,
+                       posters[labels], stills[labels, rng.integers(0, backdrops + 1, size=len(labels))])
+    queries = unit(sources + noise * rng.standard_normal(sources.shape) / np.sqrt(dim))
+    owners = np.repeat(np.arange(titles, dtype=np.int32), backdrops + 1)
+    return posters, views.reshape(-1, dim), owners, queries, labels
+
+
+def evaluate(index: EmbeddingIndex, queries: np.ndarray, labels: list) -> dict:
+    """Top-1/top-5 accuracy and per-query latency of index against (media_type, id) labels."""
+    hits1 = hits5 = 0
+    latencies = []
+    for query, label in zip(queries, labels):
+        started = time.perf_counter()
+        candidates = index.search(query, k=5)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found = [(c["media_type"], c["media_id"]) for c in candidates]
+        hits1 += found[:1] == [label]
+        hits5 += label in found
+    return {
+        "top1": hits1 / len(labels),
+        "top5": hits5 / len(labels),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def synthetic_runs(args):
+    posters, views, owners, queries, labels = synthetic_views(args.titles, args.dim, args.backdrops, args.noise)
+    ids = np.array([str(1000 + i) for i in range(args.titles)])
+    media_types = np.full(args.titles, "movie")
+    labels = [("movie", str(1000 + i)) for i in labels]
+    print(f"{args.titles} titles, {len(views)} views, {len(queries)} queries "
+          f"(half posters, half unseen backdrop frames)\n")
+
+    yield "single", evaluate(EmbeddingIndex(FlatIndex.build(posters), ids, media_types), queries, labels)
+    multi = FlatIndex.build(views)
+    for pooling in POOLING_MODES:
+        index = EmbeddingIndex(multi, ids, media_types, view_owners=owners, pooling=pooling)
+        yield f"multi/{pooling}", evaluate(index, queries, labels)
+
+
+def screenshot_runs(args):
+    from PIL import Image
+
+    from embedding_search import ClipEmbedder
+
+    with open(args.labels, newline="") as handle:
+        rows = [row for row in csv.reader(handle) if row and not row[0].startswith("#")]
+    embedder = ClipEmbedder()
+    queries = embedder.embed_batch([Image.open(os.path.join(args.screenshots, row[0])) for row in rows])
+    labels = [(media_type, media_id) for _, media_type, media_id in rows]
+    print(f"{len(rows)} labelled screenshots from {args.screenshots}\n")
+
+    yield "single", evaluate(EmbeddingIndex.load(args.single), queries, labels)
+    for pooling in POOLING_MODES:
+        yield f"multi/{pooling}", evaluate(EmbeddingIndex.load(args.multi, pooling), queries, labels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--synthetic", action="store_true", help="Use a synthetic catalogue instead of screenshots")
+    parser.add_argument("--screenshots", help="Directory of labelled screenshots")
+    parser.add_argument("--labels", help="CSV of filename,media_type,tmdb_id")
+    parser.add_argument("--single", help="Poster-only embedding database")
+    parser.add_argument("--multi", help="Multi-view embedding database")
+    parser.add_argument("--titles", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--backdrops", type=int, default=3, help="Synthetic non-poster views per title")
+    parser.add_argument("--noise", type=float, default=2.0, help="Synthetic query noise, relative to a unit vector")
+    args = parser.parse_args()
+
+    if not args.synthetic and not all((args.screenshots, args.labels, args.single, args.multi)):
+        parser.error("pass --synthetic, or --screenshots, --labels, --single and --multi")
+
+    runs = list(synthetic_runs(args) if args.synthetic else screenshot_runs(args))
+    print(f"{'database':<14}{'top-1':>8}{'top-5':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, result in runs:
+        print(f"{name:<14}{result['top1']:>8.3f}{result['top5']:>8.3f}"
+              f"{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+How many recognitions the local OCR text-match stage answers without any
+remote call, how often those answers are right, and the stage's p50/p95.
+
+Real mode OCRs a labelled screenshot set with tesseract and matches it
+against the titles in an embedding database (.npz or .snapdb):
+
+    python benchmarks/ocr_benchmark.py --screenshots shots/ --labels shots/labels.csv \\
+        --titles movie_embeddings.snapdb
+
+labels.csv rows are "filename,media_type,tmdb_id". --synthetic needs no
+tesseract: it generates a catalogue and simulated OCR output (UI chrome,
+synopsis text, and on some screens the title with OCR-style character
+errors), so it measures the index and the acceptance rule but not the OCR
+engine itself.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from text_match import TesseractOCR, TitleTrigramIndex, confident_match
+
+CHROME = ["Continue Watching", "Play", "Resume", "More Like This", "Episodes", "Trailers & More",
+          "My List", "Top 10 in the U.S. Today", "Because you watched", "Skip Intro", "Next Episode",
+          "Audio & Subtitles", "New Episode", "Limited Series", "Rate", "TV-MA", "HD", "5.1"]
+SYLLABLES = ["ka", "lo", "ren", "mi", "tor", "as", "vel", "dun", "sha", "ri", "bel", "no", "ques", "ta",
+             "win", "ter", "gal", "or", "fen", "ix", "pra", "dle", "mon", "ste", "ry", "heart", "blood",
+             "night", "sun", "star", "fall", "land", "ing", "er", "ton", "ville", "wood", "field"]
+CONFUSIONS = {"l": "1", "i": "l", "o": "0", "e": "c", "rn": "m", "m": "rn", "s": "5", "a": "o", "g": "q"}
+
+
+def synthetic_catalogue(size: int, rng) -> tuple:
+    words = sorted({"".join(rng.choice(SYLLABLES, size=rng.integers(1, 4))) for _ in range(size // 4)})
+    picks = rng.integers(len(words), size=(size, 3))
+    lengths = rng.integers(1, 4, size=size)
+    titles = []
+    for row, length in zip(picks, lengths):
+        title = " ".join(words[i] for i in row[:length]).title()
+        if rng.random() < 0.2:
+            title = f"The {title}"
+        if rng.random() < 0.05:
+            title = f"{title} {rng.integers(2, 5)}"
+        titles.append(title)
+    # A few remakes and film/series pairs share a name
+    for i in rng.choice(size, size=size // 50, replace=False):
+        titles[i] = titles[(i + 1) % size]
+    ids = np.arange(1000, 1000 + size).astype(str)
+    media_types = rng.choice(["movie", "tv"], size=size)
+    return titles, ids, media_types, words
+
+
+def ocr_noise(text: str, rate: float, rng) -> str:
+    out, i = [], 0
+    while i < len(text):
+        pair = text[i:i + 2].lower()
+        if pair in CONFUSIONS and rng.random() < rate:
+            out.append(CONFUSIONS[pair])
+            i += 2
+            continue
+        char = text[i]
+        roll = rng.random()
+        if roll < rate and char.lower() in CONFUSIONS:
+            out.append(CONFUSIONS[char.lower()])
+        elif roll < 1.5 * rate:
+            pass  # dropped character
+        else:
+            out.append(char)
+        i += 1
+    return "".join(out)
+
+
+def synthetic_screens(titles, words, count: int, visible: float, noise: float, rng) -> list:
+    """(ocr lines, label row or None) per screen; label is None when no title text is on screen."""
+    screens = []
+    for _ in range(count):
+        row = int(rng.integers(len(titles)))
+        lines = list(rng.choice(CHROME, size=rng.integers(2, 6), replace=False))
+        lines.append(" ".join(rng.choice(words, size=rng.integers(6, 14))).capitalize() + ".")
+        lines.append(f"{rng.integers(1990, 2025)} | {rng.choice(['PG-13', '16+', 'TV-14'])} | "
+                     f"{rng.integers(1, 6)} Seasons")
+        if rng.random() < visible:
+            lines.insert(int(rng.integers(len(lines))), ocr_noise(titles[row], noise, rng))
+            screens.append((lines, row))
+        else:
+            screens.append((lines, None))
+    return screens
+
+
+def report(outcomes: list, latencies: list, label: str):
+    """outcomes are (resolved, correct, title_visible) per screen."""
+    resolved = sum(1 for r, _, _ in outcomes if r)
+    correct = sum(1 for r, c, _ in outcomes if r and c)
+    visible = sum(1 for _, _, v in outcomes if v)
+    print(f"{label}: {len(outcomes)} screens, {visible} with the title on screen")
+    print(f"  resolved locally (no remote call): {resolved / len(outcomes):.1%}")
+    print(f"  precision of local answers:        {correct / resolved if resolved else 0:.1%}")
+    print(f"  recall on title-visible screens:   {correct / visible if visible else 0:.1%}")
+    print(f"  stage latency p50 {np.percentile(latencies, 50):.2f} ms, p95 {np.percentile(latencies, 95):.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--synthetic", action="store_true", help="Simulate OCR output instead of reading screenshots")
+    parser.add_argument("--screenshots", help="Directory of labelled screenshots")
+    parser.add_argument("--labels", help="CSV of filename,media_type,tmdb_id")
+    parser.add_argument("--titles", help="Embedding database whose titles are indexed")
+    parser.add_argument("--size", type=int, default=50000, help="Synthetic catalogue size")
+    parser.add_argument("--screens", type=int, default=2000, help="Synthetic screens")
+    parser.add_argument("--visible", type=float, default=0.6, help="Share of synthetic screens showing the title")
+    parser.add_argument("--noise", type=float, default=0.03, help="Synthetic OCR character error rate")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("OCR_MATCH_THRESHOLD", "0.7")))
+    parser.add_argument("--margin", type=float, default=float(os.getenv("OCR_MATCH_MARGIN", "0.05")))
+    args = parser.parse_args()
+
+    if not args.synthetic and not all((args.screenshots, args.labels, args.titles)):
+        parser.error("pass --synthetic, or --screenshots, --labels and --titles")
+
+    outcomes, latencies = [], []
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        titles, ids, media_types, words = synthetic_catalogue(args.size, rng)
+        started = time.perf_counter()
+        index = TitleTrigramIndex(titles, ids, media_types)
+        print(f"Indexed {len(index)} titles in {time.perf_counter() - started:.2f}s\n")
+        for lines, row in synthetic_screens(titles, words, args.screens, args.visible, args.noise, rng):
+            started = time.perf_counter()
+            best = confident_match(index.match_lines(lines), args.threshold, args.margin)
+            latencies.append((time.perf_counter() - started) * 1000)
+            correct = row is not None and best is not None and \
+                (best["media_type"], best["media_id"]) == (str(media_types[row]), str(ids[row]))
+            outcomes.append((best is not None, correct, row is not None))
+        report(outcomes, latencies, "synthetic (index + matching only)")
+        return
+
+    from PIL import Image
+
+    from image_preprocess import prepare_image
+
+    with open(args.labels, newline="") as handle:
+        rows = [row for row in csv.reader(handle) if row and not row[0].startswith("#")]
+    ocr = TesseractOCR(float(os.getenv("OCR_MIN_CONFIDENCE", "60")))
+    index = TitleTrigramIndex.load(args.titles)
+    ocr_ms = []
+    for filename, media_type, media_id in rows:
+        image = prepare_image(Image.open(os.path.join(args.screenshots, filename)), 1024)
+        started = time.perf_counter()
+        lines = ocr.read_lines(image)
+        read = time.perf_counter()
+        best = confident_match(index.match_lines(lines), args.threshold, args.margin)
+        latencies.append((time.perf_counter() - started) * 1000)
+        ocr_ms.append((read - started) * 1000)
+        correct = best is not None and (best["media_type"], best["media_id"]) == (media_type, media_id)
+        # Screens without readable title text can't be told apart here, so every screen counts as visible
+        outcomes.append((best is not None, correct, True))
+    report(outcomes, latencies, f"{args.screenshots} against {len(index)} titles")
+    print(f"  of which tesseract p50 {np.percentile(ocr_ms, 50):.2f} ms, p95 {np.percentile(ocr_ms, 95):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
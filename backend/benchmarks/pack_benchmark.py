@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Upstream GPT-4o calls and prompt tokens per recognised title for
+/api/v1/recognize/batch, one request per crop vs packed multi-image requests.
+
+Runs against the stub OpenAI/TMDB servers; token counts are the stub's
+estimate (text length / 4 plus a fixed cost per image).
+
+Usage: python benchmarks/pack_benchmark.py [--crops 8] [--pack-size 4] [--malformed]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from io import BytesIO
+
+import httpx
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.stub_upstreams import create_stub_app, free_port, run_in_thread
+
+
+def distinct_crop(seed: int) -> bytes:
+    buffer = BytesIO()
+    Image.effect_noise((342, 192), 20 + seed * 7).convert("RGB").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--crops", type=int, default=8)
+    parser.add_argument("--pack-size", type=int, default=4)
+    parser.add_argument("--malformed", action="store_true", help="stub returns unparseable packed replies")
+    args = parser.parse_args()
+
+    stub = create_stub_app(openai_delay=0.2, tmdb_delay=0.02, malformed_packed=args.malformed)
+    stub_port = free_port()
+    run_in_thread(stub, stub_port)
+
+    os.environ.update({
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+        "TMDB_API_KEY": "stub",
+        "TMDB_API_URL": f"http://127.0.0.1:{stub_port}/3",
+        "TMDB_CACHE_PATH": os.path.join(tempfile.mkdtemp(), "tmdb_cache.sqlite3"),
+        "PHASH_CACHE_SIZE": "0",
+        "BATCH_PACK_SIZE": str(args.pack_size),
+    })
+
+    import main as backend
+
+    api_port = free_port()
+    run_in_thread(backend.app, api_port)
+
+    files = [("files", (f"crop{i}.jpg", distinct_crop(i), "image/jpeg")) for i in range(args.crops)]
+    print(f"{args.crops} crops, pack size {args.pack_size}{' (malformed packed replies)' if args.malformed else ''}\n")
+    print(f"{'mode':<10}{'recognised':>12}{'GPT calls':>11}{'prompt tokens':>15}{'tokens/title':>14}")
+    with httpx.Client(base_url=f"http://127.0.0.1:{api_port}", timeout=60) as http:
+        for pack in (False, True):
+            stub.state.calls.clear()
+            stub.state.tokens.clear()
+            body = http.post("/api/v1/recognize/batch", params={"pack": pack}, files=files).json()
+            recognised = body["succeeded"]
+            calls = stub.state.calls["chat_completions"]
+            tokens = stub.state.tokens["prompt"]
+            print(f"{'packed' if pack else 'single':<10}{recognised:>12}{calls:>11}{tokens:>15}"
+                  f"{tokens / max(recognised, 1):>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
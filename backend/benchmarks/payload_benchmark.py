@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Response payload size and encoding cost, against local stub upstreams
+(TMDB-sized details and credits):
+
+  size        /api/v1/recognize?include=providers,credits bytes on the wire,
+              full vs fields=compact, uncompressed / gzip / brotli
+  serialise   time to encode that response: FastAPI's default path
+              (jsonable_encoder + stdlib JSONResponse) vs FastJSONResponse
+              (orjson when installed)
+  revalidate  /api/v1/providers: a first fetch vs an If-None-Match refetch (304)
+
+Usage: python benchmarks/payload_benchmark.py [--repeat 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.cascade_benchmark import tagged_png
+from benchmarks.stub_upstreams import create_stub_app, free_port, run_in_thread
+
+ENCODINGS = ("identity", "gzip", "br")
+
+
+async def wire_size(http: httpx.AsyncClient, body: bytes, fields: str, encoding: str):
+    """Bytes on the wire for one recognition, or None when the server didn't use that encoding."""
+    params = {"include": "providers,credits"}
+    if fields:
+        params["fields"] = fields
+    request = http.build_request("POST", "/api/v1/recognize", params=params,
+                                 files={"file": ("frame.png", body, "image/png")},
+                                 headers={"Accept-Encoding": encoding})
+    response = await http.send(request, stream=True)
+    wire = b"".join([chunk async for chunk in response.aiter_raw()])
+    await response.aclose()
+    response.raise_for_status()
+    if response.headers.get("content-encoding", "identity") != encoding:
+        return None
+    return len(wire)
+
+
+async def measure_sizes(base_url: str, body: bytes) -> dict:
+    sizes = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+        for fields in (None, "compact"):
+            for encoding in ENCODINGS:
+                sizes[fields or "full", encoding] = await wire_size(http, body, fields, encoding)
+    return sizes
+
+
+async def measure_revalidation(base_url: str) -> tuple:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+        first = await http.get("/api/v1/providers/tv/66732")
+        again = await http.get("/api/v1/providers/tv/66732", headers={"If-None-Match": first.headers["etag"]})
+    return first, again
+
+
+def time_per_call(function, repeat: int) -> float:
+    """Mean microseconds per call."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=2000, help="Encodes per serialiser timing")
+    args = parser.parse_args()
+
+    stub_port = free_port()
+    run_in_thread(create_stub_app(0.05, 0.01), stub_port)
+
+    # Point main.py at the stubs before it is imported
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{stub_port}/v1"
+    os.environ["TMDB_API_KEY"] = "stub"
+    os.environ["TMDB_API_URL"] = f"http://127.0.0.1:{stub_port}/3"
+    os.environ["TMDB_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "tmdb_cache.sqlite3")
+    os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+
+    import main as backend
+    import responses
+    from fastapi.encoders import jsonable_encoder
+    from starlette.responses import JSONResponse
+
+    api_port = free_port()
+    run_in_thread(backend.app, api_port)
+    base_url = f"http://127.0.0.1:{api_port}"
+    body = tagged_png("gpt4o_vision", np.random.default_rng(0))
+
+    print(f"Response size, /api/v1/recognize?include=providers,credits "
+          f"(COMPRESS_MIN_BYTES={backend.COMPRESS_MIN_BYTES}):")
+    sizes = asyncio.run(measure_sizes(base_url, body))
+    print(f"  {'':<10}" + "".join(f"{encoding:>12}" for encoding in ENCODINGS))
+    for fields in ("full", "compact"):
+        cells = [f"{sizes[fields, encoding]:>10} B" if sizes[fields, encoding] else f"{'n/a':>12}"
+                 for encoding in ENCODINGS]
+        print(f"  {fields:<10}" + "".join(cells))
+    if responses.brotli is None:
+        print("  (brotli not installed: br requests are served gzip, so that column is n/a)")
+
+    # The same payload the endpoint builds, encoded in-process
+    async def full_payload():
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+            response = await http.post("/api/v1/recognize", params={"include": "providers,credits"},
+                                       files={"file": ("frame.png", body, "image/png")})
+            return response.json()
+    payload = asyncio.run(full_payload())
+    print(f"\nSerialising the full response ({len(responses.dumps(payload))} B), mean of {args.repeat}:")
+    stdlib = time_per_call(lambda: JSONResponse(jsonable_encoder(payload)), args.repeat)
+    fast = time_per_call(lambda: responses.FastJSONResponse(payload), args.repeat)
+    engine = "orjson" if responses.orjson is not None else "stdlib, compact (orjson not installed)"
+    print(f"  jsonable_encoder + JSONResponse  {stdlib:>8.1f} µs")
+    print(f"  FastJSONResponse ({engine})  {fast:>8.1f} µs")
+
+    first, again = asyncio.run(measure_revalidation(base_url))
+    print("\nProvider revalidation, /api/v1/providers/tv/66732:")
+    print(f"  first fetch    {first.status_code}  {len(first.content):>5} B  ETag {first.headers['etag']}  "
+          f"Cache-Control {first.headers['cache-control']}")
+    print(f"  If-None-Match  {again.status_code}  {len(again.content):>5} B")
+
+
+if __name__ == "__main__":
+    main()
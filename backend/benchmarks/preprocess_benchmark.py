@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Bytes, time and image tokens sent to the vision API, raw vs preprocessed.
+
+Synthesises a 12 MP phone photo of a TV (noise, gradients and title text)
+in JPEG and PNG form, then compares sending the raw upload with the
+prepare_image + encode_for_vision pipeline used by main.py.
+
+Usage: python benchmarks/preprocess_benchmark.py [--max-edge 1024] [--quality 85]
+"""
+
+import argparse
+import base64
+import math
+import os
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from image_preprocess import encode_for_vision, prepare_image
+
+
+def synthetic_photo(width: int = 4032, height: int = 3024) -> Image.Image:
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    pixels = np.clip(gradient * 0.5 + rng.normal(60, 25, (height, width, 3)), 0, 255).astype(np.uint8)
+    image = Image.fromarray(pixels)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((400, 500, width - 400, height - 500), outline=(20, 20, 20), width=40)
+    for row in range(6):
+        draw.text((600, 800 + row * 250), "STRANGER THINGS  Season 4  Episode 1", fill=(230, 30, 30))
+    return image
+
+
+def vision_tokens(size, detail: str) -> int:
+    """Approximate GPT-4o image token cost for a given pixel size and detail level."""
+    if detail == "low":
+        return 85
+    width, height = size
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-edge", type=int, default=1024)
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--crop-mode", default="none", choices=["none", "crop", "letterbox"])
+    args = parser.parse_args()
+
+    photo = synthetic_photo()
+    for fmt in ("JPEG", "PNG"):
+        buffer = BytesIO()
+        photo.save(buffer, format=fmt, **({"quality": 95} if fmt == "JPEG" else {}))
+        upload = buffer.getvalue()
+
+        decoded, decode_ms = timed(lambda: Image.open(BytesIO(upload)).convert("RGB"))
+        _, raw_b64_ms = timed(base64.b64encode, upload)
+        raw_tokens = vision_tokens(decoded.size, "high")
+
+        # prepare_image decodes lazily, so JPEGs can be downscaled inside libjpeg
+        prepared, prepare_ms = timed(prepare_image, Image.open(BytesIO(upload)), args.max_edge, args.crop_mode)
+        (jpeg_bytes, detail, report), _ = timed(encode_for_vision, prepared, len(upload), args.quality, "auto")
+        _, b64_ms = timed(base64.b64encode, jpeg_bytes)
+
+        print(f"\n{fmt} upload {decoded.size[0]}x{decoded.size[1]}")
+        print(f"  raw:           {len(upload) / 1e6:7.2f} MB sent, base64 {raw_b64_ms:6.1f} ms, "
+              f"~{raw_tokens} image tokens (detail=high)")
+        print(f"  preprocessed:  {len(jpeg_bytes) / 1e6:7.2f} MB sent, base64 {b64_ms:6.1f} ms, "
+              f"~{vision_tokens(prepared.size, detail)} image tokens (detail={detail})")
+        print(f"  stage ms:      full decode {decode_ms:.1f}, decode+prepare {prepare_ms:.1f}, "
+              f"detail {report['detail_ms']:.1f}, encode {report['encode_ms']:.1f}")
+        print(f"  reduction:     {len(upload) / len(jpeg_bytes):.1f}x bytes")
+
+
+if __name__ == "__main__":
+    main()
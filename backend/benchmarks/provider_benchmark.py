@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for provider normalisation.
+
+Counts the known-tricky names the old per-name substring mapper gets wrong,
+then times summarising a realistic watch/providers payload with it versus
+ProviderCatalog. The golden checks against data/tmdb_providers.json live in
+tests/test_provider_catalog.py.
+
+Usage: python benchmarks/provider_benchmark.py [--iterations 20000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from provider_catalog import ProviderCatalog
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "tmdb_providers.json")
+
+# Names that are not in the table, and what they should map to
+TRICKY_NAMES = {
+    "Cinemax": None,
+    "MaxDome": None,
+    "Max Stream": None,
+    "Paramount+ Amazon Channel": "paramount",
+    "Netflix basic with Ads": "netflix",
+    "Max": "hbo",
+    "HBO Max Amazon Channel": "hbo",
+    "AppleTV": "apple",
+    "Disney+": "disney",
+    "Crunchyroll": None,
+}
+
+
+def legacy_map_provider_id(tmdb_name: str):
+    """The substring mapper main.py used before ProviderCatalog."""
+    name = tmdb_name.lower()
+    if "netflix" in name:
+        return "netflix"
+    elif "hulu" in name:
+        return "hulu"
+    elif "max" in name or "hbo" in name:
+        return "hbo"
+    elif "disney" in name:
+        return "disney"
+    elif "amazon" in name or "prime" in name:
+        return "prime"
+    elif "apple" in name:
+        return "apple"
+    elif "paramount" in name:
+        return "paramount"
+    elif "peacock" in name:
+        return "peacock"
+    return None
+
+
+def legacy_summarize(country_data: dict) -> list:
+    providers = []
+    for provider in country_data.get("flatrate", []):
+        provider_id = legacy_map_provider_id(provider.get("provider_name", "").lower())
+        if provider_id and provider_id not in providers:
+            providers.append(provider_id)
+    return providers
+
+
+def sample_country_data(rows: list) -> dict:
+    """A busy US payload: every known provider spread across the tiers."""
+    tiers = {"flatrate": [], "ads": [], "rent": [], "buy": []}
+    for i, row in enumerate(rows):
+        entry = {"provider_id": row["provider_id"], "provider_name": row["provider_name"], "logo_path": "/x.jpg"}
+        tiers[list(tiers)[i % len(tiers)]].append(entry)
+    return {"link": "https://www.themoviedb.org/movie/1/watch", **tiers}
+
+
+def time_calls(fn, arg, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    with open(TABLE_PATH) as handle:
+        rows = json.load(handle)["providers"]
+    catalog = ProviderCatalog.load(TABLE_PATH)
+
+    legacy_misses = [
+        name for name, expected in TRICKY_NAMES.items() if legacy_map_provider_id(name) != expected
+    ]
+    print(f"legacy mapper gets {len(legacy_misses)} tricky names wrong: {', '.join(legacy_misses)}")
+
+    country_data = sample_country_data(rows)
+    legacy_us = time_calls(legacy_summarize, country_data, args.iterations)
+    flatrate_only = {"flatrate": country_data["flatrate"]}
+    catalog_flatrate_us = time_calls(catalog.services_by_tier, flatrate_only, args.iterations)
+    catalog_us = time_calls(catalog.services_by_tier, country_data, args.iterations)
+    print(f"legacy  (flatrate only): {legacy_us:.2f} us/payload")
+    print(f"catalog (flatrate only): {catalog_flatrate_us:.2f} us/payload")
+    print(f"catalog (all tiers):     {catalog_us:.2f} us/payload")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Size, per-worker memory, load time, query latency and recall of the embedding
+store formats on a synthetic catalogue:
+
+    npz         np.load of the builder .npz into RAM (how every worker used to load it)
+    npz+mmap    load_index with its float32 .npy sidecar memory-mapped
+    f16 / int8  compact .snapdb store (compact_store.py), mapped in place
+
+Each format loads in its own subprocess. "private MB" is anonymous memory
+the worker owns; "shared MB" is file-backed page cache that every worker
+mapping the same file reuses.
+
+Usage: python benchmarks/store_benchmark.py [--size 50000] [--dim 512]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.index_benchmark import synthetic_catalogue
+from compact_store import quantize, write_store
+from embedding_search import EmbeddingIndex
+from vector_index import FlatIndex, QuantizedFlatIndex, load_index
+
+
+def rss_mb() -> dict:
+    """Current anonymous and file-backed resident memory of this process."""
+    usage = {}
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                usage[line.split(":")[0]] = int(line.split()[1]) / 1024
+    return usage
+
+
+def run_variant(variant: str, path: str, queries_path: str) -> dict:
+    queries = np.load(queries_path)
+    before = rss_mb()
+    started = time.perf_counter()
+    if variant == "npz":
+        index, _, _ = load_index(path, mmap=False)
+    else:
+        index = EmbeddingIndex.load(path).index
+    load_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, k=10)
+        latencies.append((time.perf_counter() - started) * 1000)
+    after = rss_mb()
+    return {
+        "load_ms": load_ms,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "private_mb": after["RssAnon"] - before["RssAnon"],
+        "shared_mb": after["RssFile"] - before["RssFile"],
+    }
+
+
+def recall(exact: np.ndarray, found: np.ndarray) -> float:
+    return float(np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(exact, found)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--variant", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--queries", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.path, args.queries)))
+        return
+
+    vectors, queries = synthetic_catalogue(args.size, args.dim, clusters=max(1, args.size // 50))
+    _, exact = FlatIndex.build(vectors).search(queries, k=10)
+    rows = [
+        {"ids": str(100000 + i), "media_types": ("movie", "tv")[i % 2], "titles": f"Title {i}",
+         "years": str(1980 + i % 45), "poster_paths": f"/poster{i}.jpg", "views": "poster:1",
+         "embeddings": vector[np.newaxis], "view_kinds": ["poster"]}
+        for i, vector in enumerate(vectors)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queries_path = os.path.join(tmp, "queries.npy")
+        np.save(queries_path, queries[:50])
+        npz_path = os.path.join(tmp, "movie_embeddings.npz")
+        np.savez(npz_path, ids=np.array([row["ids"] for row in rows]),
+                 media_types=np.array([row["media_types"] for row in rows]), embeddings=vectors)
+        load_index(npz_path)  # unpack the sidecar up front so npz+mmap measures a warm load
+
+        paths = {"npz": npz_path, "npz+mmap": npz_path}
+        found = {"npz": exact, "npz+mmap": exact}
+        for dtype, name in (("float16", "f16"), ("int8", "int8")):
+            paths[name] = os.path.join(tmp, f"movie_embeddings.{name}.snapdb")
+            write_store(paths[name], rows, dtype=dtype)
+            sections = quantize(vectors, dtype)
+            _, found[name] = QuantizedFlatIndex(sections["embeddings"], sections.get("scales")).search(queries, k=10)
+
+        sizes = {"npz": os.path.getsize(npz_path), "npz+mmap": os.path.getsize(npz_path.replace(".npz", ".embeddings.npy"))}
+        sizes.update({name: os.path.getsize(paths[name]) for name in ("f16", "int8")})
+
+        print(f"{args.size} x {args.dim} catalogue\n")
+        print(f"{'format':<10}{'file MB':>9}{'load ms':>9}{'private MB':>12}{'shared MB':>11}"
+              f"{'p50 ms':>8}{'recall@10':>11}")
+        for name, path in paths.items():
+            result = json.loads(subprocess.run(
+                [sys.executable, __file__, "--variant", name, "--path", path, "--queries", queries_path],
+                check=True, capture_output=True, text=True
+            ).stdout.strip().splitlines()[-1])
+            print(f"{name:<10}{sizes[name] / 1e6:>9.1f}{result['load_ms']:>9.1f}{result['private_mb']:>12.1f}"
+                  f"{result['shared_mb']:>11.1f}{result['p50_ms']:>8.2f}{recall(exact, found[name]):>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-result of /api/v1/recognize/stream (SSE) against the total
+latency of /api/v1/recognize, for a GPT-4o identification and a CLIP
+fast-path one, using local stub upstreams with the TMDB cache disabled.
+
+For each event the client sees, reports when it arrived (p50 over the
+requests, measured at the client), next to the blocking endpoint's p50.
+
+Usage: python benchmarks/stream_benchmark.py [--requests 10] [--openai-delay 1.0] [--tmdb-delay 0.3]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.cascade_benchmark import SimulatedEmbedder, SimulatedIndex, tagged_png
+from benchmarks.stub_upstreams import create_stub_app, free_port, run_in_thread
+
+EVENTS = ("candidate", "identification", "tmdb_match", "details", "providers", "result")
+
+
+async def blocking(http: httpx.AsyncClient, body: bytes) -> float:
+    started = time.perf_counter()
+    response = await http.post("/api/v1/recognize", params={"include": "providers"},
+                               files={"file": ("frame.png", body, "image/png")})
+    response.raise_for_status()
+    return (time.perf_counter() - started) * 1000
+
+
+async def streaming(http: httpx.AsyncClient, body: bytes) -> dict:
+    """Client-side arrival time (ms) of the first event of each type."""
+    arrivals = {}
+    started = time.perf_counter()
+    async with http.stream("POST", "/api/v1/recognize/stream", params={"include": "providers"},
+                           files={"file": ("frame.png", body, "image/png")}) as response:
+        response.raise_for_status()
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event not in arrivals:
+                arrivals[event] = (time.perf_counter() - started) * 1000
+                if event == "error":
+                    raise RuntimeError(json.loads(line[len("data: "):]))
+    return arrivals
+
+
+async def measure(base_url: str, uploads: list) -> tuple:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+        totals = [await blocking(http, body) for body in uploads[::2]]
+        arrivals = defaultdict(list)
+        for body in uploads[1::2]:
+            for event, ms in (await streaming(http, body)).items():
+                arrivals[event].append(ms)
+    return totals, arrivals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=10, help="Requests per endpoint and path")
+    parser.add_argument("--openai-delay", type=float, default=1.0)
+    parser.add_argument("--tmdb-delay", type=float, default=0.3)
+    args = parser.parse_args()
+
+    stub_port = free_port()
+    run_in_thread(create_stub_app(args.openai_delay, args.tmdb_delay), stub_port)
+
+    # Point main.py at the stubs before it is imported; every TMDB call goes upstream
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{stub_port}/v1"
+    os.environ["TMDB_API_KEY"] = "stub"
+    os.environ["TMDB_API_URL"] = f"http://127.0.0.1:{stub_port}/3"
+    os.environ["TMDB_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "tmdb_cache.sqlite3")
+    for name in ("TMDB_SEARCH_TTL_SECONDS", "TMDB_DETAILS_TTL_SECONDS", "TMDB_PROVIDERS_TTL_SECONDS"):
+        os.environ[name] = "0"
+
+    import main as backend
+
+    backend.embedding_stage = (SimulatedEmbedder(80), SimulatedIndex())
+    api_port = free_port()
+    run_in_thread(backend.app, api_port)
+    base_url = f"http://127.0.0.1:{api_port}"
+    print(f"Stub latency: GPT-4o {args.openai_delay * 1000:.0f} ms, TMDB {args.tmdb_delay * 1000:.0f} ms per call; "
+          f"simulated CLIP 80 ms")
+
+    rng = np.random.default_rng(0)
+    for kind, label in (("gpt4o_vision", "GPT-4o path"), ("clip_embedding", "CLIP fast path")):
+        uploads = [tagged_png(kind, rng) for _ in range(2 * args.requests)]
+        totals, arrivals = asyncio.run(measure(base_url, uploads))
+        print(f"\n{label}: /recognize total p50 {np.percentile(totals, 50):.0f} ms")
+        print(f"  /recognize/stream, p50 arrival per event:")
+        for event in EVENTS:
+            if arrivals.get(event):
+                print(f"    {event:<16}{np.percentile(arrivals[event], 50):>7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Local stand-ins for the OpenAI and TMDB APIs.
+Each route sleeps for a configurable delay (a fixed number of seconds or a
+Latency distribution) and can fail a share of calls, so the backend can be
+load-tested offline without spending real API credits.
+
+Run standalone (e.g. for a multi-worker load test in another process):
+
+    python benchmarks/stub_upstreams.py --port 9100 --openai-latency lognormal:1.0:0.3 --tmdb-error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import random
+import socket
+import threading
+import time
+import zlib
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request, Response
+from PIL import Image
+
+STUB_TITLE = {"id": 66732, "name": "Stranger Things", "media_type": "tv", "first_air_date": "2016-07-15"}
+
+
+def estimate_prompt_tokens(messages: list) -> int:
+    """Rough GPT-4o prompt token count: ~4 characters per text token plus a fixed cost per image."""
+    tokens = 0
+    for message in messages:
+        parts = message["content"] if isinstance(message["content"], list) else [
+            {"type": "text", "text": message["content"]}
+        ]
+        for part in parts:
+            if part["type"] == "text":
+                tokens += len(part["text"]) // 4
+            else:
+                tokens += 85 if part["image_url"].get("detail") == "low" else 765
+    return tokens
+
+
+class Latency:
+    """
+    Upstream latency distribution, in seconds. Specs (see parse()):
+      fixed:S             always S
+      uniform:LOW:HIGH    uniform between LOW and HIGH
+      lognormal:P50:SIGMA median P50 with a long tail; SIGMA is the log-space spread
+    """
+
+    KINDS = ("fixed", "uniform", "lognormal")
+
+    def __init__(self, kind: str = "fixed", a: float = 0.0, b: float = 0.0):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution {kind!r}; expected one of {', '.join(self.KINDS)}")
+        self.kind = kind
+        self.a = a
+        self.b = b
+
+    @classmethod
+    def parse(cls, spec) -> "Latency":
+        """Accept a Latency, a number of seconds, or a "kind:a[:b]" spec."""
+        if isinstance(spec, Latency):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls("fixed", float(spec))
+        kind, _, params = str(spec).partition(":")
+        if not params:
+            return cls("fixed", float(kind))
+        values = [float(value) for value in params.split(":")]
+        return cls(kind, *values)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "lognormal":
+            return self.a * math.exp(rng.gauss(0.0, self.b))
+        return self.a
+
+    def __str__(self):
+        return f"{self.kind}:{self.a:g}" + (f":{self.b:g}" if self.kind != "fixed" else "")
+
+
+def stub_poster(name: str) -> bytes:
+    """A small JPEG whose colour is derived from the poster name, so each title embeds differently."""
+    seed = zlib.crc32(name.encode())
+    image = Image.new("RGB", (500, 750), (seed & 255, (seed >> 8) & 255, (seed >> 16) & 255))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+
+def create_stub_app(openai_delay=1.0, tmdb_delay=0.1, malformed_packed: bool = False,
+                    catalogue_size: int = 1000, openai_error_rate: float = 0.0, tmdb_error_rate: float = 0.0,
+                    seed: int = 0) -> FastAPI:
+    """
+    Build a FastAPI app that mimics the upstream endpoints main.py calls.
+    openai_delay/tmdb_delay are seconds or Latency specs; each call sleeps
+    for a sample, then fails with a 500 with probability *_error_rate
+    (seeded, so a run's distribution is reproducible).
+    stub.state.calls counts requests per route, stub.state.errors failures
+    per upstream, and stub.state.tokens sums estimated prompt tokens, so
+    callers can assert on upstream traffic. stub.state.latencies and
+    stub.state.error_rates ({"openai": ..., "tmdb": ...}) can be changed
+    while the stub runs, e.g. to simulate an outage.
+    Multi-image chat requests get a JSON array reply (or garbage when
+    malformed_packed is set, to exercise the per-image fallback).
+    discover/{movie,tv} pages through catalogue_size synthetic titles per
+    media type, and /t/p/{size}/{file} serves a generated poster for each.
+    Shift stub.state.catalogue_offset to make titles leave and join the
+    catalogue, and add ids to stub.state.reposter to give them a new poster.
+    """
+    stub = FastAPI()
+    stub.state.calls = Counter()
+    stub.state.errors = Counter()
+    stub.state.tokens = Counter()
+    stub.state.catalogue_size = catalogue_size
+    stub.state.catalogue_offset = 0
+    stub.state.reposter = set()
+    rng = random.Random(seed)
+    stub.state.latencies = {"openai": Latency.parse(openai_delay), "tmdb": Latency.parse(tmdb_delay)}
+    stub.state.error_rates = {"openai": openai_error_rate, "tmdb": tmdb_error_rate}
+
+    async def upstream(name: str):
+        """Wait out one sampled upstream latency, then maybe fail the call."""
+        await asyncio.sleep(stub.state.latencies[name].sample(rng))
+        error_rate = stub.state.error_rates[name]
+        if error_rate and rng.random() < error_rate:
+            stub.state.errors[name] += 1
+            raise HTTPException(status_code=500, detail=f"stub {name} error")
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt_tokens = estimate_prompt_tokens(body["messages"])
+        images = sum(
+            1 for part in body["messages"][-1]["content"]
+            if isinstance(part, dict) and part.get("type") == "image_url"
+        )
+        stub.state.calls["chat_completions"] += 1
+        stub.state.tokens["prompt"] += prompt_tokens
+        await upstream("openai")
+
+        answer = {
+            "title": STUB_TITLE["name"],
+            "media_type": STUB_TITLE["media_type"],
+            "year": 2016,
+            "confidence": 0.95,
+            "reasoning": "stub upstream"
+        }
+        if images > 1:
+            content = "not json" if malformed_packed else json.dumps(
+                [{"image": n, **answer} for n in range(1, images + 1)]
+            )
+        else:
+            content = json.dumps(answer)
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "gpt-4o",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 60 * images,
+                      "total_tokens": prompt_tokens + 60 * images}
+        }
+
+    @stub.get("/3/search/multi")
+    async def search_multi(query: str = ""):
+        stub.state.calls["search_multi"] += 1
+        await upstream("tmdb")
+        return {"page": 1, "results": [STUB_TITLE], "total_results": 1}
+
+    @stub.get("/3/discover/{media_type}")
+    async def discover(media_type: str, page: int = 1):
+        stub.state.calls["discover"] += 1
+        await upstream("tmdb")
+        name_key, date_key = ("title", "release_date") if media_type == "movie" else ("name", "first_air_date")
+        size, offset = stub.state.catalogue_size, stub.state.catalogue_offset
+        first = (page - 1) * 20
+        results = []
+        for n in range(offset + first, offset + min(first + 20, size)):
+            revision = "-v2" if 1000 + n in stub.state.reposter else ""
+            results.append({"id": 1000 + n, name_key: f"Stub {media_type} {n}", date_key: f"{1990 + n % 35}-06-01",
+                            "poster_path": f"/{media_type}-{1000 + n}{revision}.jpg",
+                            "backdrop_path": f"/{media_type}-{1000 + n}-backdrop0.jpg"})
+        return {"page": page, "results": results, "total_pages": -(-size // 20), "total_results": size}
+
+    @stub.get("/3/{media_type}/{media_id}/images")
+    async def images(media_type: str, media_id: str):
+        stub.state.calls["images"] += 1
+        await upstream("tmdb")
+        return {
+            "id": int(media_id),
+            "posters": [{"file_path": f"/{media_type}-{media_id}-poster{n}.jpg"} for n in range(3)],
+            "backdrops": [{"file_path": f"/{media_type}-{media_id}-backdrop{n}.jpg"} for n in range(4)],
+            "logos": [{"file_path": f"/{media_type}-{media_id}-logo0.png"}],
+        }
+
+    @stub.get("/t/p/{size}/{name}")
+    async def poster(size: str, name: str):
+        stub.state.calls["poster"] += 1
+        await upstream("tmdb")
+        return Response(stub_poster(name), media_type="image/jpeg")
+
+    def providers_payload(media_type: str, media_id: str) -> dict:
+        return {
+            "id": int(media_id),
+            "results": {
+                "US": {
+                    "link": f"https://www.themoviedb.org/{media_type}/{media_id}/watch",
+                    "flatrate": [{"provider_id": 8, "provider_name": "Netflix"}]
+                }
+            }
+        }
+
+    @stub.get("/3/{media_type}/{media_id}/watch/providers")
+    async def watch_providers(media_type: str, media_id: str):
+        stub.state.calls["watch_providers"] += 1
+        await upstream("tmdb")
+        return providers_payload(media_type, media_id)
+
+    @stub.get("/3/{media_type}/{media_id}")
+    async def details(media_type: str, media_id: str, append_to_response: str = ""):
+        stub.state.calls["details"] += 1
+        await upstream("tmdb")
+        payload = details_payload(media_type, media_id)
+        appended = set(append_to_response.split(","))
+        if "watch/providers" in appended:
+            payload["watch/providers"] = {"results": providers_payload(media_type, media_id)["results"]}
+        if "credits" in appended:
+            payload["credits"] = credits_payload()
+        return payload
+
+    return stub
+
+
+def details_payload(media_type: str, media_id: str) -> dict:
+    """A details response with TMDB's field set and typical sizes (a real one is several kB)."""
+    return {
+        **STUB_TITLE, "id": int(media_id), "adult": False, "backdrop_path": f"/{media_type}-{media_id}-backdrop0.jpg",
+        "poster_path": f"/{media_type}-{media_id}.jpg", "homepage": f"https://example.com/{media_type}/{media_id}",
+        "original_language": "en", "original_name": STUB_TITLE["name"], "popularity": 512.3, "status": "Ended",
+        "tagline": "Every ending has a beginning.", "vote_average": 8.6, "vote_count": 17000, "type": "Scripted",
+        "overview": "When a young boy vanishes, a small town uncovers a mystery involving secret experiments, "
+                    "terrifying supernatural forces and one strange little girl. " * 2,
+        "genres": [{"id": 18, "name": "Drama"}, {"id": 9648, "name": "Mystery"},
+                   {"id": 10765, "name": "Sci-Fi & Fantasy"}],
+        "production_companies": [{"id": 2700 + n, "logo_path": f"/company-{n}.png", "name": f"Stub Studio {n}",
+                                  "origin_country": "US"} for n in range(4)],
+        "production_countries": [{"iso_3166_1": "US", "name": "United States of America"}],
+        "spoken_languages": [{"english_name": "English", "iso_639_1": "en", "name": "English"}],
+        "networks": [{"id": 213, "logo_path": "/network.png", "name": "Netflix", "origin_country": ""}],
+        "number_of_seasons": 4, "number_of_episodes": 34, "episode_run_time": [50],
+        "seasons": [{"air_date": f"{2016 + n}-07-15", "episode_count": 8 + n, "id": 77680 + n,
+                     "name": f"Season {n + 1}", "overview": "The season's synopsis, a sentence or two long. " * 2,
+                     "poster_path": f"/season-{n}.jpg", "season_number": n + 1, "vote_average": 8.2}
+                    for n in range(4)],
+    }
+
+
+def credits_payload() -> dict:
+    person = {"adult": False, "gender": 2, "known_for_department": "Acting", "popularity": 40.1,
+              "profile_path": "/person.jpg", "credit_id": "5a0a4b1d9251414e6e00a1b2"}
+    return {
+        "cast": [{**person, "id": 1000 + n, "name": f"Stub Actor {n}", "original_name": f"Stub Actor {n}",
+                  "character": f"Character {n}", "order": n} for n in range(20)],
+        "crew": [{**person, "id": 2000 + n, "name": f"Stub Crew {n}", "original_name": f"Stub Crew {n}",
+                  "department": "Production", "job": "Executive Producer"} for n in range(20)],
+    }
+
+
+def free_port() -> int:
+    """Ask the OS for an unused TCP port on localhost."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_in_thread(app, port: int) -> uvicorn.Server:
+    """Serve an ASGI app on a background thread and wait until it is accepting connections."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the stub OpenAI and TMDB upstreams")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--openai-latency", default="1.0", help="Seconds or a Latency spec, e.g. lognormal:1.0:0.3")
+    parser.add_argument("--tmdb-latency", default="0.1")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--tmdb-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stub = create_stub_app(Latency.parse(args.openai_latency), Latency.parse(args.tmdb_latency),
+                           openai_error_rate=args.openai_error_rate, tmdb_error_rate=args.tmdb_error_rate,
+                           seed=args.seed)
+    uvicorn.run(stub, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+How many vision-model titles the local title index (title_index.py)
+resolves to a TMDB id without a search/multi call, how often it is right,
+and how long a lookup takes; plus how often the first search/multi result
+(the old behaviour) vs the re-ranked best result, with the index's near
+matches as hints, is the right title.
+
+Synthetic mode generates a catalogue with remakes and film/series pairs
+sharing a name, and simulated model answers: the exact title, a different
+casing, the main title without its subtitle or article, a typo, and a year
+that is sometimes missing or off by one. Search results are simulated as
+TMDB's popularity-ordered list of every similarly named title.
+
+    python benchmarks/title_index_benchmark.py [--size 50000] [--queries 5000]
+    python benchmarks/title_index_benchmark.py --paths movie_embeddings.snapdb,data/movie_ids.json.gz
+
+With --paths the index is built from real sources and only the build time,
+size and lookup latency over their own titles are reported.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.ocr_benchmark import ocr_noise, synthetic_catalogue
+from title_index import TitleIndex, rank_search_results, short_title
+
+SUBTITLES = ["Part One", "Reckoning", "The Return", "Origins", "Legacy", "Rising", "The Final Chapter"]
+
+
+def synthetic_entries(size: int, rng) -> list:
+    titles, ids, media_types, _ = synthetic_catalogue(size, rng)
+    entries = []
+    for title, media_id, media_type in zip(titles, ids, media_types):
+        if rng.random() < 0.1:
+            title = f"{title}: {rng.choice(SUBTITLES)}"
+        entries.append({
+            "media_id": str(media_id),
+            "media_type": str(media_type),
+            "title": title,
+            "year": int(rng.integers(1950, 2025)),
+            "popularity": float(rng.lognormal(1.0, 1.5)),
+            "alternates": [],
+        })
+    return entries
+
+
+def model_answer(entry: dict, rng) -> tuple:
+    """(title, year, media_type) as a vision model might name the entry."""
+    roll = rng.random()
+    title = entry["title"]
+    if roll < 0.15:
+        title = title.upper()
+    elif roll < 0.3:
+        title = short_title(title).title()
+    elif roll < 0.4:
+        title = ocr_noise(title, 0.05, rng)
+    year = entry["year"]
+    roll = rng.random()
+    if roll < 0.2:
+        year = None
+    elif roll < 0.3:
+        year += int(rng.choice([-1, 1]))
+    return title, year, entry["media_type"]
+
+
+def simulated_search(entries: list, by_short: dict, title: str) -> list:
+    """search/multi-style results: same-named titles, most popular first, in TMDB's field layout."""
+    rows = by_short.get(short_title(title), [])
+    results = []
+    for row in sorted(rows, key=lambda row: -entries[row]["popularity"]):
+        entry = entries[row]
+        name_field, date_field = ("title", "release_date") if entry["media_type"] == "movie" else \
+            ("name", "first_air_date")
+        results.append({"id": int(entry["media_id"]), "media_type": entry["media_type"],
+                        name_field: entry["title"], date_field: f"{entry['year']}-06-01",
+                        "popularity": entry["popularity"]})
+    return results
+
+
+def percentiles_us(latencies: list) -> str:
+    return f"p50 {np.percentile(latencies, 50):.1f} µs, p95 {np.percentile(latencies, 95):.1f} µs"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=50000, help="Synthetic catalogue size")
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--paths", help="Comma-separated real sources instead of a synthetic catalogue")
+    parser.add_argument("--min-score", type=float, default=float(os.getenv("TITLE_INDEX_MIN_SCORE", "0.9")))
+    parser.add_argument("--margin", type=float, default=float(os.getenv("TITLE_INDEX_MARGIN", "0.1")))
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    started = time.perf_counter()
+    if args.paths:
+        index = TitleIndex.load(args.paths.split(","))
+    else:
+        entries = synthetic_entries(args.size, rng)
+        index = TitleIndex(entries)
+    print(f"Indexed {len(index)} titles ({len(index.exact)} exact keys) in {time.perf_counter() - started:.2f}s\n")
+
+    if args.paths:
+        latencies = []
+        for row in rng.integers(len(index), size=args.queries):
+            started = time.perf_counter()
+            index.resolve(index.titles[row], index.years[row], index.media_types[row], args.min_score, args.margin)
+            latencies.append((time.perf_counter() - started) * 1e6)
+        print(f"Lookups of indexed titles: {percentiles_us(latencies)}")
+        return
+
+    by_short = {}
+    for row, entry in enumerate(entries):
+        by_short.setdefault(short_title(entry["title"]), []).append(row)
+
+    resolved = correct = 0
+    first_right = ranked_right = searched = 0
+    latencies = []
+    by_match = {}
+    for row in rng.integers(len(entries), size=args.queries):
+        entry = entries[row]
+        title, year, media_type = model_answer(entry, rng)
+        started = time.perf_counter()
+        candidate = index.resolve(title, year, media_type, args.min_score, args.margin)
+        latencies.append((time.perf_counter() - started) * 1e6)
+        if candidate is not None:
+            resolved += 1
+            right = candidate["media_id"] == entry["media_id"] and candidate["media_type"] == entry["media_type"]
+            correct += right
+            hits = by_match.setdefault(candidate["match"], [0, 0])
+            hits[0] += 1
+            hits[1] += right
+            continue
+        # Falls back to search/multi: compare the old first-result pick with the ranked one
+        results = [r for r in simulated_search(entries, by_short, title) if r["media_type"] == media_type]
+        if not results:
+            continue
+        searched += 1
+        hints = {(c["media_type"], c["media_id"]) for c in index.lookup(title, year, media_type)}
+        first_right += str(results[0]["id"]) == entry["media_id"]
+        ranked = rank_search_results(results, title, year, media_type, hints)
+        ranked_right += str(ranked[0]["id"]) == entry["media_id"]
+
+    shared = sum(1 for rows in by_short.values() if len(rows) > 1)
+    print(f"{args.queries} simulated model answers over {len(entries)} titles "
+          f"({shared} short titles shared by several entries)")
+    print(f"  resolved locally (no search/multi): {resolved / args.queries:.1%}")
+    print(f"  precision of local answers:         {correct / resolved if resolved else 0:.2%}")
+    for match, (count, right) in sorted(by_match.items()):
+        print(f"    {match:<6} {count:>6} answers, {right / count:.2%} right")
+    print(f"  lookup latency {percentiles_us(latencies)}")
+    print(f"\nFell back to search/multi with a result: {searched}")
+    if searched:
+        print(f"  first result right (old behaviour): {first_right / searched:.1%}")
+        print(f"  re-ranked best result right:        {ranked_right / searched:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Memory and CPU of upload handling for a ~10 MB photo: the old
+read -> verify -> re-read -> seek -> read -> decode sequence versus the
+single-pass read_upload/open_image path.
+
+Each variant runs in its own subprocess so peak RSS is measured cleanly.
+
+Usage: python benchmarks/upload_benchmark.py [--iterations 10] [--format JPEG]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PIL import Image
+from starlette.datastructures import UploadFile
+
+from benchmarks.preprocess_benchmark import synthetic_photo
+from image_preprocess import prepare_image
+from image_upload import open_image, read_upload
+
+
+def make_upload(data: bytes) -> UploadFile:
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    spool.write(data)
+    spool.seek(0)
+    return UploadFile(spool, size=len(data))
+
+
+async def old_path(file: UploadFile):
+    image_bytes = await file.read()
+    image = Image.open(BytesIO(image_bytes))
+    image.verify()
+    image_bytes = await file.read()
+    if not image_bytes:
+        await file.seek(0)
+        image_bytes = await file.read()
+    return prepare_image(Image.open(BytesIO(image_bytes)))
+
+
+async def new_path(file: UploadFile):
+    image_bytes, image_format = await read_upload(file, 64 * 1024 * 1024)
+    return prepare_image(open_image(image_bytes, image_format))
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process. Prefers VmHWM, because on Linux
+    ru_maxrss is inherited from the parent across fork/exec.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_variant(variant: str, upload_path: str, iterations: int) -> dict:
+    with open(upload_path, "rb") as handle:
+        data = handle.read()
+    handler = old_path if variant == "old" else new_path
+
+    baseline_rss = peak_rss_mb()
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    for _ in range(iterations):
+        asyncio.run(handler(make_upload(data)))
+    return {
+        "variant": variant,
+        "cpu_ms_per_upload": (time.process_time() - cpu_started) * 1000 / iterations,
+        "wall_ms_per_upload": (time.perf_counter() - wall_started) * 1000 / iterations,
+        "peak_rss_growth_mb": peak_rss_mb() - baseline_rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--format", default="JPEG", choices=["JPEG", "PNG"])
+    parser.add_argument("--variant", choices=["old", "new"], help=argparse.SUPPRESS)
+    parser.add_argument("--upload", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.upload, args.iterations)))
+        return
+
+    # Both sizes land near 10 MB
+    buffer = BytesIO()
+    if args.format == "JPEG":
+        synthetic_photo().save(buffer, format="JPEG", quality=96)
+    else:
+        synthetic_photo(2300, 1725).save(buffer, format="PNG")
+    with tempfile.NamedTemporaryFile(suffix=".img", delete=False) as handle:
+        handle.write(buffer.getvalue())
+        upload_path = handle.name
+
+    print(f"{args.format} upload: {len(buffer.getvalue()) / 1e6:.1f} MB, {args.iterations} iterations\n")
+    print(f"{'variant':<8}{'cpu ms':>10}{'wall ms':>10}{'peak RSS +MB':>15}")
+    try:
+        for variant in ("old", "new"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--variant", variant, "--upload", upload_path,
+                 "--iterations", str(args.iterations)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output)
+            print(f"{variant:<8}{result['cpu_ms_per_upload']:>10.1f}{result['wall_ms_per_upload']:>10.1f}"
+                  f"{result['peak_rss_growth_mb']:>15.1f}")
+    finally:
+        os.unlink(upload_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tail-latency controls for upstream calls (upstream.py), against local stub
+upstreams, through GET /api/v1/providers:
+
+  hedging   TMDB with a long-tailed latency; p50/p95/p99 with hedging off and on
+  retries   TMDB failing a share of calls; error rate with retries off and on
+  outage    TMDB failing every call after the cache was filled: stale answers
+            served, upstream calls made, and latency once the breaker opens
+  budget    TMDB hanging; how long a request waits with and without a request budget
+
+Usage: python benchmarks/upstream_benchmark.py [--requests 300] [--concurrency 16]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.stub_upstreams import Latency, create_stub_app, free_port, run_in_thread
+
+
+async def drive(base_url: str, ids: list, concurrency: int) -> tuple:
+    """GET providers for each id with bounded concurrency. Returns (latencies ms, status codes)."""
+    slots = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as http:
+        async def one(media_id):
+            async with slots:
+                started = time.perf_counter()
+                response = await http.get(f"/api/v1/providers/movie/{media_id}")
+                return (time.perf_counter() - started) * 1000, response.status_code
+
+        results = await asyncio.gather(*(one(media_id) for media_id in ids))
+    return [ms for ms, _ in results], [status for _, status in results]
+
+
+def describe(latencies: list, statuses: list) -> str:
+    failed = sum(1 for status in statuses if status != 200)
+    return (f"p50 {np.percentile(latencies, 50):>6.0f} ms  p95 {np.percentile(latencies, 95):>6.0f} ms  "
+            f"p99 {np.percentile(latencies, 99):>6.0f} ms  failed {failed}/{len(statuses)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--tail-latency", default="lognormal:0.04:0.9", help="TMDB latency for the hedging run")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="TMDB error rate for the retry run")
+    args = parser.parse_args()
+
+    stub = create_stub_app(1.0, 0.02)
+    stub_port = free_port()
+    run_in_thread(stub, stub_port)
+
+    # Point main.py at the stubs before it is imported; TTL 0 sends every lookup upstream
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{stub_port}/v1"
+    os.environ["TMDB_API_KEY"] = "stub"
+    os.environ["TMDB_API_URL"] = f"http://127.0.0.1:{stub_port}/3"
+    os.environ["TMDB_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "tmdb_cache.sqlite3")
+    os.environ["TMDB_PROVIDERS_TTL_SECONDS"] = "0"
+    os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+
+    import main as backend
+
+    api_port = free_port()
+    run_in_thread(backend.app, api_port)
+    base_url = f"http://127.0.0.1:{api_port}"
+    tmdb = backend.tmdb_upstream
+
+    def run(label: str, first_id: int = 1000) -> tuple:
+        ids = [first_id + n for n in range(args.requests)]
+        latencies, statuses = asyncio.run(drive(base_url, ids, args.concurrency))
+        print(f"  {label:<26}{describe(latencies, statuses)}")
+        return latencies, statuses
+
+    print(f"Hedging, TMDB latency {args.tail_latency} s:")
+    stub.state.latencies["tmdb"] = Latency.parse(args.tail_latency)
+    tmdb.hedge = False
+    run("hedging off")
+    tmdb.hedge = True  # the previous run filled the rolling p95
+    before = stub.state.calls["watch_providers"]
+    run("hedging on")
+    print(f"  {'':<26}hedge after {tmdb.hedge_delay() * 1000:.0f} ms, "
+          f"{stub.state.calls['watch_providers'] - before - args.requests} extra TMDB calls")
+    tmdb.hedge = False
+
+    # Ids nothing has cached yet, so failures can't be covered by stale copies
+    print(f"\nRetries, TMDB error rate {args.error_rate:.0%}, uncached ids:")
+    stub.state.latencies["tmdb"] = Latency.parse(0.02)
+    stub.state.error_rates["tmdb"] = args.error_rate
+    tmdb.retries = 0
+    run("retries off", 10000)
+    tmdb.retries = backend.TMDB_RETRIES
+    run(f"retries={tmdb.retries}, jittered", 20000)
+    stub.state.error_rates["tmdb"] = 0.0
+
+    print("\nOutage, after one successful pass filled the cache (entries already expired):")
+    run("healthy")
+    stub.state.error_rates["tmdb"] = 1.0
+    stale_before = backend.tmdb_cache.stale_served
+    calls_before = stub.state.calls["watch_providers"]
+    run("TMDB failing every call")
+    print(f"  {'':<26}{backend.tmdb_cache.stale_served - stale_before} stale answers, "
+          f"{stub.state.calls['watch_providers'] - calls_before} TMDB calls, breaker {tmdb.breaker.state}")
+    stub.state.error_rates["tmdb"] = 0.0
+    tmdb.breaker.record_success()
+
+    print("\nBudget, TMDB hanging for 8 s (HTTP timeout 10 s), fresh ids with no cached copy:")
+    stub.state.latencies["tmdb"] = Latency.parse(8.0)
+    fresh = [100000 + n for n in range(args.concurrency)]
+    for label, budget in (("no budget", float("inf")), ("REQUEST_BUDGET_SECONDS=1", 1.0)):
+        backend.REQUEST_BUDGET_SECONDS = budget
+        latencies, statuses = asyncio.run(drive(base_url, fresh, args.concurrency))
+        print(f"  {label:<26}{describe(latencies, statuses)}")
+        fresh = [media_id + len(fresh) for media_id in fresh]
+
+
+if __name__ == "__main__":
+    main()
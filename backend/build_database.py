@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 """
 Build a real vector database from movie posters
-Downloads posters from TMDB and generates CLIP embeddings
+Downloads posters from TMDB and generates CLIP embeddings. Movies already in
+the database with the same poster are reused rather than re-embedded, and the
+result is published as a new database version (see embedding_store.py)
 """
 
 import os
@@ -12,15 +14,17 @@ from PIL import Image
 from transformers import CLIPProcessor, CLIPModel
 from io import BytesIO
 
+from embedding_store import POSTER_ONLY, publish_database, read_database
+
 # TMDB configuration
 TMDB_API_KEY = os.getenv("TMDB_API_KEY", "YOUR_TMDB_API_KEY")
 TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p/w500"
 
 # Movies to add
 MOVIES = [
-    {"id": "27205", "title": "Inception", "poster_path": "/xlaY2zyzMfkhk0HSC5VUwzoZPU1.jpg"},
-    {"id": "157336", "title": "Interstellar", "poster_path": "/gEU2QniE6E77NI6lCU6MxlNBvIx.jpg"},
-    {"id": "299536", "title": "Avengers: Endgame", "poster_path": "/or06FN3Dka5tukK1e9sl16pB3iy.jpg"},
+    {"id": "27205", "title": "Inception", "year": "2010", "poster_path": "/xlaY2zyzMfkhk0HSC5VUwzoZPU1.jpg"},
+    {"id": "157336", "title": "Interstellar", "year": "2014", "poster_path": "/gEU2QniE6E77NI6lCU6MxlNBvIx.jpg"},
+    {"id": "299536", "title": "Avengers: Endgame", "year": "2019", "poster_path": "/or06FN3Dka5tukK1e9sl16pB3iy.jpg"},
 ]
 
 def download_poster(poster_path):
@@ -58,15 +62,22 @@ def main():
     print("✅ CLIP model loaded")
 
     # Generate embeddings
+    current = read_database('movie_embeddings.npz')
     database = {}
 
     for movie in MOVIES:
         print(f"\n🎥 Processing: {movie['title']}")
 
+        existing = current.get(f"movie/{movie['id']}")
+        if existing and (existing["poster_paths"], existing["views"]) == (movie["poster_path"], POSTER_ONLY):
+            print("  ✓ Poster unchanged, reusing embedding")
+            database[movie['id']] = existing["embeddings"]
+            continue
+
         try:
             # Download poster
             image = download_poster(movie['poster_path'])
-            print(f"  ✓ Downloaded poster")
+            print("  ✓ Downloaded poster")
 
             # Generate embedding
             embedding = generate_embedding(image, model, processor, device)
@@ -78,12 +89,19 @@ def main():
             print(f"  ✗ Error: {e}")
 
     # Save database
-    print(f"\n💾 Saving database...")
-    np.savez('movie_embeddings.npz',
-             ids=np.array(list(database.keys())),
-             embeddings=np.vstack(list(database.values())))
-
-    print(f"✅ Database saved to movie_embeddings.npz")
+    print("\n💾 Saving database...")
+    rows = [
+        {"ids": movie["id"], "media_types": "movie", "titles": movie["title"], "years": movie["year"],
+         "poster_paths": movie["poster_path"], "views": POSTER_ONLY,
+         "embeddings": database[movie["id"]], "view_kinds": ["poster"]}
+        for movie in MOVIES if movie["id"] in database
+    ]
+    if not rows:
+        print("❌ No embeddings generated, database not saved")
+        return
+    version = publish_database('movie_embeddings.npz', rows)
+
+    print(f"✅ Database version {version} saved to movie_embeddings.npz")
     print(f"   {len(database)} movies stored")
 
     # Print stats
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Build a vector index from an embedding database
+Reads a builder .npz (ids, media_types, embeddings) and writes an index file
+that main.py can load via EMBEDDING_DB_PATH
+"""
+
+import argparse
+
+import numpy as np
+
+from vector_index import INDEX_BACKENDS, load_index, save_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a flat or IVF index from an embedding database")
+    parser.add_argument("source", help="Input .npz written by a build_*database.py script")
+    parser.add_argument("output", help="Output index .npz")
+    parser.add_argument("--kind", choices=sorted(INDEX_BACKENDS), default="ivf")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default: 4 * sqrt(n))")
+    parser.add_argument("--nprobe", type=int, default=8, help="IVF lists scanned per query")
+    args = parser.parse_args()
+
+    source, ids, media_types = load_index(args.source, mmap=False)
+    # Carry the title metadata and (for multi-view databases) the view -> title mapping across
+    with np.load(args.source) as data:
+        columns = {key: data[key] for key in ("version", "titles", "years", "poster_paths", "views",
+                                              "view_owners", "view_kinds") if key in data}
+    if source.kind == "ivf":
+        embeddings = np.empty_like(source.vectors)
+        embeddings[source.positions] = source.vectors
+    else:
+        embeddings = np.asarray(source.embeddings)
+
+    print(f"📦 Building {args.kind} index over {len(embeddings)} vectors...")
+    if args.kind == "ivf":
+        index = INDEX_BACKENDS["ivf"].build(embeddings, nlist=args.nlist, nprobe=args.nprobe)
+        print(f"   {len(index.centroids)} lists, nprobe={index.nprobe}")
+    else:
+        index = INDEX_BACKENDS["flat"].build(embeddings)
+
+    save_index(args.output, index, ids, media_types, **columns)
+    print(f"✅ Index saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
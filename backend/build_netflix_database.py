@@ -1,101 +1,64 @@
 #!/usr/bin/env python3
 """
 Build vector database from top Netflix content
-Fetches top 50 shows/movies from TMDB and generates CLIP embeddings
+Streams TMDB discover pages, image downloads and batched CLIP embeddings
+through embedding_pipeline. Each title is embedded from several views
+(--views, default one poster, two backdrops and the logo) so in-playback
+frames and browse tiles match as well as posters do. Progress is checkpointed in --work-dir, so an
+interrupted run can simply be restarted with the same arguments.
+
+With --incremental the current database is diffed against today's catalogue:
+only new titles, changed posters and titles built with a different --views
+spec are embedded, titles that left the
+catalogue are dropped, and the result is published as a new version that a
+running API picks up without a restart.
+
+Usage: python build_netflix_database.py [--tv 25] [--movies 25] [--all-providers] [--incremental]
 """
 
+import argparse
+import asyncio
 import os
-import requests
-import numpy as np
+import time
+
 import torch
-from PIL import Image
-from transformers import CLIPProcessor, CLIPModel
-from io import BytesIO
 from dotenv import load_dotenv
-import time
+
+from embedding_pipeline import EmbeddingPipeline, signature, update_database
+from embedding_store import publish_database, read_database
+from embedding_search import ClipEmbedder
 
 # Load environment
 load_dotenv()
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
-TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p/w500"
-TMDB_API_URL = "https://api.themoviedb.org/3"
+TMDB_IMAGE_ROOT = os.getenv("TMDB_IMAGE_ROOT", "https://image.tmdb.org/t/p")
+TMDB_API_URL = os.getenv("TMDB_API_URL", "https://api.themoviedb.org/3")
 
 # Netflix provider ID on TMDB
 NETFLIX_PROVIDER_ID = 8
 
-def get_top_netflix_content(content_type="tv", limit=25):
-    """
-    Fetch top Netflix content from TMDB
-    content_type: 'tv' or 'movie'
-    """
-    url = f"{TMDB_API_URL}/discover/{content_type}"
-
-    all_results = []
-    page = 1
-
-    while len(all_results) < limit:
-        params = {
-            "api_key": TMDB_API_KEY,
-            "watch_region": "US",
-            "with_watch_providers": NETFLIX_PROVIDER_ID,
-            "sort_by": "popularity.desc",
-            "page": page
-        }
-
-        try:
-            print(f"Fetching {content_type} page {page}...")
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-
-            results = data.get("results", [])
-            if not results:
-                break
-
-            all_results.extend(results)
-            page += 1
-
-            # Rate limiting
-            time.sleep(0.3)
-
-        except Exception as e:
-            print(f"Error fetching {content_type}: {e}")
-            break
-
-    return all_results[:limit]
-
-def download_poster(poster_path):
-    """Download a poster image from TMDB"""
-    if not poster_path:
-        return None
-
-    url = f"{TMDB_IMAGE_BASE}{poster_path}"
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return Image.open(BytesIO(response.content))
-    except Exception as e:
-        print(f"  ✗ Error downloading poster: {e}")
-        return None
-
-def generate_embedding(image, model, processor, device):
-    """Generate CLIP embedding for an image"""
-    try:
-        inputs = processor(images=image, return_tensors="pt").to(device)
-
-        with torch.no_grad():
-            image_embedding = model.get_image_features(**inputs)
-
-        # Normalize and convert to numpy
-        image_embedding = image_embedding.cpu().numpy()
-        image_embedding = image_embedding / np.linalg.norm(image_embedding)
-
-        return image_embedding
-    except Exception as e:
-        print(f"  ✗ Error generating embedding: {e}")
-        return None
+DEFAULT_VIEWS = "poster:1,backdrop:2,logo:1"
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Build the CLIP embedding database from TMDB posters")
+    parser.add_argument("--tv", type=int, default=25, help="Top TV shows to embed")
+    parser.add_argument("--movies", type=int, default=25, help="Top movies to embed")
+    parser.add_argument("--all-providers", action="store_true", help="Don't restrict discover to Netflix")
+    parser.add_argument("--views", default=DEFAULT_VIEWS,
+                        help="Images embedded per title, e.g. poster:1 or poster:1,backdrop:2,logo:1")
+    parser.add_argument("--output", default="movie_embeddings.npz")
+    parser.add_argument("--work-dir", default="build_checkpoint", help="Checkpoint directory (pages, posters, shards)")
+    parser.add_argument("--api-rate", type=float, default=30.0, help="TMDB API requests per second")
+    parser.add_argument("--image-rate", type=float, default=100.0, help="Poster downloads per second")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent poster downloads")
+    parser.add_argument("--batch-size", type=int, default=32, help="Titles (all their views) per CLIP forward pass")
+    parser.add_argument("--embed-workers", type=int, default=1, help="CLIP batches run in parallel")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only embed titles new or re-postered since the current database")
+    parser.add_argument("--keep-versions", type=int, default=3, help="Published versions kept for rollback")
+    args = parser.parse_args()
+
     print("🎬 Building SnapnSee Netflix Vector Database")
     print("=" * 60)
 
@@ -103,84 +66,62 @@ def main():
         print("❌ Error: TMDB_API_KEY not set in .env file")
         return
 
-    # Load CLIP model
+    # Split the CPU cores between parallel CLIP batches
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // args.embed_workers))
     print("\n📦 Loading CLIP model...")
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Using device: {device}")
-
-    model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(device)
-    processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+    embedder = ClipEmbedder()
     print("✅ CLIP model loaded")
 
-    # Fetch top Netflix content
-    print("\n🎯 Fetching top Netflix content from TMDB...")
-    print("Getting top 25 TV shows...")
-    tv_shows = get_top_netflix_content("tv", limit=25)
-    print(f"✅ Found {len(tv_shows)} TV shows")
-
-    print("Getting top 25 movies...")
-    movies = get_top_netflix_content("movie", limit=25)
-    print(f"✅ Found {len(movies)} movies")
-
-    all_content = tv_shows + movies
-    print(f"\n📊 Total content to process: {len(all_content)}")
-
-    # Generate embeddings
-    database = {}
-    successful = 0
-    failed = 0
-
-    for idx, item in enumerate(all_content, 1):
-        media_type = "tv" if "name" in item else "movie"
-        title = item.get("name") or item.get("title", "Unknown")
-        media_id = str(item["id"])
-        poster_path = item.get("poster_path")
-
-        print(f"\n[{idx}/{len(all_content)}] Processing: {title} ({media_type})")
-        print(f"  ID: {media_id}")
-
-        if not poster_path:
-            print(f"  ✗ No poster available")
-            failed += 1
-            continue
-
-        # Download poster
-        image = download_poster(poster_path)
-        if image is None:
-            failed += 1
-            continue
-
-        print(f"  ✓ Downloaded poster")
-
-        # Generate embedding
-        embedding = generate_embedding(image, model, processor, device)
-        if embedding is None:
-            failed += 1
-            continue
-
-        print(f"  ✓ Generated embedding: shape {embedding.shape}")
-        database[media_id] = embedding
-        successful += 1
+    filters = {} if args.all_providers else {
+        "watch_region": "US",
+        "with_watch_providers": NETFLIX_PROVIDER_ID,
+    }
+    pipeline = EmbeddingPipeline(
+        embedder,
+        work_dir=args.work_dir,
+        api_url=TMDB_API_URL,
+        image_root=TMDB_IMAGE_ROOT,
+        api_key=TMDB_API_KEY,
+        views=args.views,
+        api_rate=args.api_rate,
+        image_rate=args.image_rate,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        embed_workers=args.embed_workers,
+    )
+
+    database = read_database(args.output) if args.incremental else {}
+    if args.incremental:
+        print(f"\n📂 Current database: {len(database)} titles")
+
+    print(f"\n🎯 Embedding top {args.tv} TV shows and {args.movies} movies...")
+    start = time.perf_counter()
+    meters = asyncio.run(pipeline.run(
+        {"tv": args.tv, "movie": args.movies},
+        filters,
+        known={key: signature(row) for key, row in database.items()},
+        refresh_pages=args.incremental,
+    ))
+    print(f"   Pipeline finished in {time.perf_counter() - start:.1f}s")
 
     # Save database
     print(f"\n💾 Saving database...")
-    if len(database) > 0:
-        np.savez('movie_embeddings.npz',
-                 ids=np.array(list(database.keys())),
-                 embeddings=np.vstack(list(database.values())))
-
-        print(f"✅ Database saved to movie_embeddings.npz")
-        print(f"   {successful} items stored successfully")
-        print(f"   {failed} items failed")
+    complete = meters["discover"].failed == 0
+    if not complete:
+        print("⚠️  Some discover pages failed; keeping titles that were not seen instead of dropping them")
+    rows, counts = update_database(database, args.work_dir, pipeline.catalogue, complete)
+    if rows:
+        version = publish_database(args.output, rows, keep=args.keep_versions)
+        print(f"✅ Database version {version} saved to {args.output}")
+        print(f"   {len(rows)} items stored: " + ", ".join(f"{count} {name}" for name, count in counts.items()))
     else:
         print("❌ No embeddings generated, database not saved")
 
     # Print summary
     print("\n📊 Database Summary:")
-    print(f"   Total processed: {len(all_content)}")
-    print(f"   Successful: {successful}")
-    print(f"   Failed: {failed}")
-    print(f"   Success rate: {(successful/len(all_content)*100):.1f}%")
+    for meter in meters.values():
+        print(f"   {meter.describe()}")
+
 
 if __name__ == "__main__":
     main()
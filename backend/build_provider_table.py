@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Refresh data/tmdb_providers.json from TMDB's watch provider lists.
+
+Fetches every movie and TV provider for a region, tags each one with our
+simplified service id (via the same regex the API falls back to), and keeps
+any service ids already pinned in the existing table so hand corrections
+survive a refresh.
+
+Usage: python build_provider_table.py [--region US]
+"""
+
+import argparse
+import json
+import os
+
+import requests
+from dotenv import load_dotenv
+
+from provider_catalog import service_from_name
+
+load_dotenv()
+TMDB_API_KEY = os.getenv("TMDB_API_KEY")
+TMDB_API_URL = "https://api.themoviedb.org/3"
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tmdb_providers.json")
+
+
+def fetch_providers(media_type: str, region: str) -> list:
+    response = requests.get(
+        f"{TMDB_API_URL}/watch/providers/{media_type}",
+        params={"api_key": TMDB_API_KEY, "watch_region": region},
+        timeout=30,
+    )
+    response.raise_for_status()
+    return response.json().get("results", [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--region", default="US")
+    parser.add_argument("--output", default=TABLE_PATH)
+    args = parser.parse_args()
+    if not TMDB_API_KEY:
+        parser.error("TMDB_API_KEY is not set")
+
+    pinned = {}
+    if os.path.exists(args.output):
+        with open(args.output) as handle:
+            pinned = {row["provider_id"]: row["service"] for row in json.load(handle)["providers"]}
+
+    providers = {}
+    for media_type in ("movie", "tv"):
+        for row in fetch_providers(media_type, args.region):
+            provider_id = row["provider_id"]
+            providers[provider_id] = {
+                "provider_id": provider_id,
+                "provider_name": row["provider_name"],
+                "service": pinned.get(provider_id, service_from_name(row["provider_name"])),
+            }
+
+    rows = sorted(providers.values(), key=lambda row: row["provider_id"])
+    with open(args.output, "w") as handle:
+        json.dump(
+            {"source": f"TMDB watch/providers ({args.region}); refresh with build_provider_table.py", "providers": rows},
+            handle,
+            indent=2,
+        )
+    mapped = sum(1 for row in rows if row["service"])
+    print(f"Wrote {len(rows)} providers ({mapped} mapped to a service) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Compact, memory-mappable embedding store (.snapdb).
+
+A builder .npz has to be unpacked into every uvicorn worker and only carries
+ids, so showing a title means another TMDB call. A .snapdb file is a small
+header followed by raw, aligned column sections that are memory-mapped in
+place, so every worker shares the same page-cache pages:
+
+    magic    8 bytes   b"SNAPEMB\\0"
+    length   uint32    size of the JSON header that follows
+    header   JSON      format, version, count, dim, dtype and a table of
+                       {section: [offset, dtype, shape]}, offsets relative to
+                       the first 64-byte boundary after the header
+    sections embeddings  (views, dim) float16, or int8 plus scales (views,) float32
+             view_owners (views,) uint32         title row of each view, non-decreasing
+             view_kinds  (views,) uint8          index into VIEW_KINDS
+             ids         (count,) int64          TMDB id
+             media_types (count,) uint8          index into MEDIA_TYPES
+             years       (count,) uint16         0 when unknown
+             titles / poster_paths               utf-8 heap + (count + 1,) uint32 offsets
+
+int8 rows are quantised symmetrically with a per-row scale, so
+code * scale approximates the original L2-normalised vector. Format 1 files
+(one poster view per title) have no view_owners/view_kinds sections and are
+still readable.
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+from embedding_store import flatten_views
+from vector_index import QuantizedFlatIndex
+
+MAGIC = b"SNAPEMB\0"
+FORMAT_VERSION = 2
+READABLE_FORMATS = (1, 2)
+ALIGNMENT = 64
+MEDIA_TYPES = ("movie", "tv")
+VIEW_KINDS = ("poster", "backdrop", "logo")
+DTYPES = ("float16", "int8")
+
+
+def is_compact_store(path: str) -> bool:
+    try:
+        with open(path, "rb") as handle:
+            return handle.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _string_heap(values: list) -> tuple:
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def quantize(embeddings: np.ndarray, dtype: str) -> dict:
+    """Return the embedding section(s) for a float32 matrix in the given storage dtype."""
+    if dtype == "float16":
+        return {"embeddings": embeddings.astype(np.float16)}
+    if dtype == "int8":
+        peak = np.abs(embeddings).max(axis=1)
+        scales = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+        return {"embeddings": codes, "scales": scales}
+    raise ValueError(f"Unsupported store dtype {dtype!r}; expected one of {DTYPES}")
+
+
+def write_store(path: str, rows: list, dtype: str = "float16", version: int = 0):
+    """
+    Write rows (dicts with ids/media_types/titles/years/poster_paths plus
+    "embeddings" and "view_kinds", as produced by embedding_store.read_database)
+    to path, atomically.
+    """
+    views = flatten_views(rows)
+    embeddings = views["embeddings"]
+    title_offsets, title_bytes = _string_heap([row["titles"] for row in rows])
+    poster_offsets, poster_bytes = _string_heap([row["poster_paths"] for row in rows])
+    sections = {
+        **quantize(embeddings, dtype),
+        "view_owners": views["view_owners"].astype(np.uint32),
+        "view_kinds": np.array([VIEW_KINDS.index(kind) for kind in views["view_kinds"]], dtype=np.uint8),
+        "ids": np.array([int(row["ids"]) for row in rows], dtype=np.int64),
+        "media_types": np.array([MEDIA_TYPES.index(row["media_types"]) for row in rows], dtype=np.uint8),
+        "years": np.array([int(row["years"] or 0) for row in rows], dtype=np.uint16),
+        "title_offsets": title_offsets,
+        "title_bytes": title_bytes,
+        "poster_offsets": poster_offsets,
+        "poster_bytes": poster_bytes,
+    }
+
+    table, offset = {}, 0
+    for name, array in sections.items():
+        table[name] = [offset, array.dtype.str, list(array.shape)]
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "version": version,
+        "count": len(rows),
+        "dim": embeddings.shape[1],
+        "dtype": dtype,
+        "sections": table,
+    }).encode("utf-8")
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(MAGIC + struct.pack("<I", len(header)) + header)
+        data_start = -(-handle.tell() // ALIGNMENT) * ALIGNMENT
+        for name, array in sections.items():
+            handle.seek(data_start + table[name][0])
+            handle.write(np.ascontiguousarray(array).tobytes())
+        handle.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+class CompactStore:
+    """Read-only view of a .snapdb file; every section is a memory map."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as handle:
+            if handle.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a compact embedding store")
+            (length,) = struct.unpack("<I", handle.read(4))
+            header = json.loads(handle.read(length))
+            data_start = -(-handle.tell() // ALIGNMENT) * ALIGNMENT
+
+        if header["format"] not in READABLE_FORMATS:
+            raise ValueError(f"{path} uses store format {header['format']}, expected one of {READABLE_FORMATS}")
+        self.version = header["version"]
+        self.dtype = header["dtype"]
+        self.dim = header["dim"]
+        self._sections = {
+            name: np.memmap(path, dtype=np.dtype(dtype), mode="r", offset=data_start + offset, shape=tuple(shape))
+            if np.prod(shape) else np.zeros(shape, dtype=np.dtype(dtype))
+            for name, (offset, dtype, shape) in header["sections"].items()
+        }
+        self.embeddings = self._sections["embeddings"]
+        self.scales = self._sections.get("scales")
+        self.view_owners = self._sections.get("view_owners")
+        self.ids = self._sections["ids"]
+        self.media_type_codes = self._sections["media_types"]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def media_types(self) -> np.ndarray:
+        return np.array(MEDIA_TYPES)[self.media_type_codes]
+
+    def _string(self, name: str, i: int) -> str:
+        offsets = self._sections[f"{name}_offsets"]
+        return self._sections[f"{name}_bytes"][offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+    def metadata(self, i: int) -> dict:
+        """Title, year and poster_path of row i (None when unknown)."""
+        year = int(self._sections["years"][i])
+        return {
+            "title": self._string("title", i) or None,
+            "year": year or None,
+            "poster_path": self._string("poster", i) or None,
+        }
+
+    def index(self) -> QuantizedFlatIndex:
+        return QuantizedFlatIndex(self.embeddings, self.scales)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Convert an embedding database .npz into a compact .snapdb store
+Writes a float16 or int8 matrix plus the id/media_type/title/year/poster_path
+table (see compact_store.py) that main.py can memory-map via EMBEDDING_DB_PATH
+
+Usage: python convert_embeddings.py movie_embeddings.npz movie_embeddings.snapdb [--dtype float16]
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from compact_store import DTYPES, CompactStore, write_store
+from embedding_store import COLUMNS, POSTER_ONLY, read_database, read_version
+
+
+def legacy_rows(path: str, media_type: str) -> list:
+    """Rows from an early builder file that has only ids and embeddings."""
+    with np.load(path) as data:
+        return [
+            {**{name: "" for name in COLUMNS}, "ids": str(media_id), "media_types": media_type,
+             "views": POSTER_ONLY, "embeddings": embedding[np.newaxis], "view_kinds": ["poster"]}
+            for media_id, embedding in zip(data["ids"], data["embeddings"])
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an embedding .npz into a compact .snapdb store")
+    parser.add_argument("source", help="Input .npz written by a build_*database.py script")
+    parser.add_argument("output", help="Output .snapdb")
+    parser.add_argument("--dtype", choices=DTYPES, default="int8", help="Embedding storage type")
+    parser.add_argument("--media-type", choices=("movie", "tv"),
+                        help="Media type to assume for files built before media_types were stored")
+    args = parser.parse_args()
+
+    with np.load(args.source) as data:
+        legacy = "media_types" not in data
+    if legacy and not args.media_type:
+        parser.error(f"{args.source} has no media_types array; pass --media-type or rebuild it")
+    rows = legacy_rows(args.source, args.media_type) if legacy else list(read_database(args.source).values())
+
+    print(f"📦 Converting {len(rows)} embeddings to {args.dtype}...")
+    write_store(args.output, rows, dtype=args.dtype, version=read_version(args.source))
+
+    store = CompactStore(args.output)
+    source_mb = os.path.getsize(args.source) / 1e6
+    output_mb = os.path.getsize(args.output) / 1e6
+    print(f"✅ Store saved to {args.output} (version {store.version}, {len(store)} titles, "
+          f"{len(store.embeddings)} views, dim {store.dim})")
+    print(f"   {source_mb:.2f} MB -> {output_mb:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+"""
+Streaming, resumable build pipeline for the CLIP embedding database.
+
+Three stages run concurrently and hand work to each other over bounded
+queues, so a slow stage applies backpressure instead of piling up memory:
+
+  discover  pages through TMDB discover/{movie,tv}
+  download  picks each title's views (see parse_views) and fetches them
+            from the TMDB image CDN
+  embed     decodes the views and runs CLIP in batches on worker threads
+
+TMDB and CDN requests each go through a token bucket, so concurrency never
+turns into a burst of 429s. Every expensive result is checkpointed under a
+work directory: discover pages and image lists as JSON, images as files named
+after their TMDB file_path, and each embedded batch as an .npz shard. A rerun
+skips titles that already have a shard row for the same poster and view spec,
+and reuses images already on disk, so an interrupted build resumes where it
+stopped.
+
+merge_shards() publishes the shards as a new version of the database that
+main.py and build_index.py read (see embedding_store). For incremental
+updates, run() is given the current database so only new or re-postered
+titles are embedded, and update_database() folds those into it.
+"""
+
+import asyncio
+import glob
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+from PIL import Image
+
+from embedding_store import COLUMNS, POSTER_ONLY, flatten_views, publish_database, view_starts
+
+# TMDB serves 20 results per discover page and refuses pages past 500
+DISCOVER_PAGE_SIZE = 20
+DISCOVER_MAX_PAGES = 500
+RETRY_ATTEMPTS = 3
+
+# TMDB image size and /images list for each kind of view
+VIEW_SIZES = {"poster": "w500", "backdrop": "w780", "logo": "w500"}
+VIEW_LISTS = {"poster": "posters", "backdrop": "backdrops", "logo": "logos"}
+
+
+class TokenBucket:
+    """Async token bucket allowing `rate` acquisitions per second, bursting to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out first come, first served
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class StageMeter:
+    """Counts work done by one pipeline stage and its throughput while active."""
+
+    def __init__(self, name: str, unit: str):
+        self.name = name
+        self.unit = unit
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes = 0
+        self._first = None
+        self._last = None
+
+    def add(self, count: int = 1, nbytes: int = 0):
+        now = time.monotonic()
+        if self._first is None:
+            self._first = now
+        self._last = now
+        self.done += count
+        self.bytes += nbytes
+
+    def rate(self) -> float:
+        if self._first is None or self._last == self._first:
+            return 0.0
+        return self.done / (self._last - self._first)
+
+    def describe(self) -> str:
+        text = f"{self.name} {self.done} {self.unit} ({self.rate():.1f}/s"
+        if self.bytes and self._last != self._first:
+            text += f", {self.bytes / (self._last - self._first) / 1e6:.1f} MB/s"
+        text += ")"
+        if self.skipped:
+            text += f" +{self.skipped} cached"
+        if self.failed:
+            text += f" {self.failed} failed"
+        return text
+
+
+def title_key(media_type: str, media_id) -> str:
+    """Movie and TV ids overlap on TMDB, so titles are keyed by both."""
+    return f"{media_type}/{media_id}"
+
+
+def parse_views(spec: str) -> dict:
+    """
+    Parse a view spec like "poster:1,backdrop:2,logo:1" (how many images of
+    each kind to embed per title) into an ordered dict.
+    """
+    views = {}
+    for part in spec.split(","):
+        kind, _, count = part.strip().partition(":")
+        if kind not in VIEW_SIZES:
+            raise ValueError(f"Unknown view kind {kind!r}; expected one of {', '.join(VIEW_SIZES)}")
+        views[kind] = int(count or 1)
+    return views
+
+
+def write_atomic(path: str, data: bytes):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(data)
+    os.replace(tmp_path, path)
+
+
+def signature(row: dict) -> tuple:
+    """What a stored title must match to be reused: its poster and the view spec it was embedded with."""
+    return row["poster_paths"], row["views"]
+
+
+def load_shard_keys(work_dir: str) -> dict:
+    """Return {title key: signature} for every title already embedded in a shard."""
+    return {key: signature(row) for key, row in read_shards(work_dir).items()}
+
+
+def read_shards(work_dir: str) -> dict:
+    """Return {title key: row dict} across all shards (later shards win for repeated keys)."""
+    rows = {}
+    for shard in sorted(glob.glob(os.path.join(work_dir, "shards", "shard-*.npz"))):
+        with np.load(shard) as data:
+            count = len(data["keys"])
+            columns = {name: data[name].astype(str) if name in data else np.full(count, "") for name in COLUMNS}
+            if "views" not in data:
+                columns["views"] = np.full(count, POSTER_ONLY)
+            embeddings = data["embeddings"]
+            owners = data["view_owners"] if "view_owners" in data else np.arange(count)
+            kinds = data["view_kinds"].astype(str) if "view_kinds" in data else np.full(count, "poster")
+            bounds = np.append(view_starts(owners, count), len(owners))
+            for i, key in enumerate(data["keys"].astype(str)):
+                rows[key] = {
+                    **{name: str(columns[name][i]) for name in COLUMNS},
+                    "embeddings": embeddings[bounds[i]:bounds[i + 1]],
+                    "view_kinds": list(kinds[bounds[i]:bounds[i + 1]]),
+                }
+    return rows
+
+
+def merge_shards(work_dir: str, output: str) -> int:
+    """Publish every shard row as a new version of the database at output; returns the row count."""
+    rows = read_shards(work_dir)
+    if rows:
+        publish_database(output, list(rows.values()))
+    return len(rows)
+
+
+def update_database(database: dict, work_dir: str, catalogue: dict, complete: bool) -> tuple:
+    """
+    Apply one incremental run to the current database rows: keep rows whose
+    poster and view spec are unchanged, take new or re-embedded rows from the
+    shards, and
+    drop titles missing from the catalogue (only when every discover page was
+    fetched, so a failed page never deletes titles). A title whose new poster
+    failed to embed keeps its old row. Returns (rows, counts).
+    """
+    shards = read_shards(work_dir)
+    rows, counts = [], {"kept": 0, "embedded": 0, "stale": 0, "dropped": 0, "missing": 0}
+    for key, item in catalogue.items():
+        for source, count in ((database, "kept"), (shards, "embedded")):
+            row = source.get(key)
+            if row is not None and signature(row) == (item["poster_path"], item["views"]):
+                rows.append(row)
+                counts[count] += 1
+                break
+        else:
+            if key in database:
+                rows.append(database[key])
+                counts["stale"] += 1
+            else:
+                counts["missing"] += 1
+    for key, row in database.items():
+        if key not in catalogue:
+            if complete:
+                counts["dropped"] += 1
+            else:
+                rows.append(row)
+                counts["kept"] += 1
+    return rows, counts
+
+
+def embed_views(embedder, batch: list) -> tuple:
+    """
+    Decode a batch of (item, [(kind, image file), ...]) entries and embed
+    every readable view in one forward pass. Returns (items, rows) where each
+    row carries the title's "embeddings" and "view_kinds"; titles with no
+    readable view are left out.
+    """
+    items, kinds, images = [], [], []
+    for item, views in batch:
+        decoded = []
+        for kind, image_file in views:
+            try:
+                with Image.open(image_file) as image:
+                    # CLIP only needs 224px, so let JPEG decode at reduced scale
+                    image.draft("RGB", (448, 448))
+                    decoded.append((kind, image.convert("RGB")))
+            except (OSError, ValueError) as e:
+                print(f"WARN: Could not decode {image_file}: {e}")
+        if decoded:
+            items.append(item)
+            kinds.append([kind for kind, _ in decoded])
+            images.extend(image for _, image in decoded)
+    if not images:
+        return [], []
+
+    embeddings = embedder.embed_batch(images)
+    bounds = np.cumsum([0] + [len(view_kinds) for view_kinds in kinds])
+    return items, [
+        {"embeddings": embeddings[start:stop], "view_kinds": view_kinds}
+        for start, stop, view_kinds in zip(bounds[:-1], bounds[1:], kinds)
+    ]
+
+
+class EmbeddingPipeline:
+    """
+    One build run. `embedder` is anything with embed_batch(images) -> (n, d)
+    array, normally embedding_search.ClipEmbedder.
+    """
+
+    def __init__(self, embedder, work_dir: str, api_url: str, image_root: str, api_key: str,
+                 views: str = POSTER_ONLY, api_rate: float = 30.0, image_rate: float = 100.0,
+                 concurrency: int = 16, batch_size: int = 32, embed_workers: int = 1,
+                 report_every: float = 5.0):
+        self.embedder = embedder
+        self.work_dir = work_dir
+        self.api_url = api_url.rstrip("/")
+        self.image_root = image_root.rstrip("/")
+        self.views = parse_views(views)
+        self.view_spec = ",".join(f"{kind}:{count}" for kind, count in self.views.items())
+        self.api_key = api_key
+        self.api_bucket = TokenBucket(api_rate)
+        self.image_bucket = TokenBucket(image_rate)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.embed_workers = embed_workers
+        self.report_every = report_every
+        self.meters = {
+            "discover": StageMeter("discover", "pages"),
+            "download": StageMeter("download", "images"),
+            "embed": StageMeter("embed", "titles"),
+        }
+        for sub_dir in ("pages", "image_lists", "posters", "shards"):
+            os.makedirs(os.path.join(work_dir, sub_dir), exist_ok=True)
+
+    async def run(self, targets: dict, filters: dict = None, known: dict = None,
+                  refresh_pages: bool = False) -> dict:
+        """
+        Embed the top `targets[media_type]` titles by popularity for each
+        media type, with optional extra discover params (e.g. provider filters).
+        Titles in `known` ({key: signature}, e.g. the current database) with
+        an unchanged poster and view spec are skipped; refresh_pages ignores cached discover
+        pages so an incremental update sees today's catalogue. Afterwards
+        self.catalogue holds every title discovered. Returns the stage meters.
+        """
+        self._done = {**(known or {}), **load_shard_keys(self.work_dir)}
+        self._refresh_pages = refresh_pages
+        self.catalogue = {}
+        shards = glob.glob(os.path.join(self.work_dir, "shards", "shard-*.npz"))
+        self._next_shard = 1 + max((int(os.path.basename(s)[6:-4]) for s in shards), default=0)
+
+        download_queue = asyncio.Queue(maxsize=self.concurrency * 4)
+        embed_queue = asyncio.Queue(maxsize=self.batch_size * self.embed_workers * 2)
+        limits = httpx.Limits(max_connections=self.concurrency * 2, max_keepalive_connections=self.concurrency * 2)
+
+        async with httpx.AsyncClient(timeout=30.0, limits=limits) as http:
+            self._http = http
+            reporter = asyncio.create_task(self._report())
+            downloaders = [asyncio.create_task(self._download(download_queue, embed_queue))
+                           for _ in range(self.concurrency)]
+            embedder = asyncio.create_task(self._embed(embed_queue))
+            try:
+                await asyncio.gather(*(
+                    self._discover(media_type, limit, filters or {}, download_queue)
+                    for media_type, limit in targets.items()
+                ))
+                for _ in downloaders:
+                    await download_queue.put(None)
+                await asyncio.gather(*downloaders)
+                await embed_queue.put(None)
+                await embedder
+            finally:
+                reporter.cancel()
+                for task in (*downloaders, embedder):
+                    task.cancel()
+        print(f"DONE: {self.progress()}")
+        return self.meters
+
+    def progress(self) -> str:
+        return " | ".join(meter.describe() for meter in self.meters.values())
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.report_every)
+            print(f"PROGRESS: {self.progress()}")
+
+    async def _get(self, url: str, bucket: TokenBucket, params: dict = None) -> httpx.Response:
+        for attempt in range(RETRY_ATTEMPTS):
+            await bucket.acquire()
+            try:
+                response = await self._http.get(url, params=params)
+            except httpx.TransportError:
+                if attempt == RETRY_ATTEMPTS - 1:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+                continue
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt < RETRY_ATTEMPTS - 1:
+                    await asyncio.sleep(float(response.headers.get("retry-after", 2 ** attempt)))
+                    continue
+            response.raise_for_status()
+            return response
+
+    async def _discover_page(self, media_type: str, page: int, filters: dict) -> dict:
+        cache_file = os.path.join(self.work_dir, "pages", f"{media_type}-{page:05d}.json")
+        if os.path.exists(cache_file) and not self._refresh_pages:
+            self.meters["discover"].skipped += 1
+            with open(cache_file) as handle:
+                return json.load(handle)
+
+        params = {"api_key": self.api_key, "sort_by": "popularity.desc", "page": page, **filters}
+        response = await self._get(f"{self.api_url}/discover/{media_type}", self.api_bucket, params)
+        write_atomic(cache_file, response.content)
+        self.meters["discover"].add(nbytes=len(response.content))
+        return response.json()
+
+    async def _discover(self, media_type: str, limit: int, filters: dict, download_queue: asyncio.Queue):
+        pages_needed = min(math.ceil(limit / DISCOVER_PAGE_SIZE), DISCOVER_MAX_PAGES)
+        first = await self._discover_page(media_type, 1, filters)
+        last_page = min(pages_needed, first.get("total_pages", 1))
+
+        # Queue results in page order as soon as each page (and all before it) is in
+        remaining = [asyncio.create_task(self._discover_page(media_type, page, filters))
+                     for page in range(2, last_page + 1)]
+        queued = 0
+        try:
+            for page_data in [first, *remaining]:
+                if not isinstance(page_data, dict):
+                    try:
+                        page_data = await page_data
+                    except httpx.HTTPError as e:
+                        self.meters["discover"].failed += 1
+                        print(f"WARN: discover/{media_type} page failed: {e}")
+                        continue
+                for result in page_data.get("results", []):
+                    if queued >= limit:
+                        return
+                    queued += await self._enqueue(media_type, result, download_queue)
+        finally:
+            for task in remaining:
+                task.cancel()
+
+    async def _enqueue(self, media_type: str, result: dict, download_queue: asyncio.Queue) -> int:
+        key = title_key(media_type, result["id"])
+        poster_path = result.get("poster_path")
+        if key in self.catalogue or not poster_path:
+            return 0
+        item = {
+            "key": key,
+            "id": str(result["id"]),
+            "media_type": media_type,
+            "title": result.get("title") or result.get("name") or "",
+            "year": (result.get("release_date") or result.get("first_air_date") or "")[:4],
+            "poster_path": poster_path,
+            "backdrop_path": result.get("backdrop_path"),
+            "views": self.view_spec,
+        }
+        self.catalogue[key] = item
+        if self._done.get(key) == (poster_path, self.view_spec):
+            self.meters["embed"].skipped += 1
+            return 1
+        await download_queue.put(item)
+        return 1
+
+    async def _image_lists(self, item: dict) -> dict:
+        """TMDB's posters/backdrops/logos for a title (cached on disk); empty if the call fails."""
+        cache_file = os.path.join(self.work_dir, "image_lists", f"{item['media_type']}-{item['id']}.json")
+        if os.path.exists(cache_file):
+            with open(cache_file) as handle:
+                return json.load(handle)
+        try:
+            response = await self._get(
+                f"{self.api_url}/{item['media_type']}/{item['id']}/images", self.api_bucket,
+                {"api_key": self.api_key, "include_image_language": "en,null"},
+            )
+        except httpx.HTTPError as e:
+            print(f"WARN: Image list failed for {item['key']}, using the discover images only: {e}")
+            return {}
+        write_atomic(cache_file, response.content)
+        return response.json()
+
+    async def _view_paths(self, item: dict) -> list:
+        """The (kind, TMDB file_path) pairs to embed for a title, primary poster/backdrop first."""
+        primary = {"poster": item["poster_path"], "backdrop": item.get("backdrop_path")}
+        lists = {} if self.views == {"poster": 1} else await self._image_lists(item)
+        picked = []
+        for kind, count in self.views.items():
+            paths = [primary.get(kind)] + [image["file_path"] for image in lists.get(VIEW_LISTS[kind], [])]
+            chosen = list(dict.fromkeys(path for path in paths if path))[:count]
+            picked.extend((kind, path) for path in chosen)
+        return picked
+
+    async def _download(self, download_queue: asyncio.Queue, embed_queue: asyncio.Queue):
+        while (item := await download_queue.get()) is not None:
+            views = []
+            for kind, file_path in await self._view_paths(item):
+                image_file = os.path.join(self.work_dir, "posters", file_path.lstrip("/"))
+                if os.path.exists(image_file):
+                    self.meters["download"].skipped += 1
+                else:
+                    url = f"{self.image_root}/{VIEW_SIZES[kind]}{file_path}"
+                    try:
+                        response = await self._get(url, self.image_bucket)
+                    except httpx.HTTPError as e:
+                        self.meters["download"].failed += 1
+                        print(f"WARN: {kind} download failed for {item['key']}: {e}")
+                        continue
+                    write_atomic(image_file, response.content)
+                    self.meters["download"].add(nbytes=len(response.content))
+                views.append((kind, image_file))
+            if views:
+                await embed_queue.put((item, views))
+
+    async def _embed(self, embed_queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.embed_workers)
+        pending = set()
+        batch = []
+
+        async def flush(batch):
+            try:
+                items, views = await loop.run_in_executor(executor, embed_views, self.embedder, batch)
+                self.meters["embed"].failed += len(batch) - len(items)
+                if items:
+                    shard = self._next_shard
+                    self._next_shard += 1
+                    await loop.run_in_executor(executor, self._write_shard, shard, items, views)
+                    self.meters["embed"].add(len(items))
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.embed_workers) as executor:
+            while True:
+                entry = await embed_queue.get()
+                if entry is not None:
+                    batch.append(entry)
+                if batch and (len(batch) >= self.batch_size or entry is None):
+                    await slots.acquire()
+                    task = asyncio.create_task(flush(batch))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                    batch = []
+                if entry is None:
+                    break
+            await asyncio.gather(*pending)
+
+    def _write_shard(self, shard: int, items: list, views: list):
+        path = os.path.join(self.work_dir, "shards", f"shard-{shard:06d}.npz")
+        tmp_path = os.path.join(self.work_dir, "shards", f"tmp-{shard:06d}.npz")
+        np.savez(tmp_path,
+                 keys=np.array([item["key"] for item in items]),
+                 ids=np.array([item["id"] for item in items]),
+                 media_types=np.array([item["media_type"] for item in items]),
+                 titles=np.array([item["title"] for item in items]),
+                 years=np.array([item["year"] for item in items]),
+                 poster_paths=np.array([item["poster_path"] for item in items]),
+                 views=np.array([item["views"] for item in items]),
+                 **flatten_views(views))
+        os.replace(tmp_path, path)
@@ -0,0 +1,136 @@
+"""
+Local CLIP embedding lookup against movie_embeddings.npz.
+
+The builders store one L2-normalised CLIP image vector per title, so the
+cosine similarity of a query is an inner product. The vectors live in a
+vector_index backend (exact flat search or IVF), whose matrices are
+memory-mapped so every uvicorn worker shares the same pages instead of
+holding a private copy. A compact .snapdb store (see compact_store.py) is
+mapped in place and also supplies title/year/poster_path for each match.
+
+Multi-view databases hold several vectors per title (poster, backdrops,
+logo); view scores are pooled per title (max or mean) before ranking.
+
+torch and transformers are optional: when they are missing the stage
+reports itself as unavailable and the API falls back to GPT-4o.
+"""
+
+import numpy as np
+from PIL import Image
+
+from compact_store import CompactStore, is_compact_store
+from embedding_store import read_version, read_view_owners, view_starts
+from telemetry import log
+from vector_index import load_index, pool_candidates, pool_views, top_k
+
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+
+
+class EmbeddingIndex:
+    """Cosine top-k over a vector index, returning TMDB ids and media types."""
+
+    def __init__(self, index, ids: np.ndarray, media_types: np.ndarray, version: int = 0, metadata=None,
+                 view_owners: np.ndarray = None, pooling: str = "max"):
+        self.index = index
+        self.ids = ids
+        self.media_types = media_types
+        self.version = version
+        self.metadata = metadata
+        self.pooling = pooling
+        # One vector per title unless view_owners maps index rows back to titles
+        self.view_owners = None
+        if view_owners is not None and len(view_owners) != len(ids):
+            self.view_owners = np.asarray(view_owners)
+            self.view_starts = view_starts(self.view_owners, len(ids))
+            self.max_views = int(np.diff(np.append(self.view_starts, len(self.view_owners))).max())
+
+    @classmethod
+    def load(cls, path: str, pooling: str = "max") -> "EmbeddingIndex":
+        """Load a compact .snapdb store, a flat builder .npz or a prebuilt IVF index (see build_index.py)."""
+        if is_compact_store(path):
+            store = CompactStore(path)
+            return cls(store.index(), store.ids, store.media_types(), version=store.version, metadata=store,
+                       view_owners=store.view_owners, pooling=pooling)
+        return cls(*load_index(path), version=read_version(path), view_owners=read_view_owners(path),
+                   pooling=pooling)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query: np.ndarray, k: int = 5) -> list:
+        """Return the k most similar entries as dicts, best first."""
+        return self.search_batch(np.atleast_2d(query), k)[0]
+
+    def search_batch(self, queries: np.ndarray, k: int = 5) -> list:
+        """Score a (n, d) block of queries in one pass; returns one candidate list per query."""
+        scores, positions = self._search_titles(queries, k)
+        return [
+            [
+                {
+                    "media_id": str(self.ids[i]),
+                    "media_type": str(self.media_types[i]),
+                    "similarity": round(float(score), 4),
+                    **(self.metadata.metadata(i) if self.metadata is not None else {}),
+                }
+                for score, i in zip(row_scores, row_positions)
+                if i >= 0 and np.isfinite(score)
+            ]
+            for row_scores, row_positions in zip(scores, positions)
+        ]
+
+    def _search_titles(self, queries: np.ndarray, k: int):
+        """(scores, title positions) of the top k titles, pooling view scores for multi-view databases."""
+        if self.view_owners is None:
+            return self.index.search(queries, k)
+        if hasattr(self.index, "scores"):
+            # Exact backends score every view, so pool the full matrix
+            title_scores = pool_views(self.index.scores(queries), self.view_starts, self.pooling)
+        else:
+            # Approximate backends only return their best views; pool those (max only)
+            view_scores, view_positions = self.index.search(queries, k * self.max_views)
+            title_scores = pool_candidates(view_scores, view_positions, self.view_owners, len(self.ids))
+        return top_k(title_scores, k)
+
+
+class ClipEmbedder:
+    """CPU CLIP image encoder."""
+
+    def __init__(self, model_name: str = CLIP_MODEL_NAME):
+        import torch
+        from transformers import CLIPModel, CLIPProcessor
+
+        torch.set_grad_enabled(False)
+        self._model = CLIPModel.from_pretrained(model_name).eval()
+        self._processor = CLIPProcessor.from_pretrained(model_name)
+
+    def embed(self, image: Image.Image) -> np.ndarray:
+        """Return the L2-normalised CLIP embedding of a single image."""
+        return self.embed_batch([image])[0]
+
+    def embed_batch(self, images: list) -> np.ndarray:
+        """Embed several images in one forward pass; returns an (n, d) L2-normalised array."""
+        inputs = self._processor(images=[image.convert("RGB") for image in images], return_tensors="pt")
+        features = self._model.get_image_features(**inputs).cpu().numpy()
+        return features / np.linalg.norm(features, axis=1, keepdims=True)
+
+
+def load_embedding_stage(path: str, pooling: str = "max"):
+    """
+    Build (embedder, index) for the fast path, or return None with a warning
+    when the database or the optional ML dependencies are unavailable.
+    """
+    try:
+        import torch  # noqa: F401
+        import transformers  # noqa: F401
+    except ImportError:
+        log("warn", "embedding_stage_disabled", reason="torch/transformers not installed")
+        return None
+
+    try:
+        index = EmbeddingIndex.load(path, pooling)
+    except (OSError, KeyError, ValueError) as e:
+        log("warn", "embedding_db_load_failed", path=path, error=str(e))
+        return None
+
+    log("debug", "embedding_db_loaded", path=path, titles=len(index), version=index.version)
+    return ClipEmbedder(), index
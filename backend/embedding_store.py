@@ -0,0 +1,118 @@
+"""
+Versioned embedding database files.
+
+The builders publish each database as movie_embeddings.vNNNN.npz and then
+atomically re-point movie_embeddings.npz at it (a hard link swapped in with
+os.replace), so a reader either sees the old file or the new one, never a
+half-written one. The running API polls the path and hot-swaps its index when
+the file changes (see watch_embedding_db in main.py). The last few versions
+are kept for rollback.
+
+A title can have several embedded views (poster, backdrops, logo). The
+per-title COLUMNS hold one entry per title; embeddings, view_owners (the
+title row each view belongs to) and view_kinds hold one entry per view, with
+each title's views stored contiguously. Files without view_owners have
+exactly one poster view per title.
+"""
+
+import glob
+import os
+
+import numpy as np
+
+COLUMNS = ("ids", "media_types", "titles", "years", "poster_paths", "views")
+
+# The view spec recorded for single-poster databases
+POSTER_ONLY = "poster:1"
+
+
+def read_database(path: str) -> dict:
+    """
+    Load a builder .npz as {media_type/id key: row dict}, where each row has
+    the COLUMNS plus "embeddings" (n_views, dim) and "view_kinds". Databases
+    written before titles/years/poster_paths were stored get empty strings
+    for them; an empty poster_path never matches a real one, so an
+    incremental update re-embeds those titles. Files without media_types
+    can't be keyed at all and read as empty.
+    """
+    if not os.path.exists(path):
+        return {}
+    with np.load(path) as data:
+        if "media_types" not in data:
+            print(f"WARN: {path} has no media_types array; every title will be re-embedded")
+            return {}
+        count = len(data["ids"])
+        columns = {
+            name: data[name].astype(str) if name in data else np.full(count, "")
+            for name in COLUMNS
+        }
+        if "views" not in data:
+            columns["views"] = np.full(count, POSTER_ONLY)
+        embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+        owners = data["view_owners"] if "view_owners" in data else np.arange(count)
+        kinds = data["view_kinds"].astype(str) if "view_kinds" in data else np.full(count, "poster")
+
+    bounds = np.append(view_starts(owners, count), len(owners))
+    rows = {}
+    for i in range(count):
+        row = {name: str(columns[name][i]) for name in COLUMNS}
+        row["embeddings"] = embeddings[bounds[i]:bounds[i + 1]]
+        row["view_kinds"] = list(kinds[bounds[i]:bounds[i + 1]])
+        rows[f"{row['media_types']}/{row['ids']}"] = row
+    return rows
+
+
+def read_version(path: str) -> int:
+    """Version number stored in a published database (0 for unversioned files)."""
+    if not os.path.exists(path):
+        return 0
+    with np.load(path) as data:
+        return int(data["version"]) if "version" in data else 0
+
+
+def read_view_owners(path: str):
+    """The view -> title row mapping of a multi-view database, or None for one view per title."""
+    with np.load(path) as data:
+        return data["view_owners"] if "view_owners" in data else None
+
+
+def view_starts(owners: np.ndarray, count: int) -> np.ndarray:
+    """First view row of each title, given contiguous, non-decreasing view owners."""
+    if np.any(np.diff(owners) < 0) or len(np.unique(owners)) != count:
+        raise ValueError("view_owners must be sorted and give every title at least one view")
+    return np.searchsorted(owners, np.arange(count))
+
+
+def flatten_views(rows: list) -> dict:
+    """The per-view arrays (embeddings, view_owners, view_kinds) for a list of rows."""
+    return {
+        "embeddings": np.vstack([row["embeddings"] for row in rows]).astype(np.float32),
+        "view_owners": np.repeat(np.arange(len(rows), dtype=np.int32), [len(row["embeddings"]) for row in rows]),
+        "view_kinds": np.array([kind for row in rows for kind in row["view_kinds"]]),
+    }
+
+
+def publish_database(path: str, rows: list, keep: int = 3) -> int:
+    """
+    Write rows (dicts with COLUMNS keys plus "embeddings" and "view_kinds")
+    as the next version of the database at path and atomically make it
+    current. Returns the new version number.
+    """
+    version = read_version(path) + 1
+    stem = os.path.splitext(path)[0]
+    versioned = f"{stem}.v{version:04d}.npz"
+
+    tmp_path = f"{stem}.v{version:04d}.tmp.npz"
+    np.savez(tmp_path, version=np.array(version), **flatten_views(rows),
+             **{name: np.array([row[name] for row in rows]) for name in COLUMNS})
+    os.replace(tmp_path, versioned)
+
+    link_path = f"{stem}.current.tmp"
+    if os.path.lexists(link_path):
+        os.remove(link_path)
+    os.link(versioned, link_path)
+    os.replace(link_path, path)
+
+    for old in sorted(glob.glob(f"{stem}.v[0-9][0-9][0-9][0-9].npz"))[:-keep]:
+        os.remove(old)
+    return version
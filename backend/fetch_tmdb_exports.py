@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Download TMDB's daily ID exports for the local title index (title_index.py).
+
+TMDB publishes movie_ids_MM_DD_YYYY.json.gz and tv_series_ids_MM_DD_YYYY.json.gz
+every day (id, original title, popularity, adult flag; one JSON object per
+line). No API key is needed. Point TITLE_INDEX_PATHS at the files, e.g.
+TITLE_INDEX_PATHS=movie_embeddings.npz,data/movie_ids.json.gz,data/tv_series_ids.json.gz
+
+Usage: python fetch_tmdb_exports.py [--date 2024-05-01] [--output-dir data]
+"""
+
+import argparse
+import datetime
+import os
+
+import requests
+
+EXPORTS_URL = "http://files.tmdb.org/p/exports"
+EXPORTS = ("movie_ids", "tv_series_ids")
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def download(url: str, path: str):
+    """Stream url to path, replacing it only once the download is complete."""
+    partial = path + ".part"
+    with requests.get(url, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        with open(partial, "wb") as handle:
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                handle.write(chunk)
+    os.replace(partial, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    # Exports appear around 08:00 UTC, so yesterday's is the latest one that surely exists
+    yesterday = datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(days=1)
+    parser.add_argument("--date", type=datetime.date.fromisoformat, default=yesterday)
+    parser.add_argument("--output-dir", default=DATA_DIR)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for export in EXPORTS:
+        url = f"{EXPORTS_URL}/{export}_{args.date:%m_%d_%Y}.json.gz"
+        path = os.path.join(args.output_dir, f"{export}.json.gz")
+        print(f"Downloading {url}")
+        download(url, path)
+        print(f"Wrote {os.path.getsize(path) / 1e6:.1f} MB to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Building blocks for live camera-frame recognition over a WebSocket.
+
+A phone preview produces frames far faster than a vision call can answer,
+and most consecutive frames show the same screen. LatestFrameQueue keeps
+only the newest few frames per connection (older ones are dropped, never
+buffered), so a slow pipeline or a fast client can't grow memory.
+SceneTracker compares each processed frame's perceptual hash with the
+previous one: a changed scene is worth the cheap local stages, and the
+expensive vision call is only worth making once the same scene has held
+still for a number of frames.
+"""
+
+import asyncio
+from collections import deque
+
+from image_cache import hamming_distance
+
+# SceneTracker.observe results
+NEW_SCENE = "new"
+SAME_SCENE = "same"
+STABLE_SCENE = "stable"
+
+
+class LatestFrameQueue:
+    """Bounded frame queue that drops the oldest frame instead of blocking the producer."""
+
+    def __init__(self, maxsize: int = 2):
+        self._frames = deque(maxlen=maxsize)
+        self._ready = asyncio.Event()
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        self.received += 1
+        if len(self._frames) == self._frames.maxlen:
+            self.dropped += 1
+        self._frames.append(frame)
+        self._ready.set()
+
+    async def get(self):
+        while not self._frames:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._frames.popleft()
+
+    def __len__(self):
+        return len(self._frames)
+
+
+class SceneTracker:
+    """
+    Tracks how long the camera has been looking at the same scene. A frame
+    within max_distance bits (dHash) of the last one continues the scene;
+    observe() reports STABLE_SCENE once, when the scene reaches
+    stable_frames, unless it was already resolved.
+    """
+
+    def __init__(self, stable_frames: int = 3, max_distance: int = 4):
+        self.stable_frames = stable_frames
+        self.max_distance = max_distance
+        self.scene_hash = None
+        self.frames = 0
+        self.resolved = False
+        self.scenes = 0
+
+    def observe(self, frame_hash: int) -> str:
+        if self.scene_hash is None or hamming_distance(frame_hash, self.scene_hash) > self.max_distance:
+            self.scene_hash = frame_hash
+            self.frames = 1
+            self.resolved = False
+            self.scenes += 1
+            return STABLE_SCENE if self.stable_frames <= 1 else NEW_SCENE
+        # Compare against the latest frame so a slow pan keeps counting as one scene
+        self.scene_hash = frame_hash
+        self.frames += 1
+        if self.frames == self.stable_frames and not self.resolved:
+            return STABLE_SCENE
+        return SAME_SCENE
+
+    def resolve(self):
+        """The current scene has an answer; don't escalate it to the vision call."""
+        self.resolved = True
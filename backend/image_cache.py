@@ -0,0 +1,90 @@
+"""
+Perceptual-hash cache for GPT-4o identifications.
+Near-duplicate snaps of the same screen hash to nearby dHash values, so a
+lookup within a small Hamming distance returns the stored identification
+instead of paying for another vision call.
+"""
+
+import time
+from collections import OrderedDict
+
+from PIL import Image
+
+HASH_SIZE = 8
+
+
+def dhash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """
+    Difference hash: shrink to (hash_size + 1) x hash_size greyscale and record
+    whether each pixel is brighter than its right-hand neighbour.
+    """
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class PerceptualCache:
+    """LRU + TTL cache keyed by perceptual hash, matched within max_distance bits."""
+
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 3600, max_distance: int = 6):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self._entries = OrderedDict()  # hash -> (stored_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, image_hash: int):
+        """Return the value stored for the closest live hash, or None."""
+        now = time.monotonic()
+        best_key = None
+        best_distance = self.max_distance + 1
+
+        for key, (stored_at, _) in list(self._entries.items()):
+            if now - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.evictions += 1
+                continue
+            distance = hamming_distance(key, image_hash)
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+                if distance == 0:
+                    break
+
+        if best_key is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(best_key)
+        self.hits += 1
+        return self._entries[best_key][1]
+
+    def put(self, image_hash: int, value):
+        self._entries[image_hash] = (time.monotonic(), value)
+        self._entries.move_to_end(image_hash)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,120 @@
+"""
+Image preprocessing ahead of the GPT-4o vision call.
+
+Phone photos arrive as multi-megabyte JPEG/PNG/HEIC files at full sensor
+resolution, sometimes rotated via EXIF. The vision API downsamples anything
+large anyway, so we orient, optionally crop to the TV's aspect ratio,
+resize to a bounded long edge and re-encode as JPEG before sending. That
+shrinks upload size, base64 encode time and image tokens.
+
+HEIC decoding needs the optional pillow-heif package.
+"""
+
+import time
+from io import BytesIO
+
+from PIL import Image, ImageFilter, ImageOps, ImageStat
+
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+TV_ASPECT = 16 / 9
+# Vision "low" detail always sees a single 512px tile
+LOW_DETAIL_MAX_EDGE = 512
+
+
+def crop_to_aspect(image: Image.Image, aspect: float = TV_ASPECT) -> Image.Image:
+    """Centre-crop to the given width/height ratio (e.g. the TV band of a portrait photo)."""
+    width, height = image.size
+    if width / height > aspect:
+        new_width = round(height * aspect)
+        left = (width - new_width) // 2
+        return image.crop((left, 0, left + new_width, height))
+    new_height = round(width / aspect)
+    top = (height - new_height) // 2
+    return image.crop((0, top, width, top + new_height))
+
+
+def letterbox_to_aspect(image: Image.Image, aspect: float = TV_ASPECT) -> Image.Image:
+    """Pad with black bars to the given ratio, keeping every pixel of the original."""
+    width, height = image.size
+    if width / height > aspect:
+        size = (width, round(width / aspect))
+    else:
+        size = (round(height * aspect), height)
+    return ImageOps.pad(image, size, color=(0, 0, 0))
+
+
+def edge_density(image: Image.Image) -> float:
+    """Mean edge strength (0-255) of a small greyscale thumbnail; high for small text and busy UI."""
+    thumb = image.convert("L")
+    thumb.thumbnail((256, 256))
+    return ImageStat.Stat(thumb.filter(ImageFilter.FIND_EDGES)).mean[0]
+
+
+def prepare_image(image: Image.Image, max_edge: int = 1024, crop_mode: str = "none") -> Image.Image:
+    """Auto-orient, optionally crop/letterbox to 16:9, and shrink to max_edge on the long side."""
+    # For a not-yet-decoded JPEG, let libjpeg downscale during decode (DCT scaling)
+    if image.format == "JPEG":
+        image.draft("RGB", (max_edge, max_edge))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    if crop_mode == "crop":
+        image = crop_to_aspect(image)
+    elif crop_mode == "letterbox":
+        image = letterbox_to_aspect(image)
+
+    if max(image.size) > max_edge:
+        image = image.copy()
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    return image
+
+
+def choose_detail(image: Image.Image, mode: str = "auto", edge_threshold: float = 12.0) -> str:
+    """
+    Pick the vision detail level. "auto" uses low detail when the image
+    already fits a single low-detail tile, or when it has few fine edges
+    (big title text, posters) so high detail would add tokens for no gain.
+    """
+    if mode in ("low", "high"):
+        return mode
+    if max(image.size) <= LOW_DETAIL_MAX_EDGE:
+        return "low"
+    return "high" if edge_density(image) >= edge_threshold else "low"
+
+
+def encode_jpeg(image: Image.Image, quality: int = 85) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def encode_for_vision(prepared: Image.Image, original_bytes: int, quality: int = 85,
+                      detail_mode: str = "auto"):
+    """
+    Encode an image from prepare_image for the vision API.
+    Returns (jpeg_bytes, detail, report); report holds byte counts and
+    per-step milliseconds for benchmarking.
+    """
+    started = time.perf_counter()
+    detail = choose_detail(prepared, detail_mode)
+    detail_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    jpeg_bytes = encode_jpeg(prepared, quality)
+    encode_ms = (time.perf_counter() - started) * 1000
+
+    report = {
+        "original_bytes": original_bytes,
+        "sent_bytes": len(jpeg_bytes),
+        "sent_size": list(prepared.size),
+        "detail": detail,
+        "detail_ms": round(detail_ms, 2),
+        "encode_ms": round(encode_ms, 2),
+    }
+    return jpeg_bytes, detail, report
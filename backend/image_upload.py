@@ -0,0 +1,90 @@
+"""
+Single-pass upload handling.
+
+The upload is read once into a buffer capped at max_bytes (in chunks when
+its size isn't known up front).
+Its format is sniffed from the magic bytes, and it is decoded exactly once
+by the stage that needs pixels. Pillow is told the sniffed format so it
+doesn't probe every plugin.
+"""
+
+from io import BytesIO
+
+from PIL import Image
+
+READ_CHUNK_BYTES = 256 * 1024
+
+HEIF_BRANDS = (b"heic", b"heix", b"hevc", b"heim", b"heis", b"mif1", b"msf1")
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UnsupportedImageFormat(ValueError):
+    pass
+
+
+def sniff_image_format(header: bytes):
+    """Return the Pillow format name for a file header, or None if it isn't a supported image."""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "JPEG"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "PNG"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "WEBP"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "GIF"
+    if header[4:8] == b"ftyp" and header[8:12] in HEIF_BRANDS:
+        return "HEIF"
+    return None
+
+
+async def read_upload(file, max_bytes: int, chunk_size: int = READ_CHUNK_BYTES):
+    """
+    Read an UploadFile once into memory, enforcing max_bytes while streaming.
+    Returns (data, format). Raises UploadTooLarge or UnsupportedImageFormat.
+    """
+    if file.size is not None:
+        # Size is known up front (Starlette spools the multipart body), so
+        # reject oversize uploads before reading and then read in one call
+        if file.size > max_bytes:
+            raise UploadTooLarge(f"Upload is {file.size} bytes; the limit is {max_bytes}")
+        header = await file.read(16)
+        image_format = sniff_image_format(header)
+        if image_format is None:
+            raise UnsupportedImageFormat("Upload is not a supported image format")
+        await file.seek(0)
+        data = await file.read(max_bytes + 1)
+        if len(data) > max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+        return data, image_format
+
+    # Unknown size: stream in chunks, stopping as soon as the limit is crossed
+    buffer = bytearray()
+    image_format = None
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+        # Reject non-images after the first chunk instead of buffering them whole
+        if image_format is None:
+            image_format = sniff_image_format(bytes(buffer[:16]))
+            if image_format is None and len(buffer) >= 16:
+                raise UnsupportedImageFormat("Upload is not a supported image format")
+
+    if image_format is None:
+        raise UnsupportedImageFormat("Upload is not a supported image format")
+    return bytes(buffer), image_format
+
+
+def open_image(data: bytes, image_format: str) -> Image.Image:
+    """
+    Lazily open image bytes with a known format; pixels are decoded on first use.
+    Raises UnidentifiedImageError if no installed plugin handles the format
+    (e.g. HEIF without pillow-heif).
+    """
+    return Image.open(BytesIO(data), formats=[image_format])
@@ -1,29 +1,272 @@
 import os
+import asyncio
 import base64
 import json
-import requests
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import List, Literal
+
+import httpx
+import openai
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Query, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 from PIL import Image
-from io import BytesIO
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+from embedding_search import EmbeddingIndex, load_embedding_stage
+from frame_stream import SAME_SCENE, STABLE_SCENE, LatestFrameQueue, SceneTracker
+from image_cache import PerceptualCache, dhash
+from image_preprocess import encode_for_vision, prepare_image
+from image_upload import UnsupportedImageFormat, UploadTooLarge, open_image, read_upload, sniff_image_format
+from provider_catalog import ProviderCatalog
+from recognizer import Recognizer, Stage
+from responses import CompressionMiddleware, FastJSONResponse, cacheable_json, dumps, parse_fields, select_fields
+from stage_stats import StageStats, stopwatch
+import telemetry
+from telemetry import TelemetryMiddleware, count_bytes, count_tokens, log, timed
+from text_match import TitleTrigramIndex, confident_match, load_ocr_stage, match_screen_text
+from title_index import TitleIndex, load_title_index, rank_search_results
+from tmdb_cache import TMDBCache, make_key
+from upstream import BudgetExhausted, CircuitBreaker, UpstreamClient, call_timeout, request_budget, retry_within_budget
 
 # --- Load Environment & Configuration ---
 load_dotenv()
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-TMDB_API_URL = "https://api.themoviedb.org/3"
+TMDB_API_URL = os.getenv("TMDB_API_URL", "https://api.themoviedb.org/3")
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30"))
+REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_SECONDS", "30"))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "20"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "1"))
+OPENAI_RETRY_BACKOFF_SECONDS = float(os.getenv("OPENAI_RETRY_BACKOFF_SECONDS", "0.25"))
+TMDB_RETRIES = int(os.getenv("TMDB_RETRIES", "2"))
+TMDB_RETRY_BACKOFF_SECONDS = float(os.getenv("TMDB_RETRY_BACKOFF_SECONDS", "0.1"))
+TMDB_HEDGE = os.getenv("TMDB_HEDGE", "false").lower() in ("1", "true", "yes")
+TMDB_HEDGE_MIN_MS = float(os.getenv("TMDB_HEDGE_MIN_MS", "50"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+PHASH_CACHE_SIZE = int(os.getenv("PHASH_CACHE_SIZE", "512"))
+PHASH_CACHE_TTL_SECONDS = float(os.getenv("PHASH_CACHE_TTL_SECONDS", "3600"))
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "6"))
+EMBEDDING_FAST_PATH = os.getenv("EMBEDDING_FAST_PATH", "false").lower() in ("1", "true", "yes")
+EMBEDDING_DB_PATH = os.getenv("EMBEDDING_DB_PATH", "movie_embeddings.npz")
+EMBEDDING_MATCH_THRESHOLD = float(os.getenv("EMBEDDING_MATCH_THRESHOLD", "0.9"))
+EMBEDDING_TOP_K = int(os.getenv("EMBEDDING_TOP_K", "5"))
+EMBEDDING_RELOAD_SECONDS = float(os.getenv("EMBEDDING_RELOAD_SECONDS", "30"))
+EMBEDDING_POOLING = os.getenv("EMBEDDING_POOLING", "max")
+OCR_FAST_PATH = os.getenv("OCR_FAST_PATH", "false").lower() in ("1", "true", "yes")
+OCR_TITLES_PATH = os.getenv("OCR_TITLES_PATH", EMBEDDING_DB_PATH)
+OCR_MATCH_THRESHOLD = float(os.getenv("OCR_MATCH_THRESHOLD", "0.7"))
+OCR_MATCH_MARGIN = float(os.getenv("OCR_MATCH_MARGIN", "0.05"))
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "60"))
+OCR_TOP_K = int(os.getenv("OCR_TOP_K", "5"))
+TITLE_INDEX_FAST_PATH = os.getenv("TITLE_INDEX_FAST_PATH", "false").lower() in ("1", "true", "yes")
+# Comma-separated embedding databases and/or TMDB ID exports (fetch_tmdb_exports.py)
+TITLE_INDEX_PATHS = [path for path in os.getenv("TITLE_INDEX_PATHS", EMBEDDING_DB_PATH).split(",") if path]
+TITLE_INDEX_MIN_SCORE = float(os.getenv("TITLE_INDEX_MIN_SCORE", "0.9"))
+TITLE_INDEX_MARGIN = float(os.getenv("TITLE_INDEX_MARGIN", "0.1"))
+TITLE_INDEX_MIN_POPULARITY = float(os.getenv("TITLE_INDEX_MIN_POPULARITY", "0"))
+VISION_CONFIDENCE_THRESHOLD = float(os.getenv("VISION_CONFIDENCE_THRESHOLD", "0.5"))
+RECOGNIZE_DEADLINE_MS = float(os.getenv("RECOGNIZE_DEADLINE_MS", "20000"))
+RECOGNIZE_COST_BUDGET = float(os.getenv("RECOGNIZE_COST_BUDGET", "1"))
+PHASH_BUDGET_MS = float(os.getenv("PHASH_BUDGET_MS", "100"))
+EMBEDDING_BUDGET_MS = float(os.getenv("EMBEDDING_BUDGET_MS", "2000"))
+OCR_BUDGET_MS = float(os.getenv("OCR_BUDGET_MS", "2000"))
+VISION_BUDGET_MS = float(os.getenv("VISION_BUDGET_MS", "15000"))
+VISION_STAGE_COST = float(os.getenv("VISION_STAGE_COST", "1"))
+LIVE_STABLE_FRAMES = int(os.getenv("LIVE_STABLE_FRAMES", "3"))
+LIVE_DUPLICATE_DISTANCE = int(os.getenv("LIVE_DUPLICATE_DISTANCE", "4"))
+LIVE_QUEUE_FRAMES = int(os.getenv("LIVE_QUEUE_FRAMES", "2"))
+LIVE_MAX_FRAME_BYTES = int(os.getenv("LIVE_MAX_FRAME_BYTES", str(512 * 1024)))
+LIVE_MAX_EDGE = int(os.getenv("LIVE_MAX_EDGE", "640"))
+LIVE_SEND_TIMEOUT_SECONDS = float(os.getenv("LIVE_SEND_TIMEOUT_SECONDS", "10"))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+VISION_MAX_EDGE = int(os.getenv("VISION_MAX_EDGE", "1024"))
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+VISION_CROP_MODE = os.getenv("VISION_CROP_MODE", "none")  # none | crop | letterbox
+VISION_DETAIL = os.getenv("VISION_DETAIL", "auto")  # auto | low | high
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "20"))
+BATCH_VISION_CONCURRENCY = int(os.getenv("BATCH_VISION_CONCURRENCY", "4"))
+BATCH_PACK_SIZE = int(os.getenv("BATCH_PACK_SIZE", "6"))
+PROVIDERS_BATCH_MAX_ITEMS = int(os.getenv("PROVIDERS_BATCH_MAX_ITEMS", "500"))
+PROVIDERS_BATCH_CONCURRENCY = int(os.getenv("PROVIDERS_BATCH_CONCURRENCY", "8"))
+PROVIDERS_CACHE_MAX_AGE_SECONDS = int(os.getenv("PROVIDERS_CACHE_MAX_AGE_SECONDS", "3600"))
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))  # 0 disables compression
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+PROVIDER_TABLE_PATH = os.getenv(
+    "PROVIDER_TABLE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tmdb_providers.json")
+)
+TMDB_CACHE_PATH = os.getenv("TMDB_CACHE_PATH", "tmdb_cache.sqlite3")
+TMDB_CACHE_MEMORY_SIZE = int(os.getenv("TMDB_CACHE_MEMORY_SIZE", "2048"))
+TMDB_SEARCH_TTL_SECONDS = float(os.getenv("TMDB_SEARCH_TTL_SECONDS", str(24 * 3600)))
+TMDB_DETAILS_TTL_SECONDS = float(os.getenv("TMDB_DETAILS_TTL_SECONDS", str(3 * 24 * 3600)))
+TMDB_PROVIDERS_TTL_SECONDS = float(os.getenv("TMDB_PROVIDERS_TTL_SECONDS", str(6 * 3600)))
+TMDB_MAX_STALE_SECONDS = float(os.getenv("TMDB_MAX_STALE_SECONDS", str(7 * 24 * 3600)))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# One JSON object per log line, tagged with the request id
+telemetry.configure_logging(LOG_LEVEL)
+
+# Shared async clients so every request reuses the same connection pools
+# instead of blocking the event loop on a fresh connection per call.
+# AsyncOpenAI also honours OPENAI_BASE_URL, which the load test uses.
+# Its own retries ignore the request budget, so create_chat_completion() retries instead.
+client = AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=OPENAI_TIMEOUT_SECONDS, max_retries=0)
+http_client = httpx.AsyncClient(
+    timeout=HTTP_TIMEOUT_SECONDS,
+    limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=HTTP_KEEPALIVE_SECONDS),
+)
+
+# Fail fast while an upstream is down; TMDB lookups then fall back to stale cache
+openai_breaker = CircuitBreaker("openai", BREAKER_FAILURES, BREAKER_RESET_SECONDS)
+tmdb_upstream = UpstreamClient(
+    "tmdb", http_client, CircuitBreaker("tmdb", BREAKER_FAILURES, BREAKER_RESET_SECONDS),
+    timeout=HTTP_TIMEOUT_SECONDS, retries=TMDB_RETRIES, backoff_seconds=TMDB_RETRY_BACKOFF_SECONDS,
+    hedge=TMDB_HEDGE, hedge_min_ms=TMDB_HEDGE_MIN_MS,
+)
+# Errors that mean OpenAI is unreachable or overloaded, as opposed to rejecting one request
+OPENAI_OUTAGE_ERRORS = (openai.APIConnectionError, openai.InternalServerError, openai.RateLimitError)
+
+
+async def create_chat_completion(**kwargs):
+    """
+    client.chat.completions.create() behind the breaker, retried up to
+    OPENAI_MAX_RETRIES times on outage errors. Every attempt's timeout is
+    capped by what is left of the request budget, and no retry starts once
+    it is spent.
+    """
+    async def attempt():
+        timeout = call_timeout(OPENAI_TIMEOUT_SECONDS)
+        try:
+            return await client.chat.completions.create(**kwargs, timeout=timeout)
+        except openai.APITimeoutError as e:
+            if timeout < OPENAI_TIMEOUT_SECONDS:
+                # Only the request budget ran out; that is no sign of an outage
+                raise BudgetExhausted() from e
+            raise
+
+    return await openai_breaker.call(
+        lambda: retry_within_budget("openai", attempt, OPENAI_OUTAGE_ERRORS, OPENAI_MAX_RETRIES,
+                                    OPENAI_RETRY_BACKOFF_SECONDS),
+        OPENAI_OUTAGE_ERRORS
+    )
+
+# Repeated snaps of the same title card reuse the previous identification
+recognition_cache = PerceptualCache(
+    max_size=PHASH_CACHE_SIZE,
+    ttl_seconds=PHASH_CACHE_TTL_SECONDS,
+    max_distance=PHASH_MAX_DISTANCE,
+)
+
+# TMDB responses: in-process LRU backed by SQLite, with single-flight misses
+tmdb_cache = TMDBCache(TMDB_CACHE_PATH, memory_size=TMDB_CACHE_MEMORY_SIZE, max_stale_seconds=TMDB_MAX_STALE_SECONDS)
+
+# TMDB provider_id -> service table, loaded once
+provider_catalog = ProviderCatalog.load(PROVIDER_TABLE_PATH)
+
+# Optional local CLIP stage: (embedder, index) once loaded, else None.
+# Replaced wholesale on hot-swap, so readers never see a half-updated pair.
+embedding_stage = None
+embedding_db_signature = None
+
+# Optional local OCR stage: (ocr, title index) once loaded, else None
+ocr_stage = None
+
+# Optional local title -> TMDB id index consulted before search/multi, else None
+title_index = None
+
+stage_stats = {
+    "phash_cache": StageStats(),
+    "clip_embedding": StageStats(),
+    "ocr_text": StageStats(),
+    "gpt4o_vision": StageStats(),
+    "title_index": StageStats(),
+}
+
+
+def stat_embedding_db():
+    """(inode, mtime) of the embedding database; changes whenever a builder publishes a version."""
+    try:
+        stat = os.stat(EMBEDDING_DB_PATH)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+async def watch_embedding_db():
+    """Poll the embedding database and hot-swap the index when a new version is published."""
+    global embedding_stage, embedding_db_signature, ocr_stage, title_index
+    while True:
+        await asyncio.sleep(EMBEDDING_RELOAD_SECONDS)
+        signature = stat_embedding_db()
+        if signature is None or signature == embedding_db_signature:
+            continue
+        embedding_db_signature = signature
+
+        if embedding_stage is None:
+            stage = await run_in_threadpool(load_embedding_stage, EMBEDDING_DB_PATH, EMBEDDING_POOLING)
+        else:
+            try:
+                index = await run_in_threadpool(EmbeddingIndex.load, EMBEDDING_DB_PATH, EMBEDDING_POOLING)
+            except (OSError, KeyError, ValueError) as e:
+                log("warn", "embedding_db_reload_failed", path=EMBEDDING_DB_PATH, error=str(e))
+                continue
+            stage = (embedding_stage[0], index)
+        if stage is not None:
+            embedding_stage = stage
+            log("info", "embedding_db_swapped", version=stage[1].version, titles=len(stage[1]))
+        # The OCR title index normally reads the same file, so new titles become matchable too
+        if ocr_stage is not None and OCR_TITLES_PATH == EMBEDDING_DB_PATH:
+            try:
+                ocr_stage = (ocr_stage[0], await run_in_threadpool(TitleTrigramIndex.load, OCR_TITLES_PATH))
+            except (OSError, KeyError, ValueError) as e:
+                log("warn", "ocr_titles_reload_failed", path=OCR_TITLES_PATH, error=str(e))
+        if title_index is not None and EMBEDDING_DB_PATH in TITLE_INDEX_PATHS:
+            try:
+                title_index = await run_in_threadpool(
+                    TitleIndex.load, TITLE_INDEX_PATHS, TITLE_INDEX_MIN_POPULARITY
+                )
+            except (OSError, KeyError, ValueError) as e:
+                log("warn", "title_index_reload_failed", paths=TITLE_INDEX_PATHS, error=str(e))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global embedding_stage, embedding_db_signature, ocr_stage, title_index
+    watcher = None
+    if TITLE_INDEX_FAST_PATH:
+        title_index = await run_in_threadpool(load_title_index, TITLE_INDEX_PATHS, TITLE_INDEX_MIN_POPULARITY)
+    if OCR_FAST_PATH:
+        ocr_stage = await run_in_threadpool(load_ocr_stage, OCR_TITLES_PATH, OCR_MIN_CONFIDENCE)
+    if EMBEDDING_FAST_PATH:
+        embedding_db_signature = stat_embedding_db()
+        embedding_stage = await run_in_threadpool(load_embedding_stage, EMBEDDING_DB_PATH, EMBEDDING_POOLING)
+        if EMBEDDING_RELOAD_SECONDS > 0:
+            watcher = asyncio.create_task(watch_embedding_db())
+    yield
+    if watcher is not None:
+        watcher.cancel()
+    await http_client.aclose()
+    await client.close()
+    tmdb_cache.close()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
 
 # --- FastAPI App Initialization ---
 app = FastAPI(
     title="SnapnSee API",
     description="AI-powered movie/TV show recognition using GPT-4o Vision",
     version="2.0.1",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # Add CORS middleware
@@ -33,13 +276,57 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID", "ETag"],
+)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESS_MIN_BYTES,
+    gzip_level=GZIP_LEVEL,
+    brotli_quality=BROTLI_QUALITY,
 )
+# Outermost, so Server-Timing and the request histogram cover everything
+app.add_middleware(TelemetryMiddleware)
 
 # --- Helper Functions ---
 
-def identify_media_with_gpt4o(image_bytes: bytes) -> dict:
+async def tmdb_get(path: str, params: dict = None, ttl_seconds: float = TMDB_DETAILS_TTL_SECONDS) -> dict:
     """
-    Uses GPT-4o Vision to identify the movie/show from an image.
+    GET a TMDB API path through the shared cache, with retries, optional
+    hedging and the TMDB circuit breaker (see upstream.py).
+    Raises httpx.HTTPError on upstream failure unless a stale cached copy
+    can be served; failures are never cached.
+    """
+    params = params or {}
+
+    async def fetch():
+        with timed("tmdb_http"):
+            try:
+                response = await tmdb_upstream.get(
+                    f"{TMDB_API_URL}{path}",
+                    params={"api_key": TMDB_API_KEY, **params}
+                )
+            except httpx.HTTPError:
+                telemetry.upstream_errors.inc(upstream="tmdb")
+                raise
+        count_bytes("tmdb", received=len(response.content))
+        return response.json()
+
+    return await tmdb_cache.get_or_fetch(make_key(path, params), ttl_seconds, fetch)
+
+
+def strip_code_fence(content: str) -> str:
+    """Return the JSON payload of a model reply, dropping any ``` fences around it."""
+    if "```json" in content:
+        return content.split("```json")[1].split("```")[0].strip()
+    if "```" in content:
+        return content.split("```")[1].split("```")[0].strip()
+    return content
+
+
+@timed("gpt4o_identify")
+async def identify_media_with_gpt4o(image_bytes: bytes, detail: str = "high") -> dict:
+    """
+    Uses GPT-4o Vision to identify the movie/show from a JPEG image.
     Returns a dict with title, media_type, year, and confidence.
     """
     try:
@@ -63,7 +350,7 @@ Return ONLY a JSON object with this structure:
 If you cannot identify it with confidence, set confidence to 0.0 and title to "unknown"."""
 
         # Call GPT-4o Vision
-        response = client.chat.completions.create(
+        response = await create_chat_completion(
             model="gpt-4o",
             messages=[
                 {
@@ -81,7 +368,7 @@ If you cannot identify it with confidence, set confidence to 0.0 and title to "u
                             "type": "image_url",
                             "image_url": {
                                 "url": f"data:image/jpeg;base64,{base64_image}",
-                                "detail": "high"
+                                "detail": detail
                             }
                         }
                     ]
@@ -90,23 +377,19 @@ If you cannot identify it with confidence, set confidence to 0.0 and title to "u
             max_tokens=500,
             temperature=0.2
         )
+        count_tokens(response.usage, "gpt-4o")
+        count_bytes("openai", sent=len(base64_image))
 
         # Parse the response
         content = response.choices[0].message.content
-        print(f"DEBUG: GPT-4o raw response: {content}")
+        log("debug", "gpt4o_response", content=content)
 
         # Try to extract JSON from response (in case there's extra text)
         try:
-            # Look for JSON in the response
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-
-            result = json.loads(content)
+            result = json.loads(strip_code_fence(content))
             return result
         except json.JSONDecodeError:
-            print(f"ERROR: Could not parse JSON from GPT-4o response: {content}")
+            log("error", "gpt4o_unparseable_response", content=content)
             return {
                 "title": "unknown",
                 "media_type": "unknown",
@@ -116,7 +399,8 @@ If you cannot identify it with confidence, set confidence to 0.0 and title to "u
             }
 
     except Exception as e:
-        print(f"ERROR: GPT-4o Vision call failed: {e}")
+        telemetry.upstream_errors.inc(upstream="openai")
+        log("error", "gpt4o_call_failed", error=str(e))
         return {
             "title": "unknown",
             "media_type": "unknown",
@@ -126,18 +410,141 @@ If you cannot identify it with confidence, set confidence to 0.0 and title to "u
         }
 
 
-def search_tmdb(title: str, media_type: str = None, year: int = None):
+MULTI_IMAGE_SYSTEM_PROMPT = """You are an expert at identifying movies and TV shows from screenshots.
+You will receive several images, each preceded by a label "Image N".
+Identify the exact title of the movie or TV show in EACH image independently.
+Look for title text, logos, recognizable scenes, or UI elements from streaming services.
+
+Return ONLY a JSON array with exactly one object per image, in image order:
+[
+  {
+    "image": N,
+    "title": "exact title of the movie or show",
+    "media_type": "movie" or "tv",
+    "year": release year if visible (or null),
+    "confidence": 0.0 to 1.0,
+    "reasoning": "brief explanation of how you identified it"
+  }
+]
+
+If you cannot identify an image with confidence, set its confidence to 0.0 and title to "unknown"."""
+
+
+def parse_multi_image_reply(content: str, count: int) -> dict:
+    """
+    Map a packed reply back to its images. Returns {position: result} for
+    every well-formed entry (a string title and media_type and a numeric
+    confidence); positions missing from the dict need a retry.
+    """
+    try:
+        entries = json.loads(strip_code_fence(content))
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(entries, list):
+        return {}
+
+    results = {}
+    for entry in entries:
+        if not isinstance(entry, dict) or not isinstance(entry.get("confidence"), (int, float)):
+            continue
+        if not isinstance(entry.get("title"), str) or not entry["title"].strip():
+            continue
+        if not isinstance(entry.get("media_type"), str):
+            continue
+        label = entry.pop("image", None)
+        if isinstance(label, int) and 1 <= label <= count and label - 1 not in results:
+            results[label - 1] = entry
+    return results
+
+
+@timed("gpt4o_identify_packed")
+async def identify_many_with_gpt4o(payloads: list) -> list:
+    """
+    Identify several images in a single GPT-4o request, so the instructions
+    are sent once instead of once per image. payloads is a list of
+    (jpeg_bytes, detail). Any image the packed reply doesn't answer cleanly
+    falls back to its own identify_media_with_gpt4o call.
+    Returns one result dict per payload, in input order.
+    """
+    if len(payloads) == 1:
+        return [await identify_media_with_gpt4o(*payloads[0])]
+
+    content = [{
+        "type": "text",
+        "text": f"Identify the movie or TV show in each of these {len(payloads)} images. Return a JSON array only."
+    }]
+    for number, (image_bytes, detail) in enumerate(payloads, 1):
+        base64_image = base64.b64encode(image_bytes).decode('utf-8')
+        content.append({"type": "text", "text": f"Image {number}:"})
+        content.append({
+            "type": "image_url",
+            "image_url": {"url": f"data:image/jpeg;base64,{base64_image}", "detail": detail}
+        })
+
+    results = {}
+    try:
+        response = await create_chat_completion(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": MULTI_IMAGE_SYSTEM_PROMPT},
+                {"role": "user", "content": content}
+            ],
+            max_tokens=200 * len(payloads) + 100,
+            temperature=0.2
+        )
+        count_tokens(response.usage, "gpt-4o")
+        count_bytes("openai", sent=sum(len(part["image_url"]["url"]) for part in content if part["type"] == "image_url"))
+        reply = response.choices[0].message.content
+        log("debug", "gpt4o_packed_response", content=reply)
+        results = parse_multi_image_reply(reply, len(payloads))
+    except Exception as e:
+        telemetry.upstream_errors.inc(upstream="openai")
+        log("error", "gpt4o_packed_call_failed", error=str(e), images=len(payloads))
+
+    missing = [i for i in range(len(payloads)) if i not in results]
+    if missing:
+        log("warn", "gpt4o_packed_reply_incomplete", missing=missing)
+        retried = await asyncio.gather(*(identify_media_with_gpt4o(*payloads[i]) for i in missing))
+        results.update(zip(missing, retried))
+
+    return [results[i] for i in range(len(payloads))]
+
+
+@timed("tmdb_search")
+async def search_tmdb(title: str, media_type: str = None, year: int = None):
     """
     Searches TMDB for the given title and returns the best match.
+    An unambiguous exact hit in the local title index answers without
+    calling TMDB; otherwise search/multi results are ranked by title, year,
+    media type and popularity, with the index's near matches as hints (see
+    title_index.py).
     """
+    hints = set()
+    if title_index is not None:
+        started = time.perf_counter()
+        with timed("title_index"):
+            candidates = title_index.lookup(title, year, media_type)
+            candidate = title_index.choose(candidates, year, media_type, TITLE_INDEX_MIN_SCORE, TITLE_INDEX_MARGIN)
+        stage_stats["title_index"].record((time.perf_counter() - started) * 1000, candidate is not None)
+        if candidate is not None:
+            log("debug", "title_index_hit", title=candidate["title"], media_id=candidate["media_id"],
+                media_type=candidate["media_type"], match=candidate["match"], score=candidate["score"])
+            name_field = "title" if candidate["media_type"] == "movie" else "name"
+            return {
+                "id": int(candidate["media_id"]),
+                "media_type": candidate["media_type"],
+                name_field: candidate["title"],
+                "popularity": candidate["popularity"],
+                "source": "title_index",
+            }
+        hints = {(c["media_type"], c["media_id"]) for c in candidates}
+
     if not TMDB_API_KEY or TMDB_API_KEY == "YOUR_TMDB_API_KEY":
-        print("WARN: TMDB_API_KEY is not set.")
+        log("warn", "tmdb_api_key_missing")
         return None
 
     # Try multi-search (searches both movies and TV)
-    search_url = f"{TMDB_API_URL}/search/multi"
     params = {
-        "api_key": TMDB_API_KEY,
         "query": title,
         "page": 1
     }
@@ -149,9 +556,7 @@ def search_tmdb(title: str, media_type: str = None, year: int = None):
         params["first_air_date_year"] = year
 
     try:
-        response = requests.get(search_url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        data = await tmdb_get("/search/multi", params, TMDB_SEARCH_TTL_SECONDS)
 
         if data.get("results") and len(data["results"]) > 0:
             # Filter by media type if specified
@@ -159,37 +564,453 @@ def search_tmdb(title: str, media_type: str = None, year: int = None):
             if media_type:
                 results = [r for r in results if r.get("media_type") == media_type]
 
-            # Filter out person results
-            results = [r for r in results if r.get("media_type") in ["movie", "tv"]]
+            # Drops person results; TMDB's own order puts a popular namesake ahead of the right year
+            results = rank_search_results(results, title, year, media_type, hints)
 
             if results:
-                # Return the first result (most relevant)
                 result = results[0]
-                print(f"DEBUG: TMDB found: {result.get('title') or result.get('name')} (ID: {result['id']}, Type: {result['media_type']})")
+                log("debug", "tmdb_search_hit", title=result.get("title") or result.get("name"),
+                    media_id=result["id"], media_type=result["media_type"])
                 return result
 
         return None
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error searching TMDB: {e}")
+    except httpx.HTTPError as e:
+        log("error", "tmdb_search_failed", title=title, error=str(e))
         return None
 
 
-def get_tmdb_details(media_id: str, media_type: str = "movie"):
-    """Fetches detailed information for a given media ID from TMDB."""
+@timed("tmdb_details")
+async def get_tmdb_details(media_id: str, media_type: str = "movie", append: list = None):
+    """
+    Fetches detailed information for a given media ID from TMDB.
+    append lists extra TMDB sub-resources (e.g. "watch/providers", "credits")
+    to fold into the same call via append_to_response.
+    """
     if not TMDB_API_KEY or TMDB_API_KEY == "YOUR_TMDB_API_KEY":
         return None
 
-    detail_url = f"{TMDB_API_URL}/{media_type}/{media_id}"
-    params = {"api_key": TMDB_API_KEY}
+    params = {}
+    ttl_seconds = TMDB_DETAILS_TTL_SECONDS
+    if append:
+        params["append_to_response"] = ",".join(append)
+        # Provider availability goes stale much faster than the rest
+        if "watch/providers" in append:
+            ttl_seconds = TMDB_PROVIDERS_TTL_SECONDS
 
     try:
-        response = requests.get(detail_url, params=params)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching TMDB details: {e}")
+        return await tmdb_get(f"/{media_type}/{media_id}", params, ttl_seconds)
+    except httpx.HTTPError as e:
+        log("error", "tmdb_details_failed", media_id=media_id, media_type=media_type, error=str(e))
+        return None
+
+
+@timed("image_upload")
+async def load_upload(file: UploadFile):
+    """
+    Read, sniff and decode an uploaded image exactly once.
+    Returns (raw_bytes, prepared_image) or raises a 4xx HTTPException.
+    """
+    try:
+        image_bytes, image_format = await read_upload(file, MAX_UPLOAD_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedImageFormat:
+        raise HTTPException(status_code=400, detail="Invalid image file")
+
+    # Orient, crop and shrink once; every later stage works on this image
+    try:
+        image = await run_in_threadpool(
+            prepare_image, open_image(image_bytes, image_format), VISION_MAX_EDGE, VISION_CROP_MODE
+        )
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise HTTPException(status_code=400, detail="Invalid image file")
+
+    return image_bytes, image
+
+
+def best_embedding_match(candidates: list):
+    """Return the top embedding candidate if it clears the match threshold, else None."""
+    if candidates and candidates[0]["similarity"] >= EMBEDDING_MATCH_THRESHOLD:
+        return candidates[0]
+    return None
+
+
+def best_text_match(candidates: list):
+    """Return the top OCR title candidate if it is strong and unambiguous, else None."""
+    return confident_match(candidates, OCR_MATCH_THRESHOLD, OCR_MATCH_MARGIN)
+
+
+@timed("ocr_text")
+async def read_screen_text(image: Image.Image, timings: dict):
+    """Run the local OCR stage on a prepared image. Returns its title candidates (None when disabled)."""
+    if ocr_stage is None:
+        return None
+    ocr, titles = ocr_stage
+    with stopwatch(timings, "ocr_text"):
+        candidates = await run_in_threadpool(match_screen_text, ocr, titles, image, OCR_TOP_K)
+    stage_stats["ocr_text"].record(timings["ocr_text"], best_text_match(candidates) is not None)
+    return candidates
+
+
+@timed("phash_lookup")
+async def cached_identification(image: Image.Image, timings: dict):
+    """Look up a near-identical recent image. Returns (image_hash, gpt_result or None)."""
+    with stopwatch(timings, "phash_cache"):
+        image_hash = await run_in_threadpool(dhash, image)
+        gpt_result = recognition_cache.get(image_hash)
+    stage_stats["phash_cache"].record(timings["phash_cache"], gpt_result is not None)
+    return image_hash, gpt_result
+
+
+@timed("image_encode")
+async def vision_payload(image: Image.Image, image_bytes: bytes, timings: dict):
+    """Encode a prepared image for the vision API. Returns (jpeg_bytes, detail)."""
+    with stopwatch(timings, "vision_encode"):
+        vision_bytes, detail, report = await run_in_threadpool(
+            encode_for_vision, image, len(image_bytes), VISION_JPEG_QUALITY, VISION_DETAIL
+        )
+    log("debug", "vision_payload", **report)
+    return vision_bytes, detail
+
+
+def remember_identification(image_hash: int, gpt_result: dict, elapsed_ms: float):
+    stage_stats["gpt4o_vision"].record(elapsed_ms, gpt_result["confidence"] >= VISION_CONFIDENCE_THRESHOLD)
+    # Failed calls report confidence 0.0 and are not worth caching
+    if gpt_result.get("confidence", 0.0) > 0.0:
+        recognition_cache.put(image_hash, gpt_result)
+
+
+async def identify_images_packed(items: list, vision_slots) -> list:
+    """
+    Identify several prepared images, packing cache misses into multi-image
+    GPT-4o requests of up to BATCH_PACK_SIZE images each.
+    items is a list of (image, image_bytes, timings); returns a matching
+    list of (gpt_result, cache_hit).
+    """
+    identified = [None] * len(items)
+    misses = []
+    for position, (image, image_bytes, timings) in enumerate(items):
+        image_hash, gpt_result = await cached_identification(image, timings)
+        if gpt_result is not None:
+            identified[position] = (gpt_result, True)
+        else:
+            payload = await vision_payload(image, image_bytes, timings)
+            misses.append((position, image_hash, payload))
+
+    async def run_pack(pack):
+        async with vision_slots:
+            log("debug", "gpt4o_call", images=len(pack))
+            started = time.perf_counter()
+            results = await identify_many_with_gpt4o([payload for _, _, payload in pack])
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        for (position, image_hash, _), gpt_result in zip(pack, results):
+            items[position][2]["gpt4o_vision"] = elapsed_ms
+            remember_identification(image_hash, gpt_result, elapsed_ms)
+            identified[position] = (gpt_result, False)
+
+    packs = [misses[start:start + BATCH_PACK_SIZE] for start in range(0, len(misses), BATCH_PACK_SIZE)]
+    await asyncio.gather(*(run_pack(pack) for pack in packs))
+    return identified
+
+
+# --- Recognition cascade stages ---
+# Each takes the request context (image, image_bytes, timings, vision_slots,
+# plus anything a batch precomputed) and returns an outcome with a
+# "confidence", or None when it has nothing to offer.
+
+async def run_cache_stage(context: dict):
+    """Reuse the identification of a near-identical recent image."""
+    if "identified" in context:
+        # A packed batch call already consulted the cache for this image
+        gpt_result, cache_hit = context["identified"]
+        return {"confidence": gpt_result["confidence"], "gpt_result": gpt_result, "cache_hit": True} \
+            if cache_hit else None
+    context["image_hash"], gpt_result = await cached_identification(context["image"], context["timings"])
+    if gpt_result is None:
         return None
+    return {"confidence": gpt_result["confidence"], "gpt_result": gpt_result, "cache_hit": True}
+
+
+def embed_and_search(embedder, index, image: Image.Image) -> list:
+    """CLIP-embed one image and search the catalogue; both block, so run this in the threadpool."""
+    return index.search(embedder.embed(image), k=EMBEDDING_TOP_K)
+
+
+def embed_and_search_batch(embedder, index, images: list) -> list:
+    """embed_and_search for several images in one forward pass and one scoring block."""
+    return index.search_batch(embedder.embed_batch(images), k=EMBEDDING_TOP_K)
+
+
+async def run_embedding_stage(context: dict):
+    """Nearest catalogue titles by CLIP embedding."""
+    candidates = context.get("embedding_candidates")
+    if candidates is None:
+        embedder, index = embedding_stage
+        timings = context["timings"]
+        with stopwatch(timings, "clip_embedding"), timed("clip_embedding"):
+            candidates = await run_in_threadpool(embed_and_search, embedder, index, context["image"])
+        stage_stats["clip_embedding"].record(
+            timings["clip_embedding"], best_embedding_match(candidates) is not None
+        )
+    if not candidates:
+        return None
+    return {"confidence": candidates[0]["similarity"], "best": candidates[0], "candidates": candidates}
+
+
+async def run_ocr_stage(context: dict):
+    """Catalogue titles matching the on-screen text; an ambiguous match scores 0."""
+    candidates = context.get("text_candidates")
+    if candidates is None:
+        candidates = await read_screen_text(context["image"], context["timings"])
+    if not candidates:
+        return None
+    best = best_text_match(candidates)
+    return {"confidence": best["similarity"] if best else 0.0, "best": best, "candidates": candidates}
+
+
+async def run_vision_stage(context: dict):
+    """Identify the image with GPT-4o Vision (or take a packed batch call's answer)."""
+    if "identified" in context:
+        gpt_result, cache_hit = context["identified"]
+        return {"confidence": gpt_result["confidence"], "gpt_result": gpt_result, "cache_hit": cache_hit}
+
+    image, timings = context["image"], context["timings"]
+    image_hash = context.get("image_hash")
+    if image_hash is None:
+        image_hash = await run_in_threadpool(dhash, image)
+    vision_bytes, detail = await vision_payload(image, context["image_bytes"], timings)
+
+    async with context.get("vision_slots") or nullcontext():
+        log("debug", "gpt4o_call", images=1)
+        with stopwatch(timings, "gpt4o_vision"):
+            gpt_result = await identify_media_with_gpt4o(vision_bytes, detail)
+
+    remember_identification(image_hash, gpt_result, timings["gpt4o_vision"])
+    return {"confidence": gpt_result["confidence"], "gpt_result": gpt_result, "cache_hit": False}
+
+
+# Cheapest first; only the vision call costs money
+recognizer = Recognizer(
+    [
+        Stage("phash_cache", run_cache_stage, VISION_CONFIDENCE_THRESHOLD, PHASH_BUDGET_MS,
+              stats=stage_stats["phash_cache"]),
+        Stage("clip_embedding", run_embedding_stage, EMBEDDING_MATCH_THRESHOLD, EMBEDDING_BUDGET_MS,
+              available=lambda: embedding_stage is not None, stats=stage_stats["clip_embedding"]),
+        Stage("ocr_text", run_ocr_stage, OCR_MATCH_THRESHOLD, OCR_BUDGET_MS,
+              available=lambda: ocr_stage is not None, stats=stage_stats["ocr_text"]),
+        Stage("gpt4o_vision", run_vision_stage, VISION_CONFIDENCE_THRESHOLD, VISION_BUDGET_MS,
+              cost=VISION_STAGE_COST, stats=stage_stats["gpt4o_vision"]),
+    ],
+    deadline_ms=RECOGNIZE_DEADLINE_MS,
+    cost_budget=RECOGNIZE_COST_BUDGET,
+)
+
+
+def cascade_summary(cascade: dict) -> dict:
+    """The per-stage decisions and totals of a cascade run, for the response."""
+    return {key: cascade[key] for key in ("stage", "cost", "elapsed_ms", "trace")}
+
+
+async def recognize_prepared(image: Image.Image, image_bytes: bytes, timings: dict, append: list, country: str,
+                             vision_slots=None, dedupe=None, precomputed: dict = None,
+                             deadline_ms: float = None, emit=None, cost_budget: float = None) -> dict:
+    """
+    Run the recognition cascade for one decoded image and build its response.
+    precomputed carries stage inputs a batch already produced for this image
+    (embedding_candidates, text_candidates, identified=(gpt_result, cache_hit)).
+    dedupe(key, factory) lets a batch share identical TMDB lookups between images.
+    emit(event, data), when given, receives partial results as they become
+    known: stage, candidate, identification, tmdb_match, details, providers.
+    cost_budget=0 limits the cascade to the free local stages.
+    Raises HTTPException(404) when the media can't be identified confidently.
+    """
+    async def lookup(key, factory):
+        return await (dedupe(key, factory) if dedupe else factory())
+
+    emit = emit or (lambda event, data: None)
+
+    def on_decision(entry, outcome):
+        emit("stage", dict(entry))
+        # Fast-path guesses are worth showing even before (or without) being accepted
+        if outcome is not None and outcome.get("candidates"):
+            emit("candidate", {"stage": entry["stage"], "accepted": entry["decision"] == "accepted",
+                               **outcome["candidates"][0]})
+
+    def announce(response: dict) -> dict:
+        emit("details", response["tmdb_match"])
+        if "providers" in response:
+            emit("providers", response["providers"])
+        return response
+
+    context = {"image": image, "image_bytes": image_bytes, "timings": timings, "vision_slots": vision_slots,
+               **(precomputed or {})}
+    cascade = await recognizer.run(context, deadline_ms, cost_budget, on_decision=on_decision)
+    stage, outcome = cascade["stage"], cascade["outcome"]
+
+    # A confident embedding or on-screen text match skips GPT-4o entirely
+    if stage in ("clip_embedding", "ocr_text"):
+        best = outcome["best"]
+        emit("identification", {"method": stage, **best})
+        with stopwatch(timings, "tmdb_details"):
+            tmdb_details = await lookup(
+                ("details", best["media_id"], best["media_type"]),
+                lambda: get_tmdb_details(best["media_id"], best["media_type"], append)
+            )
+        return announce(attach_includes({
+            "method": stage,
+            "cache_hit": False,
+            "embedding_candidates" if stage == "clip_embedding" else "text_candidates": outcome["candidates"],
+            "identified_media_id": best["media_id"],
+            "media_type": best["media_type"],
+            "match_confidence": best["similarity"],
+            "tmdb_match": tmdb_details,
+            "stage_timings_ms": timings,
+            "cascade": cascade_summary(cascade),
+        }, tmdb_details, append, country))
+
+    if stage is None:
+        answered = cascade["outcomes"].get("gpt4o_vision") or cascade["outcomes"].get("phash_cache")
+        if answered is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Could not identify the media: no recognition stage answered within the deadline"
+            )
+        raise HTTPException(
+            status_code=404,
+            detail=f"Could not identify the media with sufficient confidence. GPT-4o said: {answered['gpt_result'].get('reasoning', 'Unknown')}"
+        )
+
+    # Step 1: Identified by GPT-4o Vision (fresh or cached)
+    gpt_result, cache_hit = outcome["gpt_result"], outcome["cache_hit"]
+    emit("identification", {"method": "gpt4o_vision", "cache_hit": cache_hit, **gpt_result})
+
+    # Step 2: Search TMDB for verification and metadata
+    log("debug", "tmdb_search", title=gpt_result["title"])
+    with stopwatch(timings, "tmdb_search"):
+        tmdb_result = await lookup(
+            ("search", gpt_result["title"].lower(), gpt_result.get("media_type"), gpt_result.get("year")),
+            lambda: search_tmdb(
+                title=gpt_result["title"],
+                media_type=gpt_result.get("media_type"),
+                year=gpt_result.get("year")
+            )
+        )
+
+    emit("tmdb_match", tmdb_result)
+
+    if not tmdb_result:
+        # Return GPT result even without TMDB match
+        return {
+            "method": "gpt4o_vision",
+            "cache_hit": cache_hit,
+            "gpt_identification": gpt_result,
+            "identified_media_id": None,
+            "media_type": gpt_result.get("media_type", "unknown"),
+            "match_confidence": gpt_result["confidence"],
+            "tmdb_match": None,
+            "note": "GPT-4o identified the media but TMDB search found no match",
+            "stage_timings_ms": timings,
+            "cascade": cascade_summary(cascade),
+        }
+
+    # Step 3: Get detailed TMDB info
+    media_id = str(tmdb_result["id"])
+    media_type = tmdb_result["media_type"]
+    with stopwatch(timings, "tmdb_details"):
+        tmdb_details = await lookup(
+            ("details", media_id, media_type),
+            lambda: get_tmdb_details(media_id, media_type, append)
+        )
+
+    return announce(attach_includes({
+        "method": "gpt4o_vision",
+        "cache_hit": cache_hit,
+        "gpt_identification": gpt_result,
+        "identified_media_id": media_id,
+        "media_type": media_type,
+        "match_confidence": gpt_result["confidence"],
+        "tmdb_match": tmdb_details or tmdb_result,
+        "stage_timings_ms": timings,
+        "cascade": cascade_summary(cascade),
+    }, tmdb_details, append, country))
+
+
+# Recognize include= options mapped to TMDB append_to_response names
+INCLUDE_APPENDS = {
+    "providers": "watch/providers",
+    "credits": "credits",
+}
+
+
+# fields=compact: what the iOS app decodes (Models.swift), instead of the full TMDB details blob
+RECOGNIZE_FIELD_PRESETS = {
+    "compact": (
+        "method", "identified_media_id", "media_type", "match_confidence", "providers",
+        "tmdb_match.id", "tmdb_match.title", "tmdb_match.name", "tmdb_match.overview", "tmdb_match.tagline",
+        "tmdb_match.vote_average", "tmdb_match.vote_count", "tmdb_match.release_date",
+        "tmdb_match.first_air_date", "tmdb_match.runtime", "tmdb_match.genres", "tmdb_match.status",
+        "tmdb_match.number_of_seasons", "tmdb_match.number_of_episodes", "tmdb_match.poster_path",
+        "tmdb_match.backdrop_path", "tmdb_match.credits.cast.id", "tmdb_match.credits.cast.name",
+        "tmdb_match.credits.cast.character", "tmdb_match.credits.cast.profile_path",
+    ),
+}
+FIELDS_DESCRIPTION = "Comma-separated response keys to keep, dotted for nested ones (tmdb_match.title), or compact"
+
+
+def parse_include(include: str) -> list:
+    """Turn a comma-separated include= value into TMDB append_to_response names."""
+    if not include:
+        return []
+    names = [name.strip() for name in include.split(",") if name.strip()]
+    unknown = [name for name in names if name not in INCLUDE_APPENDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported include value(s): {', '.join(unknown)}. Supported: {', '.join(INCLUDE_APPENDS)}"
+        )
+    return [INCLUDE_APPENDS[name] for name in dict.fromkeys(names)]
+
+
+def summarize_providers(data: dict, country: str) -> dict:
+    """Reduce a TMDB watch/providers payload to our simplified provider list."""
+    # Extract providers for the specified country
+    results = data.get("results", {})
+    country_data = results.get(country, {})
+
+    if not country_data:
+        return {
+            "available": False,
+            "providers": [],
+            "tiers": {},
+            "country": country
+        }
+
+    # Subscription services stay in "providers"; every tier is in "tiers"
+    tiers = provider_catalog.services_by_tier(country_data)
+    provider_list = tiers.get("flatrate", [])
+
+    return {
+        "available": len(provider_list) > 0,
+        "providers": provider_list,
+        "tiers": tiers,
+        "country": country,
+        "link": country_data.get("link")
+    }
+
+
+def attach_includes(response: dict, tmdb_details: dict, append: list, country: str) -> dict:
+    """Move appended provider data out of the details blob into its own response field."""
+    if "watch/providers" not in append:
+        return response
+    if not tmdb_details:
+        response["providers"] = None
+        return response
+
+    # tmdb_details is shared with the cache, so copy rather than pop
+    response["tmdb_match"] = {k: v for k, v in tmdb_details.items() if k != "watch/providers"}
+    response["providers"] = summarize_providers(tmdb_details.get("watch/providers", {}), country)
+    return response
 
 
 # --- API Endpoints ---
@@ -204,6 +1025,46 @@ def read_root():
     }
 
 
+@app.get("/api/v1/stats", tags=["General"])
+def stats_endpoint():
+    """Cache hit/miss counters and per-stage latency/hit-rate."""
+    return {
+        "recognition_cache": recognition_cache.stats(),
+        "tmdb_cache": tmdb_cache.stats(),
+        "embedding_fast_path": embedding_stage is not None,
+        "ocr_fast_path": ocr_stage is not None,
+        "embedding_db": {
+            "version": embedding_stage[1].version,
+            "titles": len(embedding_stage[1])
+        } if embedding_stage is not None else None,
+        "stages": {name: stats.summary() for name, stats in stage_stats.items()},
+        "upstreams": {"tmdb": tmdb_upstream.stats(), "openai": {"breaker": openai_breaker.stats()}},
+    }
+
+
+@app.get("/metrics", tags=["General"], response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Latency histograms, upstream token/byte counters and cache counters in Prometheus text format."""
+    recognition = recognition_cache.stats()
+    tmdb = tmdb_cache.stats()
+    snapshot = {
+        "snapnsee_cache_lookups_total": ("Cache lookups by cache and result", {
+            (("cache", "phash"), ("result", "hit")): recognition["hits"],
+            (("cache", "phash"), ("result", "miss")): recognition["misses"],
+            (("cache", "tmdb"), ("result", "memory_hit")): tmdb["memory_hits"],
+            (("cache", "tmdb"), ("result", "disk_hit")): tmdb["disk_hits"],
+            (("cache", "tmdb"), ("result", "miss")): tmdb["misses"],
+            (("cache", "tmdb"), ("result", "coalesced")): tmdb["coalesced"],
+            (("cache", "tmdb"), ("result", "stale")): tmdb["stale_served"],
+        }),
+        "snapnsee_stage_calls_total": ("Recognition stage calls by stage and outcome", {
+            **{(("stage", name), ("result", "hit")): stats.hits for name, stats in stage_stats.items()},
+            **{(("stage", name), ("result", "miss")): stats.calls - stats.hits for name, stats in stage_stats.items()},
+        }),
+    }
+    return PlainTextResponse(telemetry.render(snapshot), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/test", tags=["General"])
 def test_interface():
     """Serve the test web interface."""
@@ -211,153 +1072,418 @@ def test_interface():
 
 
 @app.post("/api/v1/recognize", tags=["Recognition"])
-async def recognize_image_endpoint(file: UploadFile = File(...)):
+async def recognize_image_endpoint(
+    file: UploadFile = File(...),
+    include: str = Query(None, description="Comma-separated extras: providers, credits"),
+    country: str = "US",
+    deadline_ms: float = Query(None, gt=0, description="Identification time budget; a tight one runs stages in parallel"),
+    fields: str = Query(None, description=FIELDS_DESCRIPTION)
+):
     """
-    Accepts an image and identifies the movie/show using GPT-4o Vision.
+    Accepts an image and identifies the movie/show through the recognition
+    cascade (perceptual cache, CLIP embedding, OCR, then GPT-4o Vision).
     Then enriches the result with TMDB metadata.
+    With include=providers,credits the extras are fetched in the same TMDB
+    details call, saving the client a second /api/v1/providers round trip.
+    The response's "cascade" field records every stage's decision and timing.
+    Upstream calls share a REQUEST_BUDGET_SECONDS budget.
+    fields= trims the response, e.g. fields=compact for what the iOS app reads.
     """
+    append = parse_include(include)
+    selection = parse_fields(fields, RECOGNIZE_FIELD_PRESETS)
+
     try:
-        # Read image bytes
-        image_bytes = await file.read()
+        timings = {}
+
+        # Read, validate and decode the upload in a single pass
+        with stopwatch(timings, "upload"):
+            image_bytes, image = await load_upload(file)
+
+        with request_budget(REQUEST_BUDGET_SECONDS):
+            result = await recognize_prepared(image, image_bytes, timings, append, country, deadline_ms=deadline_ms)
+        return FastJSONResponse(select_fields(result, selection))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        log("error", "recognition_failed", error=str(e))
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+
+@app.post("/api/v1/recognize/stream", tags=["Recognition"])
+async def recognize_stream_endpoint(
+    file: UploadFile = File(...),
+    include: str = Query(None, description="Comma-separated extras: providers, credits"),
+    country: str = "US",
+    deadline_ms: float = Query(None, gt=0, description="Identification time budget; a tight one runs stages in parallel"),
+    fields: str = Query(None, description=FIELDS_DESCRIPTION)
+):
+    """
+    Streaming variant of /api/v1/recognize as Server-Sent Events, so the
+    client can render the title long before the details arrive. Events, in
+    order of arrival:
+      stage           a cascade stage's decision (see the "cascade" response field)
+      candidate       the top CLIP/OCR guess, whether or not it was accepted
+      identification  the accepted identification (fast path or GPT-4o)
+      tmdb_match      the TMDB search hit for a GPT-4o identification
+      details         TMDB details
+      providers       streaming availability, with include=providers
+      result          the /api/v1/recognize response (trimmed by fields=), last
+      error           {status_code, detail} instead of result on failure
+    Every event's data is {"elapsed_ms": since the request arrived, "data": payload}.
+    """
+    started = time.perf_counter()
+    append = parse_include(include)
+    selection = parse_fields(fields, RECOGNIZE_FIELD_PRESETS)
+    timings = {}
+
+    # Upload problems are still plain 4xx responses; the stream starts once there's an image
+    with stopwatch(timings, "upload"):
+        image_bytes, image = await load_upload(file)
+
+    events = asyncio.Queue()
+
+    def emit(event: str, data):
+        events.put_nowait((event, {"elapsed_ms": round((time.perf_counter() - started) * 1000, 2), "data": data}))
 
-        # Validate it's an image
+    async def run():
         try:
-            image = Image.open(BytesIO(image_bytes))
-            image.verify()
-        except Exception:
-            raise HTTPException(status_code=400, detail="Invalid image file")
-
-        # Re-read bytes (verify consumes the stream)
-        image_bytes = await file.read()
-        if not image_bytes:
-            await file.seek(0)
-            image_bytes = await file.read()
-
-        # Step 1: Identify with GPT-4o Vision
-        print("DEBUG: Calling GPT-4o Vision for identification...")
-        gpt_result = identify_media_with_gpt4o(image_bytes)
-
-        if gpt_result["confidence"] < 0.5:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Could not identify the media with sufficient confidence. GPT-4o said: {gpt_result.get('reasoning', 'Unknown')}"
+            with request_budget(REQUEST_BUDGET_SECONDS):
+                result = await recognize_prepared(image, image_bytes, timings, append, country,
+                                                  deadline_ms=deadline_ms, emit=emit)
+            emit("result", select_fields(result, selection))
+        except HTTPException as e:
+            emit("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            log("error", "streaming_recognition_failed", error=str(e))
+            emit("error", {"status_code": 500, "detail": f"An unexpected error occurred: {str(e)}"})
+        finally:
+            events.put_nowait(None)
+
+    async def stream():
+        task = asyncio.ensure_future(run())
+        try:
+            while (item := await events.get()) is not None:
+                event, data = item
+                yield f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+        finally:
+            # Client went away: stop the remaining stages and lookups
+            task.cancel()
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@timed("frame_decode")
+def decode_frame(data: bytes) -> tuple:
+    """
+    Decode and shrink one live camera frame and hash it for scene tracking.
+    Returns (image, dhash); raises UnsupportedImageFormat/OSError on bad input.
+    """
+    image_format = sniff_image_format(data[:64])
+    if image_format is None:
+        raise UnsupportedImageFormat("Unrecognised frame format")
+    image = prepare_image(open_image(data, image_format), LIVE_MAX_EDGE)
+    return image, dhash(image)
+
+
+@app.websocket("/api/v1/recognize/live")
+async def recognize_live_endpoint(websocket: WebSocket, include: str = None, country: str = "US",
+                                  fields: str = None):
+    """
+    Live recognition from the camera preview. The client sends low-resolution
+    JPEG/PNG frames as binary messages; the server replies with JSON text
+    messages:
+      candidate  best CLIP/OCR guess for a new scene that no stage accepted
+      result     a /api/v1/recognize response, as soon as a scene is identified
+      no_match   GPT-4o couldn't identify a stable scene
+      error      a frame couldn't be decoded
+    Frames perceptually unchanged from the last processed one are dropped.
+    Each new scene runs only the free local stages (cache, CLIP, OCR); the
+    vision call fires once a scene has held for LIVE_STABLE_FRAMES frames
+    without an answer, at most once per scene. Only the newest
+    LIVE_QUEUE_FRAMES frames are queued per connection (older ones are
+    dropped), and a client that stops reading is disconnected after
+    LIVE_SEND_TIMEOUT_SECONDS.
+    """
+    try:
+        append = parse_include(include)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    selection = parse_fields(fields, RECOGNIZE_FIELD_PRESETS)
+    await websocket.accept()
+
+    frames = LatestFrameQueue(LIVE_QUEUE_FRAMES)
+    scenes = SceneTracker(LIVE_STABLE_FRAMES, LIVE_DUPLICATE_DISTANCE)
+    counters = {"duplicates": 0, "processed": 0, "vision_calls": 0}
+
+    def frame_stats() -> dict:
+        return {"received": frames.received, "dropped": frames.dropped, "scenes": scenes.scenes, **counters}
+
+    async def send(message: dict):
+        await asyncio.wait_for(websocket.send_text(dumps(message).decode()), LIVE_SEND_TIMEOUT_SECONDS)
+
+    async def receive():
+        sequence = 0
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            data = message.get("bytes")
+            if data is None:
+                continue
+            if len(data) > LIVE_MAX_FRAME_BYTES:
+                await websocket.close(code=1009, reason=f"Frame larger than {LIVE_MAX_FRAME_BYTES} bytes")
+                return
+            sequence += 1
+            frames.put((sequence, data))
+
+    async def process():
+        while True:
+            sequence, data = await frames.get()
+            try:
+                image, frame_hash = await run_in_threadpool(decode_frame, data)
+            except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+                await send({"type": "error", "frame": sequence, "detail": "Invalid image frame"})
+                continue
+
+            scene = scenes.observe(frame_hash)
+            if scene == SAME_SCENE:
+                counters["duplicates"] += 1
+                continue
+            counters["processed"] += 1
+            escalate = scene == STABLE_SCENE
+            counters["vision_calls"] += int(escalate)
+
+            candidates = []
+            timings = {}
+            try:
+                with request_budget(REQUEST_BUDGET_SECONDS):
+                    result = await recognize_prepared(
+                        image, data, timings, append, country, cost_budget=None if escalate else 0,
+                        emit=lambda event, payload: candidates.append(payload) if event == "candidate" else None
+                    )
+            except HTTPException as e:
+                if escalate:
+                    scenes.resolve()
+                    await send({"type": "no_match", "frame": sequence, "detail": e.detail, "frames": frame_stats()})
+                elif candidates:
+                    best = max(candidates, key=lambda candidate: candidate["similarity"])
+                    await send({"type": "candidate", "frame": sequence, "candidate": best})
+                continue
+            scenes.resolve()
+            await send({"type": "result", "frame": sequence, "result": select_fields(result, selection),
+                        "frames": frame_stats()})
+
+    tasks = [asyncio.ensure_future(receive()), asyncio.ensure_future(process())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is not None and not isinstance(task.exception(), asyncio.TimeoutError):
+                log("error", "live_recognition_failed", error=str(task.exception()))
+    finally:
+        for task in tasks:
+            task.cancel()
+    log("info", "live_recognition_closed", **frame_stats())
+
+
+@app.post("/api/v1/recognize/batch", tags=["Recognition"])
+async def recognize_batch_endpoint(
+    files: List[UploadFile] = File(...),
+    include: str = Query(None, description="Comma-separated extras: providers, credits"),
+    country: str = "US",
+    pack: bool = Query(False, description="Send up to BATCH_PACK_SIZE images per GPT-4o request"),
+    deadline_ms: float = Query(None, gt=0, description="Per-image identification time budget"),
+    fields: str = Query(None, description=FIELDS_DESCRIPTION)
+):
+    """
+    Recognizes several crops (e.g. a row of Netflix tiles) in one request.
+    Uploads are decoded concurrently and embedded in a single CLIP batch,
+    GPT-4o calls run concurrently up to BATCH_VISION_CONCURRENCY, and
+    identical TMDB lookups within the batch are made once. Each image gets
+    its own result or error, so one bad frame doesn't fail the batch.
+    With pack=true, crops that need GPT-4o share multi-image requests, which
+    cuts upstream calls and repeated prompt tokens for same-screen batches.
+    fields= trims each image's result as it does for /api/v1/recognize.
+    """
+    if len(files) > BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many images: {len(files)} (limit {BATCH_MAX_IMAGES})"
+        )
+    append = parse_include(include)
+    selection = parse_fields(fields, RECOGNIZE_FIELD_PRESETS)
+    batch_timings = {}
+
+    with stopwatch(batch_timings, "upload"):
+        loaded = await asyncio.gather(*(load_upload(file) for file in files), return_exceptions=True)
+    ok = [i for i, item in enumerate(loaded) if not isinstance(item, BaseException)]
+    item_timings = [{} for _ in files]
+
+    # Embed every decoded image in one forward pass and score them as one block
+    candidates = [None] * len(files)
+    if embedding_stage is not None and ok:
+        embedder, index = embedding_stage
+        with stopwatch(batch_timings, "clip_embedding"):
+            found_all = await run_in_threadpool(embed_and_search_batch, embedder, index, [loaded[i][1] for i in ok])
+            for i, found in zip(ok, found_all):
+                candidates[i] = found
+        for i in ok:
+            stage_stats["clip_embedding"].record(
+                batch_timings["clip_embedding"] / len(ok), best_embedding_match(candidates[i]) is not None
             )
 
-        # Step 2: Search TMDB for verification and metadata
-        print(f"DEBUG: Searching TMDB for: {gpt_result['title']}")
-        tmdb_result = search_tmdb(
-            title=gpt_result["title"],
-            media_type=gpt_result.get("media_type"),
-            year=gpt_result.get("year")
+    # OCR the crops CLIP couldn't place; tesseract runs in the threadpool, so concurrently
+    text_candidates = [None] * len(files)
+    unmatched = [i for i in ok if best_embedding_match(candidates[i]) is None]
+    if ocr_stage is not None and unmatched:
+        with stopwatch(batch_timings, "ocr_text"):
+            found = await asyncio.gather(*(read_screen_text(loaded[i][1], item_timings[i]) for i in unmatched))
+        for i, matches in zip(unmatched, found):
+            text_candidates[i] = matches
+
+    vision_slots = asyncio.Semaphore(BATCH_VISION_CONCURRENCY)
+    shared_lookups = {}
+
+    def dedupe(key, factory):
+        if key not in shared_lookups:
+            shared_lookups[key] = asyncio.ensure_future(factory())
+        return shared_lookups[key]
+
+    async def run_item(i):
+        if isinstance(loaded[i], BaseException):
+            raise loaded[i]
+        image_bytes, image = loaded[i]
+        precomputed = {"embedding_candidates": candidates[i], "text_candidates": text_candidates[i]}
+        if i in identified:
+            precomputed["identified"] = identified[i]
+        return await recognize_prepared(
+            image, image_bytes, item_timings[i], append, country, vision_slots, dedupe, precomputed, deadline_ms
         )
 
-        if not tmdb_result:
-            # Return GPT result even without TMDB match
-            return {
-                "method": "gpt4o_vision",
-                "gpt_identification": gpt_result,
-                "identified_media_id": None,
-                "media_type": gpt_result.get("media_type", "unknown"),
-                "match_confidence": gpt_result["confidence"],
-                "tmdb_match": None,
-                "note": "GPT-4o identified the media but TMDB search found no match"
-            }
+    # The packed vision calls and every item's lookups share one upstream budget
+    with request_budget(REQUEST_BUDGET_SECONDS):
+        identified = {}
+        if pack:
+            needs_vision = [i for i in unmatched if best_text_match(text_candidates[i]) is None]
+            with stopwatch(batch_timings, "packed_vision"):
+                packed = await identify_images_packed(
+                    [(loaded[i][1], loaded[i][0], item_timings[i]) for i in needs_vision], vision_slots
+                )
+            identified = dict(zip(needs_vision, packed))
 
-        # Step 3: Get detailed TMDB info
-        media_id = str(tmdb_result["id"])
-        media_type = tmdb_result["media_type"]
-        tmdb_details = get_tmdb_details(media_id, media_type)
+        with stopwatch(batch_timings, "recognize"):
+            outcomes = await asyncio.gather(*(run_item(i) for i in range(len(files))), return_exceptions=True)
 
-        return {
-            "method": "gpt4o_vision",
-            "gpt_identification": gpt_result,
-            "identified_media_id": media_id,
-            "media_type": media_type,
-            "match_confidence": gpt_result["confidence"],
-            "tmdb_match": tmdb_details or tmdb_result,
-        }
+    results = []
+    for i, (file, outcome) in enumerate(zip(files, outcomes)):
+        item = {"index": i, "filename": file.filename}
+        if isinstance(outcome, HTTPException):
+            item.update(status_code=outcome.status_code, error=outcome.detail)
+        elif isinstance(outcome, BaseException):
+            log("error", "batch_item_failed", index=i, error=str(outcome))
+            item.update(status_code=500, error=f"An unexpected error occurred: {str(outcome)}")
+        else:
+            item.update(status_code=200, result=select_fields(outcome, selection))
+        results.append(item)
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"ERROR: Unexpected error in recognition: {e}")
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    return FastJSONResponse({
+        "count": len(results),
+        "succeeded": sum(1 for item in results if item["status_code"] == 200),
+        "results": results,
+        "stage_timings_ms": batch_timings,
+    })
 
 
 @app.get("/api/v1/providers/{media_type}/{media_id}", tags=["Providers"])
-async def get_providers(media_type: str, media_id: str, country: str = "US"):
+@timed("providers")
+async def get_providers(media_type: str, media_id: str, country: str = "US",
+                        if_none_match: str = Header(None)):
     """
     Fetches streaming provider availability for a given media item from TMDB.
+    Responses carry an ETag and Cache-Control (PROVIDERS_CACHE_MAX_AGE_SECONDS),
+    so a client or CDN revalidating with If-None-Match gets an empty 304
+    while availability is unchanged.
     """
     if not TMDB_API_KEY or TMDB_API_KEY == "YOUR_TMDB_API_KEY":
         raise HTTPException(status_code=500, detail="TMDB API key not configured")
 
     try:
         # Call TMDB watch/providers endpoint
-        tmdb_url = f"{TMDB_API_URL}/{media_type}/{media_id}/watch/providers"
-        params = {"api_key": TMDB_API_KEY}
+        with request_budget(REQUEST_BUDGET_SECONDS):
+            data = await tmdb_get(
+                f"/{media_type}/{media_id}/watch/providers",
+                ttl_seconds=TMDB_PROVIDERS_TTL_SECONDS
+            )
 
-        response = requests.get(tmdb_url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        return cacheable_json(summarize_providers(data, country), if_none_match, PROVIDERS_CACHE_MAX_AGE_SECONDS)
 
-        # Extract providers for the specified country
-        results = data.get("results", {})
-        country_data = results.get(country, {})
+    except httpx.HTTPError as e:
+        log("error", "tmdb_providers_failed", media_id=media_id, media_type=media_type, error=str(e))
+        raise HTTPException(status_code=500, detail="Failed to fetch provider data")
 
-        if not country_data:
-            return {
-                "available": False,
-                "providers": [],
-                "country": country
-            }
 
-        # Get flatrate (subscription) providers
-        flatrate = country_data.get("flatrate", [])
+class ProviderLookup(BaseModel):
+    # Both end up in the TMDB path, so only a media type and a numeric id get through
+    media_type: Literal["movie", "tv"]
+    media_id: str = Field(pattern=r"^\d+$")
 
-        # Map provider names to simplified IDs
-        provider_list = []
-        for provider in flatrate:
-            provider_name = provider.get("provider_name", "").lower()
-            provider_id = map_provider_id(provider_name)
-            if provider_id and provider_id not in provider_list:
-                provider_list.append(provider_id)
 
-        return {
-            "available": len(provider_list) > 0,
-            "providers": provider_list,
-            "country": country,
-            "link": country_data.get("link")
-        }
+class ProvidersBatchRequest(BaseModel):
+    items: List[ProviderLookup]
+    countries: List[str] = ["US"]
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching providers from TMDB: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch provider data")
 
+@app.post("/api/v1/providers/batch", tags=["Providers"])
+async def providers_batch_endpoint(request: ProvidersBatchRequest):
+    """
+    Resolves provider availability for many titles (e.g. a whole watchlist)
+    in one call. Lookups run with bounded concurrency through the shared
+    TMDB cache, and results stream back as NDJSON, one line per title in
+    completion order, so the client can render rows as they arrive.
+    """
+    if not TMDB_API_KEY or TMDB_API_KEY == "YOUR_TMDB_API_KEY":
+        raise HTTPException(status_code=500, detail="TMDB API key not configured")
+    if len(request.items) > PROVIDERS_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many items: {len(request.items)} (limit {PROVIDERS_BATCH_MAX_ITEMS})"
+        )
+
+    items = list(dict.fromkeys((item.media_type, item.media_id) for item in request.items))
+    countries = list(dict.fromkeys(request.countries)) or ["US"]
+    slots = asyncio.Semaphore(PROVIDERS_BATCH_CONCURRENCY)
 
-def map_provider_id(tmdb_name: str) -> str:
-    """Map TMDB provider name to our simplified ID"""
-    if "netflix" in tmdb_name:
-        return "netflix"
-    if "hulu" in tmdb_name:
-        return "hulu"
-    if "hbo" in tmdb_name or "max" in tmdb_name:
-        return "hbo"
-    if "disney" in tmdb_name:
-        return "disney"
-    if "prime" in tmdb_name or "amazon" in tmdb_name:
-        return "prime"
-    if "apple" in tmdb_name:
-        return "apple"
-    if "paramount" in tmdb_name:
-        return "paramount"
-    if "peacock" in tmdb_name:
-        return "peacock"
-    if "showtime" in tmdb_name:
-        return "showtime"
-    if "starz" in tmdb_name:
-        return "starz"
-    return None
+    async def lookup(media_type: str, media_id: str) -> dict:
+        line = {"media_type": media_type, "media_id": media_id}
+        async with slots:
+            try:
+                data = await tmdb_get(
+                    f"/{media_type}/{media_id}/watch/providers",
+                    ttl_seconds=TMDB_PROVIDERS_TTL_SECONDS
+                )
+                results = {country: summarize_providers(data, country) for country in countries}
+            except httpx.HTTPError as e:
+                log("error", "tmdb_providers_failed", media_id=media_id, media_type=media_type, error=str(e))
+                return {**line, "status_code": 500, "error": "Failed to fetch provider data"}
+            except Exception as e:
+                # An odd payload must not end the stream for every title after this one
+                log("error", "providers_batch_item_failed", media_id=media_id, media_type=media_type, error=str(e))
+                return {**line, "status_code": 500, "error": f"An unexpected error occurred: {str(e)}"}
+        return {**line, "status_code": 200, "results": results}
+
+    async def stream():
+        tasks = [asyncio.ensure_future(lookup(*item)) for item in items]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield dumps(await next_done) + b"\n"
+        finally:
+            # Client went away: stop the remaining lookups
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 
 if __name__ == "__main__":
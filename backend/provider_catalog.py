@@ -0,0 +1,77 @@
+"""
+TMDB provider normalisation.
+
+TMDB reports providers as {provider_id, provider_name}; the app only cares
+about a handful of services (netflix, hbo, prime, ...). Known provider ids
+map straight to a service via the bundled table in data/tmdb_providers.json,
+loaded once at startup. Names missing from the table fall back to a single
+compiled regex, which matches whole words and picks the service named first,
+so "Paramount+ Amazon Channel" is paramount (not prime) and "Cinemax" is not
+mistaken for Max.
+"""
+
+import json
+import re
+
+# Availability tiers as TMDB names them in watch/providers
+TIERS = ("flatrate", "free", "ads", "rent", "buy")
+
+_SERVICE_PATTERN = re.compile(
+    r"\b(?:"
+    r"(?P<netflix>netflix)"
+    r"|(?P<hulu>hulu)"
+    r"|(?P<hbo>hbo|(?<![\w+])max(?=\s*$|\s+amazon channel))"
+    r"|(?P<disney>disney)"
+    r"|(?P<paramount>paramount)"
+    r"|(?P<peacock>peacock)"
+    r"|(?P<showtime>showtime)"
+    r"|(?P<starz>starz)"
+    r"|(?P<apple>apple\s?tv)"
+    r"|(?P<prime>prime video|amazon video)"
+    r")\b",
+    re.IGNORECASE,
+)
+
+
+def service_from_name(provider_name: str):
+    """Regex fallback: the first service named in provider_name, or None."""
+    match = _SERVICE_PATTERN.search(provider_name.strip())
+    return match.lastgroup if match else None
+
+
+class ProviderCatalog:
+    """provider_id -> service lookup with a memoised name fallback."""
+
+    def __init__(self, services_by_id: dict):
+        self.services_by_id = services_by_id
+        self._by_name = {}
+
+    @classmethod
+    def load(cls, path: str) -> "ProviderCatalog":
+        with open(path) as handle:
+            table = json.load(handle)
+        return cls({row["provider_id"]: row["service"] for row in table["providers"]})
+
+    def service_for(self, provider: dict):
+        """Return our simplified service id for a TMDB provider entry, or None."""
+        provider_id = provider.get("provider_id")
+        if provider_id in self.services_by_id:
+            return self.services_by_id[provider_id]
+
+        name = provider.get("provider_name", "")
+        if name not in self._by_name:
+            self._by_name[name] = service_from_name(name)
+        return self._by_name[name]
+
+    def services_by_tier(self, country_data: dict) -> dict:
+        """Map each TMDB tier present in country_data to its de-duplicated service list."""
+        tiers = {}
+        for tier in TIERS:
+            services = []
+            for provider in country_data.get(tier, []):
+                service = self.service_for(provider)
+                if service and service not in services:
+                    services.append(service)
+            if services:
+                tiers[tier] = services
+        return tiers
@@ -0,0 +1,186 @@
+"""
+Confidence-cascading recognition engine.
+
+A Recognizer runs an ordered cascade of stages (e.g. perceptual cache ->
+CLIP embedding -> OCR -> vision LLM). Each stage returns an outcome dict
+with a "confidence", or None when it has nothing to say; the first outcome
+at or above the stage's threshold wins and the remaining stages are
+skipped or cancelled.
+
+Every stage has a latency budget (its own timeout) and a cost (e.g. 1.0 for
+a paid vision call, 0 for local work); a request brings an overall deadline
+and cost budget. Stages normally run one after another, cheapest first.
+When the expected latency of the stages still to run no longer fits the
+time left before the deadline, the remaining affordable stages are started
+speculatively in parallel and the first confident answer wins.
+
+Expected latency is the stage's rolling p50 from real traffic (its
+StageStats), falling back to its budget until it has been called. Every
+stage's decision, timing and cost lands in the returned trace so the
+thresholds and budgets can be tuned from production responses.
+"""
+
+import asyncio
+import time
+
+from stage_stats import StageStats
+from telemetry import log
+
+# Trace decisions
+ACCEPTED = "accepted"
+SUPERSEDED = "superseded"  # confident, but an earlier stage finished in the same step and won
+BELOW_THRESHOLD = "below_threshold"
+NO_RESULT = "no_result"
+TIMEOUT = "timeout"
+ERROR = "error"
+CANCELLED = "cancelled"
+UNAVAILABLE = "unavailable"
+NO_TIME = "no_time"
+OVER_BUDGET = "over_budget"
+NOT_RUN = "not_run"
+
+
+class Stage:
+    """One step of the cascade: an async run(context) -> outcome dict or None."""
+
+    def __init__(self, name: str, run, threshold: float, budget_ms: float, cost: float = 0.0,
+                 available=None, stats: StageStats = None):
+        self.name = name
+        self.run = run
+        self.threshold = threshold
+        self.budget_ms = budget_ms
+        self.cost = cost
+        self._available = available
+        self.stats = stats
+
+    def available(self) -> bool:
+        return self._available() if self._available is not None else True
+
+    def expected_ms(self) -> float:
+        """Typical latency: the rolling p50 once the stage has run, else its budget."""
+        if self.stats is not None and self.stats.calls:
+            return self.stats.percentile(0.50)
+        return self.budget_ms
+
+
+class Recognizer:
+    """Runs Stages in order under a deadline and cost budget; see the module docstring."""
+
+    def __init__(self, stages: list, deadline_ms: float, cost_budget: float = float("inf")):
+        self.stages = stages
+        self.deadline_ms = deadline_ms
+        self.cost_budget = cost_budget
+
+    async def run(self, context: dict, deadline_ms: float = None, cost_budget: float = None,
+                  on_decision=None) -> dict:
+        """
+        Run the cascade for one request. Returns {"stage": winning stage name
+        or None, "outcome": its outcome, "outcomes": {stage name: outcome} for
+        every stage that finished, "cost": cost spent, "trace": per-stage
+        decisions in cascade order}. on_decision(entry, outcome) is called as
+        each stage's decision is made; outcome is None unless the stage
+        returned one.
+        """
+        started = time.perf_counter()
+        deadline = started + (deadline_ms if deadline_ms is not None else self.deadline_ms) / 1000
+        cost_budget = self.cost_budget if cost_budget is None else cost_budget
+
+        entries = {stage.name: {"stage": stage.name, "decision": NOT_RUN} for stage in self.stages}
+        running = {}  # task -> (stage, started, timeout)
+        outcomes = {}
+        spent = 0.0
+        position = 0
+        winner = None
+
+        def decide(stage, decision, outcome=None, **fields):
+            entries[stage.name].update(decision=decision, **fields)
+            if on_decision is not None:
+                on_decision(entries[stage.name], outcome)
+
+        def launch(stage, speculative):
+            nonlocal spent
+            remaining_ms = (deadline - time.perf_counter()) * 1000
+            if not stage.available():
+                decide(stage, UNAVAILABLE)
+            elif remaining_ms <= 0:
+                decide(stage, NO_TIME)
+            elif spent + stage.cost > cost_budget:
+                decide(stage, OVER_BUDGET, cost=stage.cost)
+            else:
+                spent += stage.cost
+                timeout = min(stage.budget_ms, remaining_ms) / 1000
+                task = asyncio.ensure_future(stage.run(context))
+                running[task] = (stage, time.perf_counter(), timeout)
+                entries[stage.name].update(
+                    decision="running", speculative=speculative, cost=stage.cost,
+                    start_ms=round((time.perf_counter() - started) * 1000, 2)
+                )
+
+        def tight(position):
+            """True when the running stages and those from position on can't finish in sequence in time."""
+            now = time.perf_counter()
+            expected = sum(max(stage.expected_ms() - (now - task_started) * 1000, 0)
+                           for stage, task_started, _ in running.values())
+            expected += sum(stage.expected_ms() for stage in self.stages[position:] if stage.available())
+            return expected > (deadline - now) * 1000
+
+        try:
+            while winner is None:
+                # Keep the next stage in order running; speculate on the rest when time is short
+                while not running and position < len(self.stages):
+                    launch(self.stages[position], speculative=False)
+                    position += 1
+                if position < len(self.stages) and tight(position):
+                    for stage in self.stages[position:]:
+                        launch(stage, speculative=True)
+                    position = len(self.stages)
+                if not running:
+                    break
+
+                now = time.perf_counter()
+                wait = min(task_started + timeout for _, task_started, timeout in running.values()) - now
+                done, _ = await asyncio.wait(list(running), timeout=max(wait, 0),
+                                             return_when=asyncio.FIRST_COMPLETED)
+
+                now = time.perf_counter()
+                for task, (stage, task_started, timeout) in list(running.items()):
+                    elapsed_ms = round((now - task_started) * 1000, 2)
+                    if task in done:
+                        del running[task]
+                        try:
+                            outcome = task.result()
+                        except Exception as e:
+                            log("warn", "recognition_stage_failed", stage=stage.name, error=str(e))
+                            decide(stage, ERROR, elapsed_ms=elapsed_ms, error=str(e))
+                            continue
+                        if outcome is None:
+                            decide(stage, NO_RESULT, elapsed_ms=elapsed_ms)
+                            continue
+                        outcomes[stage.name] = outcome
+                        confidence = outcome.get("confidence", 0.0)
+                        if confidence < stage.threshold:
+                            decision = BELOW_THRESHOLD
+                        elif winner is not None:
+                            decision = SUPERSEDED
+                        else:
+                            decision, winner = ACCEPTED, stage
+                        decide(stage, decision, outcome, elapsed_ms=elapsed_ms,
+                               confidence=round(confidence, 4), threshold=stage.threshold)
+                    elif now - task_started >= timeout:
+                        del running[task]
+                        task.cancel()
+                        decide(stage, TIMEOUT, elapsed_ms=elapsed_ms)
+        finally:
+            # A winner (or an error in the caller) makes whatever is still in flight moot
+            for task, (stage, task_started, _) in running.items():
+                task.cancel()
+                decide(stage, CANCELLED, elapsed_ms=round((time.perf_counter() - task_started) * 1000, 2))
+
+        return {
+            "stage": winner.name if winner is not None else None,
+            "outcome": outcomes.get(winner.name) if winner is not None else None,
+            "outcomes": outcomes,
+            "cost": spent,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "trace": [entries[stage.name] for stage in self.stages],
+        }
@@ -0,0 +1,206 @@
+"""
+Response payloads: a faster JSON encoder, fields= selection, ETags and
+compression.
+
+- dumps() / FastJSONResponse encode with orjson, falling back to the
+  stdlib encoder in its compact form if it is missing. Handlers that
+  return a FastJSONResponse themselves also skip FastAPI's
+  jsonable_encoder pass over the payload.
+- parse_fields() / select_fields() implement partial responses:
+  fields=identified_media_id,tmdb_match.title keeps only those keys
+  (applied to every element of a list), and named presets such as
+  "compact" expand to a list of paths.
+- cacheable_json() adds a weak ETag and Cache-Control and answers a
+  matching If-None-Match with an empty 304.
+- CompressionMiddleware compresses complete responses of at least
+  minimum_size bytes with brotli or gzip, whichever the client accepts,
+  brotli first (gzip only if the brotli package is missing). Streamed
+  bodies (SSE, NDJSON) pass through untouched so events are not held
+  back in a compressor's buffer.
+"""
+
+import gzip
+import hashlib
+import json
+
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse, Response
+
+from telemetry import registry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+response_bytes = registry.counter(
+    "snapnsee_response_bytes_total", "Compressed response bodies in bytes, before and after compression, by encoding"
+)
+
+
+def dumps(content) -> bytes:
+    """Compact UTF-8 JSON, via orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+# --- Field selection ---
+
+def parse_fields(fields: str, presets: dict = None):
+    """
+    Turn a comma-separated fields= value into a selection tree: {key: subtree},
+    where a subtree of None keeps the whole value. Returns None (everything)
+    when fields is empty. Names in presets expand to their list of paths.
+    """
+    if not fields:
+        return None
+    paths = []
+    for name in (name.strip() for name in fields.split(",")):
+        if name in (presets or {}):
+            paths.extend(presets[name])
+        elif name:
+            paths.append(name)
+
+    tree = {}
+    for path in paths:
+        node = tree
+        *parents, leaf = path.split(".")
+        for part in parents:
+            if part in node and node[part] is None:
+                break  # the whole parent is already selected
+            node = node.setdefault(part, {})
+        else:
+            node[leaf] = None
+    return tree or None
+
+
+def select_fields(value, tree):
+    """The parts of value named by a parse_fields() tree; missing keys are left out."""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [select_fields(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: select_fields(value[key], subtree) for key, subtree in tree.items() if key in value}
+
+
+# --- Conditional requests ---
+
+def etag_for(body: bytes) -> str:
+    # Weak: the same entity may be sent gzip- or brotli-encoded
+    return f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def cacheable_json(content, if_none_match: str = None, max_age: int = 0) -> Response:
+    """A JSON response with ETag and Cache-Control, or a bodyless 304 when the client's copy is current."""
+    body = dumps(content)
+    headers = {"ETag": etag_for(body), "Cache-Control": f"public, max-age={max_age}"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+# --- Compression ---
+
+def choose_encoding(accept_encoding: str):
+    """"br" or "gzip" if the Accept-Encoding header allows it (brotli only when installed), else None."""
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if weights.get(encoding, weights.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compressible(content_type: str) -> bool:
+    return content_type.startswith("text/") or "json" in content_type
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """Compress large complete responses with brotli or gzip; see the module docstring."""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.minimum_size <= 0:
+            await self.app(scope, receive, send)
+            return
+        accept = dict(scope.get("headers") or []).get(b"accept-encoding", b"").decode("latin-1")
+        encoding = choose_encoding(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        held = None
+
+        async def send_compressed(message):
+            nonlocal held
+            if message["type"] == "http.response.start":
+                # Wait for the first body chunk to know whether the response is complete and large enough
+                held = message
+                return
+            if held is None:
+                await send(message)
+                return
+            start, held = held, None
+            headers = MutableHeaders(raw=list(start.get("headers", [])))
+            body = message.get("body", b"")
+            eligible = compressible(headers.get("content-type", "")) and "content-encoding" not in headers
+            if eligible:
+                headers.add_vary_header("Accept-Encoding")
+            if not eligible or message.get("more_body") or len(body) < self.minimum_size:
+                await send({**start, "headers": headers.raw})
+                await send(message)
+                return
+            compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            response_bytes.inc(len(body), encoding=encoding, stage="uncompressed")
+            response_bytes.inc(len(compressed), encoding=encoding, stage="compressed")
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            await send({**start, "headers": headers.raw})
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,47 @@
+"""
+Per-stage latency and hit-rate counters for the recognition pipeline.
+"""
+
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class StageStats:
+    """Rolling latency window plus call/hit counters for one pipeline stage."""
+
+    def __init__(self, window: int = 1000):
+        self.calls = 0
+        self.hits = 0
+        self.latencies_ms = deque(maxlen=window)
+
+    def record(self, elapsed_ms: float, hit: bool):
+        self.calls += 1
+        self.hits += int(hit)
+        self.latencies_ms.append(elapsed_ms)
+
+    def percentile(self, q: float) -> float:
+        """Latency at quantile q (0-1) over the rolling window; 0.0 before any calls."""
+        ordered = sorted(self.latencies_ms)
+        if not ordered:
+            return 0.0
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    def summary(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.calls, 4) if self.calls else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+        }
+
+
+@contextmanager
+def stopwatch(timings: dict, name: str):
+    """Record the elapsed milliseconds of the block into timings[name]."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
@@ -0,0 +1,306 @@
+"""
+Lightweight in-process instrumentation: latency histograms, upstream
+token/byte counters, a Server-Timing response header and structured JSON
+logs.
+
+timed("name") works as a decorator (sync or async) and as a context
+manager. Each use observes snapnsee_operation_duration_seconds{operation=
+"name"} and, inside a request, adds a Server-Timing entry (repeated
+operations, e.g. several TMDB calls, are summed). TelemetryMiddleware
+gives every HTTP request an id, times it, and writes the header; render()
+produces the Prometheus text exposition for /metrics.
+
+Everything is process-local, so with several workers each one reports its
+own numbers; Prometheus sums them across scrape targets.
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+LATENCY_BUCKETS_SECONDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# {"id": request id, "timings": {operation: [total ms, count]}} for the current request, else None
+_request = contextvars.ContextVar("snapnsee_request", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_label_text(key)} {value:g}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, in the Prometheus layout."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS_SECONDS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[position] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_label_text(key + (('le', f'{bound:g}'),))} {cumulative}"
+            cumulative += series[len(self.buckets)]
+            yield f"{self.name}_bucket{_label_text(key + (('le', '+Inf'),))} {cumulative}"
+            yield f"{self.name}_sum{_label_text(key)} {series[-1]:.6f}"
+            yield f"{self.name}_count{_label_text(key)} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        existing = self._metrics.setdefault(metric.name, metric)
+        if type(existing) is not type(metric):
+            raise ValueError(f"Metric {metric.name} is already registered as a {existing.kind}")
+        return existing
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS_SECONDS) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+operation_seconds = registry.histogram(
+    "snapnsee_operation_duration_seconds", "Latency of instrumented operations (upstream calls, image handling)"
+)
+request_seconds = registry.histogram(
+    "snapnsee_http_request_duration_seconds", "HTTP request latency by route, method and status"
+)
+upstream_bytes = registry.counter(
+    "snapnsee_upstream_bytes_total", "Bytes exchanged with upstream APIs (OpenAI sent bytes are image payloads)"
+)
+upstream_tokens = registry.counter("snapnsee_upstream_tokens_total", "Tokens billed by the OpenAI API")
+upstream_errors = registry.counter("snapnsee_upstream_errors_total", "Failed upstream calls")
+
+
+def render(snapshot: dict = None) -> str:
+    """
+    The registry in Prometheus text format, plus counters kept elsewhere:
+    snapshot maps name -> (help, {labels tuple: value}) and is rendered as
+    counters, e.g. the caches' own hit/miss tallies.
+    """
+    lines = [registry.render()]
+    for name, (help_text, values) in (snapshot or {}).items():
+        lines.append(f"# HELP {name} {help_text}\n# TYPE {name} counter\n")
+        lines.extend(f"{name}{_label_text(labels)} {value:g}\n" for labels, value in values.items())
+    return "".join(lines)
+
+
+def count_tokens(usage, model: str):
+    """Add an OpenAI response's usage block (or None) to the token counters."""
+    if usage is None:
+        return
+    upstream_tokens.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+    upstream_tokens.inc(usage.completion_tokens or 0, model=model, kind="completion")
+
+
+def count_bytes(upstream: str, sent: int = 0, received: int = 0):
+    if sent:
+        upstream_bytes.inc(sent, upstream=upstream, direction="sent")
+    if received:
+        upstream_bytes.inc(received, upstream=upstream, direction="received")
+
+
+class timed:
+    """Time a block or every call of a function; see the module docstring."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_timing(self.name, time.perf_counter() - self._started)
+        return False
+
+    def __call__(self, function):
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with timed(self.name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed(self.name):
+                return function(*args, **kwargs)
+        return wrapper
+
+
+def record_timing(name: str, elapsed_seconds: float):
+    operation_seconds.observe(elapsed_seconds, operation=name)
+    request = _request.get()
+    if request is not None:
+        entry = request["timings"].setdefault(name, [0.0, 0])
+        entry[0] += elapsed_seconds * 1000
+        entry[1] += 1
+
+
+def server_timing(timings: dict, total_ms: float = None) -> str:
+    entries = [f'{name};dur={ms:.1f}' + (f';desc="x{count}"' if count > 1 else "")
+               for name, (ms, count) in list(timings.items())]
+    if total_ms is not None:
+        entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+def current_request_id():
+    request = _request.get()
+    return request["id"] if request is not None else None
+
+
+# --- Structured logs ---
+
+logger = logging.getLogger("snapnsee")
+LEVELS = {"debug": logging.DEBUG, "info": logging.INFO, "warn": logging.WARNING, "error": logging.ERROR}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, event, request_id (inside a request) and the event's fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            entry["request_id"] = request_id
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = "INFO"):
+    """Route the snapnsee logger to stdout as JSON lines (idempotent)."""
+    if not any(isinstance(handler.formatter, JsonFormatter) for handler in logger.handlers):
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        logger.addHandler(handler)
+    logger.setLevel(level.upper())
+    logger.propagate = False
+
+
+def log(level: str, event: str, **fields):
+    """Log a structured event, e.g. log("warn", "tmdb_search_failed", title=title, error=str(e))."""
+    number = LEVELS[level]
+    if logger.isEnabledFor(number):
+        logger.log(number, event, extra={"fields": fields, "request_id": current_request_id()})
+
+
+# --- ASGI middleware ---
+
+class TelemetryMiddleware:
+    """
+    Times each HTTP request, tags it with an X-Request-ID (the client's, if
+    sent), and adds Server-Timing with the operations timed so far when the
+    response starts. Streaming responses therefore only carry what finished
+    before their first byte. WebSocket and lifespan traffic passes through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = dict(scope.get("headers") or []).get(b"x-request-id", b"").decode("latin-1")[:64]
+        request = {"id": request_id or uuid.uuid4().hex[:16], "timings": {}}
+        token = _request.set(request)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_headers(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total_ms = (time.perf_counter() - started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(request["timings"], total_ms).encode("latin-1")))
+                headers.append((b"x-request-id", request["id"].encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            request_seconds.observe(elapsed, route=path, method=scope["method"], status=status)
+            log("info", "request", method=scope["method"], route=path, status=status,
+                duration_ms=round(elapsed * 1000, 2))
+            _request.reset(token)
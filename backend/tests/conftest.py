@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# The backend is a flat set of modules, not a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Tests that import main must not need real keys or touch the checked-in TMDB cache
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("TMDB_API_KEY", "stub")
+os.environ.setdefault("TMDB_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "tmdb_cache.sqlite3"))
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
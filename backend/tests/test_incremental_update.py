@@ -0,0 +1,110 @@
+"""
+Incremental embedding database updates and hot-swap, against the stub TMDB
+catalogue: a shifted catalogue with a few new posters must only embed and
+download those titles, drop the departed ones, and main.watch_embedding_db
+must swap the published version in while searches keep running.
+"""
+
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks.build_benchmark import CostModelEmbedder
+from benchmarks.stub_upstreams import create_stub_app, free_port, run_in_thread
+from embedding_pipeline import EmbeddingPipeline, signature, update_database
+from embedding_search import EmbeddingIndex
+from embedding_store import publish_database, read_database
+
+TITLES = 60     # per media type
+SHIFT = 5       # titles per media type that leave the catalogue
+REPOSTER = 3    # titles that get a new poster
+
+
+@pytest.fixture
+def stub_catalogue():
+    stub = create_stub_app(tmdb_delay=0.01, catalogue_size=TITLES)
+    port = free_port()
+    server = run_in_thread(stub, port)
+    yield stub, f"http://127.0.0.1:{port}/3", f"http://127.0.0.1:{port}/t/p"
+    server.should_exit = True
+
+
+@pytest.fixture
+def embedder():
+    return CostModelEmbedder(forward_ms=5, per_image_ms=1)
+
+
+def build(embedder, work_dir, db_path, api_url, image_root, incremental):
+    database = read_database(db_path) if incremental else {}
+    pipeline = EmbeddingPipeline(embedder, work_dir, api_url, image_root, api_key="stub", report_every=60)
+    meters = asyncio.run(pipeline.run(
+        {"tv": TITLES, "movie": TITLES},
+        known={key: signature(row) for key, row in database.items()},
+        refresh_pages=incremental,
+    ))
+    rows, counts = update_database(database, work_dir, pipeline.catalogue, meters["discover"].failed == 0)
+    return publish_database(db_path, rows), counts
+
+
+def test_incremental_update_only_embeds_changed_titles(stub_catalogue, embedder, tmp_path):
+    stub, api_url, image_root = stub_catalogue
+    work_dir = str(tmp_path / "work")
+    db_path = str(tmp_path / "movie_embeddings.npz")
+
+    version, counts = build(embedder, work_dir, db_path, api_url, image_root, False)
+    assert version == 1 and counts["embedded"] == 2 * TITLES
+
+    stub.state.catalogue_offset = SHIFT
+    stub.state.reposter = {1000 + SHIFT + n for n in range(REPOSTER)}
+    posters_before = stub.state.calls["poster"]
+    version, counts = build(embedder, work_dir, db_path, api_url, image_root, True)
+
+    assert version == 2
+    assert counts == {
+        "kept": 2 * (TITLES - SHIFT - REPOSTER),
+        "embedded": 2 * (SHIFT + REPOSTER),
+        "stale": 0,
+        "dropped": 2 * SHIFT,
+        "missing": 0,
+    }
+    assert stub.state.calls["poster"] - posters_before == counts["embedded"]
+
+    database = read_database(db_path)
+    assert len(database) == 2 * TITLES
+    assert not [f"{media_type}/{1000 + n}" for media_type in ("tv", "movie") for n in range(SHIFT)
+                if f"{media_type}/{1000 + n}" in database]
+
+
+def test_watcher_swaps_in_a_published_version(stub_catalogue, embedder, tmp_path, monkeypatch):
+    import main
+
+    _, api_url, image_root = stub_catalogue
+    db_path = str(tmp_path / "movie_embeddings.npz")
+    build(embedder, str(tmp_path / "work"), db_path, api_url, image_root, False)
+    rows = list(read_database(db_path).values())[:-10]
+
+    monkeypatch.setattr(main, "EMBEDDING_DB_PATH", db_path)
+    monkeypatch.setattr(main, "EMBEDDING_RELOAD_SECONDS", 0.1)
+    monkeypatch.setattr(main, "embedding_stage", (embedder, EmbeddingIndex.load(db_path)))
+    monkeypatch.setattr(main, "embedding_db_signature", main.stat_embedding_db())
+
+    async def hot_swap():
+        before = main.embedding_stage[1].version
+        watcher = asyncio.create_task(main.watch_embedding_db())
+        query = np.ones(512, dtype=np.float32) / np.sqrt(512)
+        await asyncio.to_thread(publish_database, db_path, rows)
+        for _ in range(100):
+            main.embedding_stage[1].search(query, k=3)
+            if main.embedding_stage[1].version != before:
+                break
+            await asyncio.sleep(0.05)
+        watcher.cancel()
+        return before, main.embedding_stage[1]
+
+    before, index = asyncio.run(hot_swap())
+    assert index.version == before + 1
+    assert len(index) == 2 * TITLES - 10
+    assert sorted(name for name in os.listdir(tmp_path) if ".v0" in name) == \
+        ["movie_embeddings.v0001.npz", "movie_embeddings.v0002.npz"]
@@ -0,0 +1,67 @@
+"""Golden checks for provider normalisation against data/tmdb_providers.json."""
+
+import json
+import os
+
+import pytest
+
+from provider_catalog import _SERVICE_PATTERN, ProviderCatalog, service_from_name
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "tmdb_providers.json")
+
+with open(TABLE_PATH) as handle:
+    ROWS = json.load(handle)["providers"]
+
+# Names that are not in the table, and what the fallback should say about them
+TRICKY_NAMES = {
+    "Cinemax": None,
+    "MaxDome": None,
+    "Max Stream": None,
+    "Paramount+ Amazon Channel": "paramount",
+    "Netflix basic with Ads": "netflix",
+    "Max": "hbo",
+    "HBO Max Amazon Channel": "hbo",
+    "AppleTV": "apple",
+    "Disney+": "disney",
+    "Crunchyroll": None,
+}
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return ProviderCatalog.load(TABLE_PATH)
+
+
+def test_table_has_one_row_per_provider():
+    ids = [row["provider_id"] for row in ROWS]
+    assert len(ids) == len(set(ids))
+
+
+def test_table_services_are_known():
+    services = set(_SERVICE_PATTERN.groupindex) | {None}
+    assert {row["service"] for row in ROWS} <= services
+
+
+@pytest.mark.parametrize("row", ROWS, ids=lambda row: f"{row['provider_id']}-{row['provider_name']}")
+def test_table_provider_resolves_by_id(catalog, row):
+    assert catalog.service_for({"provider_id": row["provider_id"], "provider_name": row["provider_name"]}) == row["service"]
+
+
+@pytest.mark.parametrize("row", [row for row in ROWS if row["service"]], ids=lambda row: row["provider_name"])
+def test_fallback_agrees_with_table(row):
+    assert service_from_name(row["provider_name"]) == row["service"]
+
+
+@pytest.mark.parametrize("name, expected", TRICKY_NAMES.items())
+def test_tricky_names(catalog, name, expected):
+    assert catalog.service_for({"provider_id": -1, "provider_name": name}) == expected
+
+
+def test_services_by_tier_dedupes_within_tiers(catalog):
+    country_data = {
+        "flatrate": [{"provider_id": 8, "provider_name": "Netflix"},
+                     {"provider_id": 1796, "provider_name": "Netflix basic with Ads"}],
+        "rent": [{"provider_id": 10, "provider_name": "Amazon Video"}],
+        "buy": [{"provider_id": 3, "provider_name": "Google Play Movies"}],
+    }
+    assert catalog.services_by_tier(country_data) == {"flatrate": ["netflix"], "rent": ["prime"]}
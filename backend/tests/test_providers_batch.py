@@ -0,0 +1,49 @@
+"""/api/v1/providers/batch: one NDJSON line per title, whatever happens to the others."""
+
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+async def fake_tmdb_get(path: str, params: dict = None, ttl_seconds: float = 0):
+    media_id = path.split("/")[2]
+    if media_id == "1":
+        raise httpx.ConnectError("TMDB unreachable")
+    if media_id == "2":
+        raise json.JSONDecodeError("Expecting value", "<html>", 0)
+    if media_id == "3":
+        return {"id": 3, "results": ["not", "a", "mapping"]}
+    return {"id": int(media_id), "results": {"US": {"flatrate": [{"provider_id": 8, "provider_name": "Netflix"}]}}}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "tmdb_get", fake_tmdb_get)
+    return TestClient(main.app)
+
+
+def test_failing_items_get_error_lines_and_the_stream_completes(client):
+    items = [{"media_type": "tv", "media_id": str(media_id)} for media_id in range(1, 6)]
+    response = client.post("/api/v1/providers/batch", json={"items": items})
+    assert response.status_code == 200
+
+    lines = {line["media_id"]: line for line in map(json.loads, response.text.splitlines())}
+    assert sorted(lines) == ["1", "2", "3", "4", "5"]
+    assert lines["1"] == {"media_type": "tv", "media_id": "1", "status_code": 500,
+                          "error": "Failed to fetch provider data"}
+    for media_id in ("2", "3"):
+        assert lines[media_id]["status_code"] == 500
+        assert lines[media_id]["error"].startswith("An unexpected error occurred")
+    for media_id in ("4", "5"):
+        assert lines[media_id]["status_code"] == 200
+        assert lines[media_id]["results"]["US"]["providers"] == ["netflix"]
+
+
+def test_invalid_lookups_are_rejected(client):
+    response = client.post("/api/v1/providers/batch",
+                           json={"items": [{"media_type": "person", "media_id": "1/../../account"}]})
+    assert response.status_code == 422
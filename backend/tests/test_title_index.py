@@ -0,0 +1,63 @@
+"""TitleIndex.resolve(): only unambiguous exact title matches answer locally."""
+
+import pytest
+
+from title_index import TitleIndex, rank_search_results
+
+
+def entry(media_id, media_type, title, year, popularity=10.0, alternates=()):
+    return {"media_id": str(media_id), "media_type": media_type, "title": title, "year": year,
+            "popularity": popularity, "alternates": list(alternates)}
+
+
+@pytest.fixture(scope="module")
+def index():
+    return TitleIndex([
+        entry(4982, "movie", "The Town", 2010, popularity=30.0),
+        entry(88001, "tv", "The Town", 2016, popularity=30.0),
+        entry(1990, "movie", "Star Wars", 1977, popularity=80.0),
+        entry(575264, "movie", "Mission: Impossible - Dead Reckoning Part One", 2023, popularity=60.0),
+        entry(1858, "movie", "Dune", 1984),
+        entry(438631, "movie", "Dune", 2021, popularity=90.0),
+        entry(2457, "tv", "Dune", 2000),
+        entry(66732, "tv", "Stranger Things", 2016, alternates=["Stranger Things (2016)"]),
+    ])
+
+
+@pytest.mark.parametrize("title, year, media_type", [
+    ("The Crown", 2016, "tv"),                                # fuzzy: "The Town"
+    ("Mission: Impossible - Fallout", None, "movie"),         # short: "Dead Reckoning"
+    ("Star Wars: The Empire Strikes Back", None, "movie"),    # short: "Star Wars"
+])
+def test_near_matches_do_not_resolve(index, title, year, media_type):
+    assert index.lookup(title, year, media_type)
+    assert index.resolve(title, year, media_type) is None
+
+
+def test_exact_title_resolves(index):
+    candidate = index.resolve("stranger things", 2016, "tv")
+    assert candidate["media_id"] == "66732" and candidate["match"] == "exact"
+
+
+def test_year_picks_between_same_name_titles(index):
+    assert index.resolve("Dune", 2021, "movie")["media_id"] == "438631"
+    assert index.resolve("Dune", 1984, "movie")["media_id"] == "1858"
+    assert index.resolve("Dune", 2000, "tv")["media_id"] == "2457"
+
+
+def test_same_name_titles_without_a_year_are_ambiguous(index):
+    assert index.resolve("Dune", None, "movie") is None
+
+
+def test_exact_match_contradicting_the_model_does_not_resolve(index):
+    assert index.resolve("Stranger Things", 2016, "movie") is None
+    assert index.resolve("Star Wars", 1950, "movie") is None
+
+
+def test_hints_break_ties_in_search_results():
+    results = [
+        {"id": 1, "media_type": "movie", "title": "Mission: Impossible - Fallout", "release_date": "2018-07-13"},
+        {"id": 2, "media_type": "movie", "title": "Mission: Impossible - Fallout", "release_date": "2018-07-13"},
+    ]
+    ranked = rank_search_results(results, "Mission: Impossible - Fallout", 2018, "movie", hints={("movie", "2")})
+    assert ranked[0]["id"] == 2
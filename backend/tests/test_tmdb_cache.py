@@ -0,0 +1,137 @@
+"""TMDBCache against the stub TMDB server: coalescing, the disk tier and stale-on-error."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from benchmarks.stub_upstreams import create_stub_app, free_port, run_in_thread
+from tmdb_cache import TMDBCache, make_key
+
+TMDB_DELAY = 0.2
+
+
+@pytest.fixture(scope="module")
+def stub_server():
+    stub = create_stub_app(tmdb_delay=TMDB_DELAY)
+    port = free_port()
+    server = run_in_thread(stub, port)
+    yield stub, f"http://127.0.0.1:{port}/3"
+    server.should_exit = True
+
+
+@pytest.fixture
+def stub(stub_server):
+    stub, _ = stub_server
+    stub.state.calls.clear()
+    stub.state.error_rates["tmdb"] = 0.0
+    return stub
+
+
+@pytest.fixture
+def fetcher(stub_server):
+    """fetcher(path) -> an async fetch() that GETs path from the stub, as main.tmdb_get does."""
+    _, base_url = stub_server
+
+    def make(path: str):
+        async def fetch():
+            async with httpx.AsyncClient(timeout=10) as http:
+                response = await http.get(f"{base_url}{path}", params={"api_key": "stub"})
+            response.raise_for_status()
+            return response.json()
+        return fetch
+
+    return make
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "tmdb_cache.sqlite3")
+
+
+def test_concurrent_misses_are_coalesced(stub, fetcher, cache_path):
+    cache = TMDBCache(cache_path)
+    path = "/tv/66732/watch/providers"
+
+    async def burst():
+        return await asyncio.gather(*(cache.get_or_fetch(make_key(path), 60, fetcher(path)) for _ in range(50)))
+
+    values = asyncio.run(burst())
+    assert stub.state.calls["watch_providers"] == 1
+    assert all(value == values[0] for value in values)
+    assert cache.misses == 1 and cache.coalesced == 49
+
+    asyncio.run(burst())
+    assert stub.state.calls["watch_providers"] == 1
+    assert cache.memory_hits == 50
+
+
+def test_second_cache_on_the_same_file_hits_disk(stub, fetcher, cache_path):
+    path = "/movie/603/watch/providers"
+    first = TMDBCache(cache_path)
+    value = asyncio.run(first.get_or_fetch(make_key(path), 60, fetcher(path)))
+    first.close()
+
+    # Another worker, or this one after a restart
+    second = TMDBCache(cache_path)
+    assert asyncio.run(second.get_or_fetch(make_key(path), 60, fetcher(path))) == value
+    assert stub.state.calls["watch_providers"] == 1
+    assert second.disk_hits == 1 and second.misses == 0
+
+
+def test_failures_are_not_cached(stub, fetcher, cache_path):
+    cache = TMDBCache(cache_path)
+    path = "/movie/604/watch/providers"
+    stub.state.error_rates["tmdb"] = 1.0
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(cache.get_or_fetch(make_key(path), 60, fetcher(path)))
+
+    stub.state.error_rates["tmdb"] = 0.0
+    asyncio.run(cache.get_or_fetch(make_key(path), 60, fetcher(path)))
+    assert stub.state.calls["watch_providers"] == 2
+
+
+def test_stale_value_is_served_when_the_refresh_fails(stub, fetcher, cache_path):
+    cache = TMDBCache(cache_path, max_stale_seconds=60)
+    path = "/movie/605/watch/providers"
+    value = asyncio.run(cache.get_or_fetch(make_key(path), 0.05, fetcher(path)))
+    time.sleep(0.1)
+
+    stub.state.error_rates["tmdb"] = 1.0
+    assert asyncio.run(cache.get_or_fetch(make_key(path), 0.05, fetcher(path))) == value
+    assert stub.state.calls["watch_providers"] == 2
+    assert cache.stale_served == 1
+
+
+def test_expired_value_past_the_stale_window_is_not_served(stub, fetcher, cache_path):
+    cache = TMDBCache(cache_path)
+    path = "/movie/606/watch/providers"
+    asyncio.run(cache.get_or_fetch(make_key(path), 0.05, fetcher(path)))
+    time.sleep(0.1)
+
+    stub.state.error_rates["tmdb"] = 1.0
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(cache.get_or_fetch(make_key(path), 0.05, fetcher(path)))
+
+
+def test_cancelled_leader_does_not_cancel_followers(stub, fetcher, cache_path):
+    cache = TMDBCache(cache_path)
+    path = "/tv/1399/watch/providers"
+
+    async def scenario():
+        leader = asyncio.ensure_future(cache.get_or_fetch(make_key(path), 60, fetcher(path)))
+        await asyncio.sleep(TMDB_DELAY / 4)
+        follower = asyncio.ensure_future(cache.get_or_fetch(make_key(path), 60, fetcher(path)))
+        await asyncio.sleep(0)
+        leader.cancel()
+        value = await follower
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return value
+
+    value = asyncio.run(scenario())
+    assert value["id"] == 1399
+    assert stub.state.calls["watch_providers"] == 1
+    assert cache.coalesced == 1
+    assert not cache._in_flight
@@ -0,0 +1,62 @@
+"""UpstreamClient against the stub TMDB server: the request budget and the circuit breaker."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from benchmarks.stub_upstreams import create_stub_app, free_port, run_in_thread
+from upstream import BudgetExhausted, CircuitBreaker, UpstreamClient, request_budget
+
+TMDB_DELAY = 0.3
+
+
+@pytest.fixture(scope="module")
+def stub_server():
+    stub = create_stub_app(tmdb_delay=TMDB_DELAY)
+    port = free_port()
+    server = run_in_thread(stub, port)
+    yield stub, f"http://127.0.0.1:{port}/3"
+    server.should_exit = True
+
+
+def get_providers(base_url: str, timeout: float, budget: float = None, requests: int = 1):
+    """Run requests sequential GETs through one UpstreamClient; returns (breaker, errors)."""
+    breaker = CircuitBreaker("tmdb", failure_threshold=2, reset_seconds=60)
+
+    async def run():
+        errors = []
+        async with httpx.AsyncClient() as http:
+            upstream = UpstreamClient("tmdb", http, breaker, timeout=timeout, retries=0)
+            for _ in range(requests):
+                try:
+                    if budget is None:
+                        await upstream.get(f"{base_url}/tv/66732/watch/providers")
+                    else:
+                        with request_budget(budget):
+                            await upstream.get(f"{base_url}/tv/66732/watch/providers")
+                except httpx.HTTPError as e:
+                    errors.append(e)
+        return errors
+
+    return breaker, asyncio.run(run())
+
+
+def test_short_budget_on_a_healthy_upstream_leaves_the_breaker_closed(stub_server):
+    _, base_url = stub_server
+    breaker, errors = get_providers(base_url, timeout=5, budget=TMDB_DELAY / 3, requests=4)
+    assert len(errors) == 4 and all(isinstance(e, BudgetExhausted) for e in errors)
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_full_timeouts_open_the_breaker(stub_server):
+    _, base_url = stub_server
+    breaker, errors = get_providers(base_url, timeout=TMDB_DELAY / 3, requests=2)
+    assert len(errors) == 2 and not any(isinstance(e, BudgetExhausted) for e in errors)
+    assert breaker.state == "open"
+
+
+def test_budget_with_room_to_spare_succeeds(stub_server):
+    _, base_url = stub_server
+    breaker, errors = get_providers(base_url, timeout=5, budget=5)
+    assert not errors and breaker.state == "closed"
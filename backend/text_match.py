@@ -0,0 +1,213 @@
+"""
+Local OCR text-match stage.
+
+Many screenshots show the title as plain text: the info panel, a "Continue
+Watching" row, the episode overlay. A CPU OCR pass pulls the text lines out
+of the prepared image and a character-trigram index of catalogue titles
+fuzzy-matches them, so a clearly printed title is answered without any
+remote call. Scores are the Dice coefficient of the trigram sets, which
+tolerates the usual OCR slips (dropped letters, l/1, rn/m) while penalising
+a short UI string that merely appears inside a long title.
+
+pytesseract and the tesseract binary are optional: when they are missing
+the stage reports itself as unavailable and recognition falls through to
+the embedding/GPT-4o path.
+"""
+
+import re
+import unicodedata
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from compact_store import CompactStore, is_compact_store
+from telemetry import log
+
+# Lines shorter than this (in letters and digits) are UI noise, not titles
+MIN_QUERY_CHARS = 3
+
+
+def normalize_title(text: str) -> str:
+    """Lowercase, strip accents and punctuation, and collapse whitespace."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    text = text.replace("&", " and ")
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", text).split())
+
+
+def trigrams(normalized: str) -> set:
+    """Character trigrams of a normalised string, padded so word starts and ends count."""
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def read_catalogue_titles(path: str) -> tuple:
+    """
+    (titles, ids, media_types, years) from a compact .snapdb store or a
+    builder/index .npz; years is None when the file doesn't store them.
+    """
+    if is_compact_store(path):
+        store = CompactStore(path)
+        rows = [store.metadata(i) for i in range(len(store))]
+        titles = [row["title"] or "" for row in rows]
+        years = [row["year"] for row in rows]
+        ids, media_types = store.ids, store.media_types()
+    else:
+        with np.load(path) as data:
+            if "titles" not in data:
+                raise KeyError(f"{path} has no titles column; rebuild it with build_netflix_database.py")
+            titles = data["titles"].astype(str).tolist()
+            years = [int(year) if year else None for year in data["years"].astype(str)] \
+                if "years" in data else None
+            ids, media_types = data["ids"], data["media_types"]
+    if not any(titles):
+        raise ValueError(f"{path} has no title text to index")
+    return titles, ids, media_types, years
+
+
+class TitleTrigramIndex:
+    """In-memory trigram index over catalogue titles; postings are CSR arrays of title rows."""
+
+    def __init__(self, titles: list, ids: np.ndarray, media_types: np.ndarray, years: list = None):
+        self.titles = list(titles)
+        self.ids = ids
+        self.media_types = media_types
+        self.years = years if years is not None else [None] * len(self.titles)
+
+        postings = {}
+        self.exact = {}
+        sizes = np.zeros(len(self.titles), dtype=np.int32)
+        for row, title in enumerate(self.titles):
+            key = normalize_title(title)
+            if not key:
+                continue
+            self.exact.setdefault(key, []).append(row)
+            grams = trigrams(key)
+            sizes[row] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(row)
+
+        self.sizes = sizes
+        self.vocabulary = {gram: n for n, gram in enumerate(postings)}
+        self.offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum([len(rows) for rows in postings.values()])
+        self.entries = np.fromiter(
+            (row for rows in postings.values() for row in rows), dtype=np.int32, count=int(self.offsets[-1])
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "TitleTrigramIndex":
+        """Index the titles stored in a compact .snapdb store or a builder/index .npz."""
+        titles, ids, media_types, years = read_catalogue_titles(path)
+        return cls(titles, ids, media_types, years)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def search(self, text: str, k: int = 5) -> list:
+        """The k titles most similar to text as (dice score, title row), best first."""
+        key = normalize_title(text)
+        if sum(char.isalnum() for char in key) < MIN_QUERY_CHARS:
+            return []
+        if key in self.exact:
+            return [(1.0, row) for row in self.exact[key][:k]]
+
+        query = trigrams(key)
+        grams = [self.vocabulary[gram] for gram in query if gram in self.vocabulary]
+        if not grams:
+            return []
+        hits = np.concatenate([self.entries[self.offsets[g]:self.offsets[g + 1]] for g in grams])
+        shared = np.bincount(hits, minlength=len(self.titles))
+        rows = np.flatnonzero(shared)
+        scores = 2 * shared[rows] / (len(query) + self.sizes[rows])
+        if len(rows) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[keep], scores[keep]
+        best = np.argsort(-scores, kind="stable")
+        return [(float(scores[i]), int(rows[i])) for i in best]
+
+    def match_lines(self, lines: list, k: int = 5) -> list:
+        """
+        Fuzzy-match OCR text lines (and adjacent pairs, for titles wrapped
+        over two lines) against the catalogue. Returns up to k candidate
+        dicts, best first, one per title.
+        """
+        queries = list(lines) + [f"{first} {second}" for first, second in zip(lines, lines[1:])]
+        best = {}
+        for text in queries:
+            for score, row in self.search(text, k):
+                if row not in best or score > best[row][0]:
+                    best[row] = (score, text)
+        ranked = sorted(best.items(), key=lambda item: -item[1][0])[:k]
+        return [
+            {
+                "media_id": str(self.ids[row]),
+                "media_type": str(self.media_types[row]),
+                "title": self.titles[row],
+                "year": self.years[row],
+                "similarity": round(score, 4),
+                "text": text,
+            }
+            for row, (score, text) in ranked
+        ]
+
+
+class TesseractOCR:
+    """CPU text-line reader backed by the tesseract binary."""
+
+    def __init__(self, min_confidence: float = 60):
+        import pytesseract
+
+        pytesseract.get_tesseract_version()  # raises if the binary is missing
+        self._tesseract = pytesseract
+        self.min_confidence = min_confidence
+
+    def read_lines(self, image: Image.Image) -> list:
+        """Text lines in reading order, keeping only words tesseract is reasonably sure of."""
+        grey = ImageOps.autocontrast(image.convert("L"))
+        data = self._tesseract.image_to_data(grey, output_type=self._tesseract.Output.DICT)
+        lines = {}
+        for word, confidence, *line in zip(data["text"], data["conf"], data["block_num"],
+                                           data["par_num"], data["line_num"]):
+            if word.strip() and float(confidence) >= self.min_confidence:
+                lines.setdefault(tuple(line), []).append(word.strip())
+        return [" ".join(words) for words in lines.values()]
+
+
+def confident_match(candidates: list, threshold: float, margin: float):
+    """
+    The top candidate if it scores at least threshold and beats the next
+    title by margin (so a remake or a movie/series pair sharing a name is
+    left to the vision model), else None.
+    """
+    if not candidates or candidates[0]["similarity"] < threshold:
+        return None
+    if len(candidates) > 1 and candidates[0]["similarity"] - candidates[1]["similarity"] < margin:
+        return None
+    return candidates[0]
+
+
+def match_screen_text(ocr, index: TitleTrigramIndex, image: Image.Image, k: int = 5) -> list:
+    """OCR a prepared image and return its title candidates (see TitleTrigramIndex.match_lines)."""
+    return index.match_lines(ocr.read_lines(image), k)
+
+
+def load_ocr_stage(path: str, min_confidence: float = 60):
+    """
+    Build (ocr, title index) for the text fast path, or return None with a
+    warning when the title database or the optional OCR engine is unavailable.
+    """
+    try:
+        ocr = TesseractOCR(min_confidence)
+    except (ImportError, OSError) as e:
+        log("warn", "ocr_stage_disabled", reason="pytesseract/tesseract not available", error=str(e))
+        return None
+
+    try:
+        index = TitleTrigramIndex.load(path)
+    except (OSError, KeyError, ValueError) as e:
+        log("warn", "ocr_titles_load_failed", path=path, error=str(e))
+        return None
+
+    log("debug", "ocr_titles_indexed", path=path, titles=len(index))
+    return ocr, index
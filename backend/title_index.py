@@ -0,0 +1,280 @@
+"""
+Local title index: resolve a title the vision model named to a TMDB id
+without a search/multi round trip.
+
+Titles come from the embedding database's metadata (title, year) and/or
+TMDB's daily ID exports (original title, popularity; see
+fetch_tmdb_exports.py), merged per (media_type, id). A lookup tries, in
+order, an exact hash map of normalised titles and alternate titles, a
+"short title" map (leading article and ": subtitle" dropped, so "Mission:
+Impossible - Dead Reckoning" is found as "mission impossible"), and a
+trigram fuzzy match. Candidates are ranked by title similarity, year,
+media type and popularity.
+
+resolve() only answers for an exact title (or alternate title) match; year
+and media type then merely pick between titles sharing that exact name,
+and the pick must be clear, so a remake or a film/series pair without a
+year to tell them apart still goes to TMDB search. Short-title and fuzzy
+hits never answer on their own ("Mission: Impossible - Fallout" is not
+"Dead Reckoning", "The Crown" is not "The Town"); they are passed to
+rank_search_results() as hints instead.
+
+rank_search_results() applies the same ranking to search/multi results
+instead of taking the first one.
+"""
+
+import gzip
+import json
+import os
+import re
+
+import numpy as np
+
+from text_match import TitleTrigramIndex, normalize_title, read_catalogue_titles, trigrams
+from telemetry import log
+
+ARTICLES = ("the ", "a ", "an ")
+SUBTITLE_SEPARATOR = re.compile(r"\s*:\s*|\s+[-–—]\s+")
+
+# Ranking weights: title similarity dominates; year and media type separate same-name titles
+EXACT_SCORE = 1.0
+SHORT_SCORE = 0.9
+YEAR_MATCH = 0.3
+YEAR_NEAR = 0.15  # off by one: TV first-air vs season year, festival vs release year
+YEAR_MISMATCH = -0.3
+TYPE_MATCH = 0.1
+TYPE_MISMATCH = -0.5
+POPULARITY_WEIGHT = 0.1  # at most a tie-break
+HINT_MATCH = 0.05  # a search result the local index also suggested
+
+
+def short_title(title: str) -> str:
+    """Normalised title without a subtitle after ':' or ' - ' and without a leading article."""
+    key = normalize_title(SUBTITLE_SEPARATOR.split(title, maxsplit=1)[0])
+    for article in ARTICLES:
+        if key.startswith(article):
+            return key[len(article):]
+    return key
+
+
+def title_similarity(query: str, title: str) -> float:
+    """EXACT_SCORE, SHORT_SCORE, or the trigram Dice coefficient of the normalised titles."""
+    key, other = normalize_title(query), normalize_title(title)
+    if not key or not other:
+        return 0.0
+    if key == other:
+        return EXACT_SCORE
+    if short_title(query) == short_title(title):
+        return SHORT_SCORE
+    a, b = trigrams(key), trigrams(other)
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def rank_score(title_score: float, candidate_year, candidate_type: str, popularity: float,
+               year=None, media_type: str = None) -> float:
+    score = title_score
+    if year and candidate_year:
+        gap = abs(int(year) - int(candidate_year))
+        score += YEAR_MATCH if gap == 0 else YEAR_NEAR if gap == 1 else YEAR_MISMATCH
+    if media_type in ("movie", "tv"):
+        score += TYPE_MATCH if candidate_type == media_type else TYPE_MISMATCH
+    if popularity:
+        score += POPULARITY_WEIGHT * popularity / (popularity + 10.0)
+    return score
+
+
+def release_year(result: dict):
+    date = result.get("release_date") or result.get("first_air_date") or ""
+    return int(date[:4]) if date[:4].isdigit() else None
+
+
+def rank_search_results(results: list, title: str, year=None, media_type: str = None, hints=()) -> list:
+    """
+    TMDB search/multi results (movies and shows only), best match first.
+    hints is a collection of (media_type, media_id) the local index
+    suggested; those results get a tie-break bonus.
+    """
+    scored = []
+    for result in results:
+        if result.get("media_type") not in ("movie", "tv"):
+            continue
+        names = [result.get("title"), result.get("name"), result.get("original_title"), result.get("original_name")]
+        similarity = max(title_similarity(title, name) for name in names if name) if any(names) else 0.0
+        score = rank_score(similarity, release_year(result), result["media_type"],
+                           result.get("popularity") or 0.0, year, media_type)
+        if (result["media_type"], str(result.get("id"))) in hints:
+            score += HINT_MATCH
+        scored.append((score, result))
+    scored.sort(key=lambda item: -item[0])
+    return [result for _, result in scored]
+
+
+def read_tmdb_export(path: str, min_popularity: float = 0.0):
+    """
+    Yield (media_type, id, original title, popularity) from a TMDB daily ID
+    export (movie_ids_*.json.gz / tv_series_ids_*.json.gz, one JSON object
+    per line), skipping adult titles and those below min_popularity.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("adult") or (entry.get("popularity") or 0.0) < min_popularity:
+                continue
+            if "original_title" in entry:
+                yield "movie", str(entry["id"]), entry["original_title"], entry.get("popularity") or 0.0
+            elif "original_name" in entry:
+                yield "tv", str(entry["id"]), entry["original_name"], entry.get("popularity") or 0.0
+
+
+def is_tmdb_export(path: str) -> bool:
+    return path.endswith((".json.gz", ".json", ".jsonl"))
+
+
+class TitleIndex:
+    """Hash maps and a trigram index over catalogue titles; see the module docstring."""
+
+    def __init__(self, entries: list):
+        """entries: dicts with media_id, media_type, title, year, popularity and alternates (list of str)."""
+        self.media_ids = [entry["media_id"] for entry in entries]
+        self.media_types = [entry["media_type"] for entry in entries]
+        self.titles = [entry["title"] for entry in entries]
+        self.years = [entry.get("year") for entry in entries]
+        self.popularity = [entry.get("popularity") or 0.0 for entry in entries]
+
+        self.exact = {}
+        self.short = {}
+        names, owners = [], []
+        for row, entry in enumerate(entries):
+            for name in dict.fromkeys([entry["title"], *entry.get("alternates", ())]):
+                if not name:
+                    continue
+                key = normalize_title(name)
+                if not key:
+                    continue
+                self.exact.setdefault(key, set()).add(row)
+                self.short.setdefault(short_title(name), set()).add(row)
+                names.append(name)
+                owners.append(row)
+        self.owners = np.array(owners, dtype=np.int64)
+        self.fuzzy = TitleTrigramIndex(names, self.owners, np.array([self.media_types[row] for row in owners]))
+
+    @classmethod
+    def load(cls, paths: list, min_popularity: float = 0.0) -> "TitleIndex":
+        """
+        Merge titles from embedding databases (.snapdb/.npz: title and year)
+        and TMDB ID exports (.json.gz: original title and popularity). A title
+        present in both keeps the database title and year, gains the export's
+        popularity, and has the original title as an alternate.
+        """
+        merged = {}
+        for path in paths:
+            if is_tmdb_export(path):
+                for media_type, media_id, title, popularity in read_tmdb_export(path, min_popularity):
+                    entry = merged.setdefault((media_type, media_id), {
+                        "media_id": media_id, "media_type": media_type, "title": title, "alternates": []
+                    })
+                    entry["popularity"] = popularity
+                    if title != entry["title"]:
+                        entry["alternates"].append(title)
+            else:
+                titles, ids, media_types, years = read_catalogue_titles(path)
+                for row, title in enumerate(titles):
+                    if not title:
+                        continue
+                    key = (str(media_types[row]), str(ids[row]))
+                    entry = merged.setdefault(key, {"media_id": key[1], "media_type": key[0], "alternates": []})
+                    if entry.get("title") and entry["title"] != title:
+                        entry["alternates"].append(entry["title"])
+                    entry["title"] = title
+                    entry["year"] = years[row] if years is not None else None
+        if not merged:
+            raise ValueError(f"No titles found in {', '.join(paths)}")
+        return cls(list(merged.values()))
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _candidate(self, row: int, match: str, title_score: float, year, media_type) -> dict:
+        return {
+            "media_id": self.media_ids[row],
+            "media_type": self.media_types[row],
+            "title": self.titles[row],
+            "year": self.years[row],
+            "popularity": self.popularity[row],
+            "match": match,
+            "title_score": round(title_score, 4),
+            "score": round(rank_score(title_score, self.years[row], self.media_types[row],
+                                      self.popularity[row], year, media_type), 4),
+        }
+
+    def lookup(self, title: str, year=None, media_type: str = None, k: int = 5,
+               min_similarity: float = 0.6) -> list:
+        """
+        Up to k candidates for a title, best first. Exact and short-title
+        hits are used when there are any; otherwise fuzzy matches scoring at
+        least min_similarity.
+        """
+        key = normalize_title(title)
+        if not key:
+            return []
+        rows = self.exact.get(key)
+        match, title_score = "exact", EXACT_SCORE
+        if not rows:
+            rows = self.short.get(short_title(title))
+            match, title_score = "short", SHORT_SCORE
+        if rows:
+            candidates = [self._candidate(row, match, title_score, year, media_type) for row in rows]
+        else:
+            best = {}
+            for score, name_row in self.fuzzy.search(title, 4 * k):
+                row = int(self.owners[name_row])
+                if score >= min_similarity and score > best.get(row, 0.0):
+                    best[row] = score
+            candidates = [self._candidate(row, "fuzzy", score, year, media_type) for row, score in best.items()]
+        candidates.sort(key=lambda candidate: -candidate["score"])
+        return candidates[:k]
+
+    def resolve(self, title: str, year=None, media_type: str = None, min_score: float = 0.9,
+                margin: float = 0.1):
+        """The lookup() candidate the title names unambiguously (see choose()), else None."""
+        return self.choose(self.lookup(title, year, media_type), year, media_type, min_score, margin)
+
+    @staticmethod
+    def choose(candidates: list, year=None, media_type: str = None, min_score: float = 0.9,
+               margin: float = 0.1):
+        """
+        The best of lookup()'s candidates if it is an exact match with a
+        title_score of at least min_score, leads the next exact match by
+        margin, and doesn't contradict the given year or media type; else None.
+        """
+        exact = [c for c in candidates if c["match"] == "exact" and c["title_score"] >= min_score]
+        if not exact:
+            return None
+        best = exact[0]
+        if len(exact) > 1 and best["score"] - exact[1]["score"] < margin:
+            return None
+        if media_type in ("movie", "tv") and best["media_type"] != media_type:
+            return None
+        if year and best["year"] and abs(int(year) - int(best["year"])) > 1:
+            return None
+        return best
+
+
+def load_title_index(paths: list, min_popularity: float = 0.0):
+    """Build the TitleIndex, or return None with a warning when none of the sources can be read."""
+    readable = [path for path in paths if os.path.exists(path)]
+    missing = sorted(set(paths) - set(readable))
+    if missing:
+        log("warn", "title_index_sources_missing", paths=missing)
+    if not readable:
+        return None
+    try:
+        index = TitleIndex.load(readable, min_popularity)
+    except (OSError, KeyError, ValueError) as e:
+        log("warn", "title_index_load_failed", paths=readable, error=str(e))
+        return None
+    log("debug", "title_index_loaded", paths=readable, titles=len(index))
+    return index
@@ -0,0 +1,165 @@
+"""
+Two-tier cache for TMDB JSON responses.
+
+Tier 1 is an in-process LRU; tier 2 is a SQLite file shared by every worker
+on the host and kept across restarts. Concurrent misses for the same key are
+coalesced into a single upstream call (single-flight), so a popular premiere
+resolved by hundreds of users at once costs one TMDB request.
+
+Expired entries are kept for max_stale_seconds more: when a refresh fails
+(TMDB down, circuit breaker open), the last good value is served instead
+of an error.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(path: str, params: dict = None) -> str:
+    """Stable cache key for a TMDB path and its query parameters (minus the API key)."""
+    params = {k: v for k, v in (params or {}).items() if k != "api_key" and v is not None}
+    query = "&".join(f"{k}={params[k]}" for k in sorted(params))
+    return f"{path}?{query}" if query else path
+
+
+class TMDBCache:
+    """In-memory LRU in front of a SQLite store, with per-call TTLs, single-flight and stale-on-error."""
+
+    def __init__(self, db_path: str, memory_size: int = 2048, max_stale_seconds: float = 0.0):
+        self.memory_size = memory_size
+        self.max_stale_seconds = max_stale_seconds
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._in_flight = {}          # key -> asyncio.Task loading it
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tmdb_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute("DELETE FROM tmdb_cache WHERE expires_at < ?", (time.time() - max_stale_seconds,))
+        self._db.commit()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale_served = 0
+
+    def _memory_get(self, key: str, now: float):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if entry[0] < now:
+            # Past its TTL; keep it around as a stale fallback while that is allowed
+            if entry[0] + self.max_stale_seconds < now:
+                del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return entry
+
+    def _memory_put(self, key: str, expires_at: float, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str, now: float):
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM tmdb_cache WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[1], json.loads(row[0])
+
+    def _stale_get(self, key: str, now: float):
+        """The expired-but-recent value for key, or None."""
+        entry = self._memory.get(key)
+        if entry is not None and entry[0] + self.max_stale_seconds >= now:
+            return entry[1]
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value FROM tmdb_cache WHERE key = ? AND expires_at >= ?", (key, now - self.max_stale_seconds)
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def _disk_put(self, key: str, expires_at: float, value):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO tmdb_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at)
+            )
+            self._db.commit()
+
+    async def get_or_fetch(self, key: str, ttl_seconds: float, fetch):
+        """
+        Return the cached value for key, or await fetch() once and cache it.
+        Exceptions from fetch() are not cached; they propagate to every waiter
+        unless a stale value within max_stale_seconds can be served instead.
+        The load runs in its own task, so a waiter that is cancelled (the one
+        that started it included) doesn't cancel it for the others.
+        """
+        now = time.time()
+        entry = self._memory_get(key, now)
+        if entry is not None:
+            self.memory_hits += 1
+            return entry[1]
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+        else:
+            in_flight = asyncio.ensure_future(self._load(key, now, ttl_seconds, fetch))
+            self._in_flight[key] = in_flight
+            in_flight.add_done_callback(lambda task: self._load_done(key, task))
+        return await asyncio.shield(in_flight)
+
+    def _load_done(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark retrieved so a failure nobody is still waiting for isn't logged as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    async def _load(self, key: str, now: float, ttl_seconds: float, fetch):
+        entry = await asyncio.to_thread(self._disk_get, key, now)
+        if entry is not None:
+            self.disk_hits += 1
+            self._memory_put(key, *entry)
+            return entry[1]
+
+        self.misses += 1
+        try:
+            value = await fetch()
+        except Exception:
+            stale = await asyncio.to_thread(self._stale_get, key, now) if self.max_stale_seconds > 0 else None
+            if stale is None:
+                raise
+            self.stale_served += 1
+            return stale
+        expires_at = time.time() + ttl_seconds
+        self._memory_put(key, expires_at, value)
+        await asyncio.to_thread(self._disk_put, key, expires_at, value)
+        return value
+
+    def close(self):
+        with self._db_lock:
+            self._db.close()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses + self.coalesced
+        return {
+            "memory_size": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "stale_served": self.stale_served,
+            "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,295 @@
+"""
+Tail-latency controls for calls to upstream APIs (TMDB, OpenAI).
+
+- request_budget(seconds) sets an overall deadline for everything the
+  current request does upstream; call_timeout() turns it into the timeout
+  for the next call, so a slow early call leaves less time for later ones
+  instead of adding to the total.
+- CircuitBreaker fails fast after repeated upstream failures and lets one
+  probe through after a cool-down.
+- UpstreamClient.get() is a GET over the shared keep-alive pool with
+  jittered exponential-backoff retries (GETs are idempotent), an optional
+  hedged second request once the first has run past the upstream's
+  rolling p95, and the breaker.
+- retry_within_budget() is the same retry loop for SDK calls (OpenAI);
+  the SDK's own retries would reuse the full timeout on every try and
+  overrun the request budget, so those clients run with max_retries=0.
+
+Budget and breaker failures are raised as httpx.HTTPError subclasses, so
+existing "except httpx.HTTPError" handling (and the TMDB cache's
+stale-on-error fallback) covers them. A timeout the budget cut short is
+raised as BudgetExhausted too and, like it, never counts against the
+breaker: a request running out of time says nothing about the upstream.
+"""
+
+import asyncio
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+import httpx
+
+from stage_stats import StageStats
+from telemetry import log, registry
+
+# Absolute time.monotonic() deadline of the current request, if it has a budget
+_deadline = contextvars.ContextVar("snapnsee_upstream_deadline", default=None)
+
+retries_total = registry.counter("snapnsee_upstream_retries_total", "Upstream calls retried after a failure")
+hedges_total = registry.counter("snapnsee_upstream_hedges_total", "Hedged upstream requests, by which one won")
+breaker_rejections = registry.counter("snapnsee_upstream_breaker_rejections_total",
+                                      "Upstream calls refused because the circuit breaker was open")
+
+# Statuses worth another try; anything else is the upstream's final answer
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(httpx.HTTPError):
+    """The upstream's breaker is open; the call was not attempted."""
+
+
+class BudgetExhausted(httpx.TimeoutException):
+    """The request's upstream budget ran out before (or during) the call."""
+
+    def __init__(self, message: str = "Upstream request budget exhausted"):
+        super().__init__(message)
+
+
+@contextmanager
+def request_budget(seconds: float):
+    """Give every upstream call made inside the block (and tasks it starts) a shared deadline."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget():
+    """Seconds left in the current request's budget, or None when it has none."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def call_timeout(default: float) -> float:
+    """Timeout for the next upstream call: default, capped by what is left of the budget."""
+    remaining = remaining_budget()
+    if remaining is None:
+        return default
+    if remaining <= 0:
+        raise BudgetExhausted()
+    return min(default, remaining)
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures; while open every
+    call is refused for reset_seconds, then a single probe is let through
+    (half-open). The probe's success closes the breaker, a failure re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        if self.state == CLOSED or self.failure_threshold <= 0:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = HALF_OPEN
+            return True
+        breaker_rejections.inc(upstream=self.name)
+        return False
+
+    def check(self):
+        """Raise CircuitOpen unless a call may go ahead."""
+        if not self.allow():
+            raise CircuitOpen(f"{self.name} circuit breaker is open")
+
+    def record_success(self):
+        if self.state != CLOSED:
+            log("info", "circuit_closed", upstream=self.name)
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold > 0):
+            if self.state == CLOSED:
+                self.trips += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            log("warn", "circuit_opened", upstream=self.name, failures=self.failures)
+
+    async def call(self, make_call, outage_errors: tuple = (Exception,)):
+        """
+        Await make_call() if the breaker allows it. outage_errors count as
+        failures; any other exception means the upstream answered, so it
+        counts as a success before propagating.
+        """
+        self.check()
+        try:
+            result = await make_call()
+        except (asyncio.CancelledError, BudgetExhausted):
+            # Neither says anything about the upstream's health
+            self.abandon_probe()
+            raise
+        except outage_errors:
+            self.record_failure()
+            raise
+        except Exception:
+            self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def abandon_probe(self):
+        """A half-open probe was cancelled before it could tell; let the next call probe instead."""
+        if self.state == HALF_OPEN:
+            self.state = OPEN
+            self.opened_at = time.monotonic() - self.reset_seconds
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips}
+
+
+async def retry_within_budget(name: str, make_call, retryable: tuple, retries: int, backoff_seconds: float = 0.1):
+    """
+    Await make_call(), retrying up to retries times on retryable errors with
+    jittered exponential backoff while the request budget leaves room for
+    the pause. make_call should take its timeout from call_timeout() so
+    each attempt only gets what is left of the budget.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await make_call()
+        except retryable as e:
+            pause = random.uniform(0, backoff_seconds * 2 ** attempt)
+            remaining = remaining_budget()
+            if attempt >= retries or (remaining is not None and remaining <= pause):
+                raise
+            attempt += 1
+            retries_total.inc(upstream=name)
+            log("debug", "upstream_retry", upstream=name, attempt=attempt, error=str(e) or type(e).__name__)
+            await asyncio.sleep(pause)
+
+
+class UpstreamClient:
+    """GETs against one upstream with retries, hedging and a circuit breaker; see the module docstring."""
+
+    def __init__(self, name: str, http: httpx.AsyncClient, breaker: CircuitBreaker, timeout: float = 10.0,
+                 retries: int = 2, backoff_seconds: float = 0.1, hedge: bool = False,
+                 hedge_min_ms: float = 50.0, hedge_min_samples: int = 20):
+        self.name = name
+        self.http = http
+        self.breaker = breaker
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.hedge = hedge
+        self.hedge_min_ms = hedge_min_ms
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = StageStats()
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging: the rolling p95, once there is enough history; else None."""
+        if not self.hedge or self.latency.calls < self.hedge_min_samples:
+            return None
+        return max(self.latency.percentile(0.95), self.hedge_min_ms) / 1000
+
+    async def _attempt(self, url: str, params: dict) -> httpx.Response:
+        started = time.perf_counter()
+        timeout = call_timeout(self.timeout)
+        try:
+            response = await self.http.get(url, params=params, timeout=timeout)
+        except httpx.TimeoutException as e:
+            if timeout < self.timeout:
+                # Cut short by the request budget, not a slow upstream: keep it away from the breaker
+                raise BudgetExhausted() from e
+            raise
+        self.latency.record((time.perf_counter() - started) * 1000, response.status_code < 400)
+        return response
+
+    async def _hedged(self, url: str, params: dict) -> httpx.Response:
+        """One attempt, plus a second identical one if the first outlives the p95; the first to answer wins."""
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._attempt(url, params)
+
+        tasks = [asyncio.ensure_future(self._attempt(url, params))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                tasks.append(asyncio.ensure_future(self._attempt(url, params)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1:
+                            hedges_total.inc(upstream=self.name, winner="hedge" if task is tasks[1] else "original")
+                        return task.result()
+            # Every attempt failed: surface the original's error
+            return tasks[0].result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get(self, url: str, params: dict = None) -> httpx.Response:
+        """
+        GET url and return the successful response. Raises
+        httpx.HTTPStatusError for a final 4xx/5xx, CircuitOpen while the
+        breaker is open, and BudgetExhausted when the request budget runs out.
+        """
+        self.breaker.check()
+        try:
+            return await self._get_with_retries(url, params)
+        except asyncio.CancelledError:
+            self.breaker.abandon_probe()
+            raise
+
+    async def _get_with_retries(self, url: str, params: dict) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                response = await self._hedged(url, params)
+                if response.status_code not in RETRYABLE_STATUSES:
+                    # A 404 is an answer, not an outage
+                    self.breaker.record_success()
+                    response.raise_for_status()
+                    return response
+                response.raise_for_status()
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code not in RETRYABLE_STATUSES:
+                    raise
+                if isinstance(e, BudgetExhausted):
+                    # This request ran out of time before asking; says nothing about the upstream's health
+                    raise
+                pause = random.uniform(0, self.backoff_seconds * 2 ** attempt)
+                remaining = remaining_budget()
+                if attempt >= self.retries or (remaining is not None and remaining <= pause):
+                    self.breaker.record_failure()
+                    raise
+                attempt += 1
+                retries_total.inc(upstream=self.name)
+                log("debug", "upstream_retry", upstream=self.name, attempt=attempt, error=str(e) or type(e).__name__)
+                await asyncio.sleep(pause)
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.stats(),
+            "p50_ms": self.latency.percentile(0.50),
+            "p95_ms": self.latency.percentile(0.95),
+            "hedge_after_ms": round(self.hedge_delay() * 1000, 2) if self.hedge_delay() is not None else None,
+        }
@@ -0,0 +1,280 @@
+"""
+Pluggable vector index backends for the embedding database.
+
+Both backends score L2-normalised vectors by inner product (cosine
+similarity) and share the same API:
+
+    index = IVFIndex.build(embeddings, nlist=1024)
+    scores, positions = index.search(queries, k=10)
+    save_index("catalogue.npz", index, ids, media_types)
+    index, ids, media_types = load_index("catalogue.npz")
+
+FlatIndex is exact brute force and is the right choice up to a few tens of
+thousands of vectors. IVFIndex clusters the vectors with spherical k-means
+and only scores the nprobe closest clusters per query, trading a little
+recall for much lower latency on large catalogues.
+
+Saved indexes are ordinary .npz files with an index_kind entry; the legacy
+movie_embeddings.npz (no index_kind) loads as a FlatIndex. Large matrices
+are unpacked once into .npy sidecars and memory-mapped.
+
+With multi-view databases the index rows are views (poster, backdrops,
+logo) rather than titles; pool_views/pool_candidates fold view scores back
+into per-title scores.
+"""
+
+import os
+
+import numpy as np
+
+
+def top_k(scores: np.ndarray, k: int):
+    """Row-wise top-k of a 2-D score matrix, best first."""
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    return np.take_along_axis(part_scores, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+def _as_queries(queries: np.ndarray) -> np.ndarray:
+    return np.atleast_2d(np.asarray(queries, dtype=np.float32))
+
+
+class FlatIndex:
+    """Exact inner-product search over the full matrix."""
+
+    kind = "flat"
+
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = embeddings
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray) -> "FlatIndex":
+        return cls(np.ascontiguousarray(embeddings, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Score every row: an (n_queries, len(self)) matrix."""
+        return _as_queries(queries) @ self.embeddings.T
+
+    def search(self, queries: np.ndarray, k: int = 10):
+        """Return (scores, positions), each shaped (n_queries, k)."""
+        return top_k(self.scores(queries), k)
+
+    def arrays(self) -> dict:
+        return {"embeddings": self.embeddings}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> "FlatIndex":
+        return cls(arrays["embeddings"])
+
+
+class IVFIndex:
+    """Inverted-file index: vectors are bucketed by nearest k-means centroid."""
+
+    kind = "ivf"
+
+    def __init__(self, centroids: np.ndarray, vectors: np.ndarray, positions: np.ndarray,
+                 offsets: np.ndarray, nprobe: int = 8):
+        self.centroids = centroids
+        self.vectors = vectors      # rows grouped by list
+        self.positions = positions  # original row index of each grouped vector
+        self.offsets = offsets      # list i spans vectors[offsets[i]:offsets[i + 1]]
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, nlist: int = None, nprobe: int = 8,
+              iterations: int = 10, train_size: int = 65536, seed: int = 0) -> "IVFIndex":
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        n = len(embeddings)
+        nlist = min(nlist or max(1, int(4 * np.sqrt(n))), n)
+        rng = np.random.default_rng(seed)
+
+        train = embeddings[rng.choice(n, size=min(n, max(train_size, nlist)), replace=False)]
+        centroids = train[rng.choice(len(train), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assign = cls._assign(train, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train)
+            counts = np.bincount(assign, minlength=nlist)
+
+            # Re-seed empty clusters from random training points
+            empty = counts == 0
+            sums[empty] = train[rng.choice(len(train), size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+
+        assign = cls._assign(embeddings, centroids)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+        return cls(centroids.astype(np.float32), embeddings[order], order.astype(np.int64),
+                   offsets.astype(np.int64), nprobe)
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 16384) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+            for start in range(0, len(vectors), chunk)
+        ])
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, queries: np.ndarray, k: int = 10, nprobe: int = None):
+        """Return (scores, positions), each shaped (n_queries, k); short rows are padded with -inf/-1."""
+        queries = _as_queries(queries)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        _, probe_lists = top_k(queries @ self.centroids.T, nprobe)
+
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_positions = np.full((len(queries), k), -1, dtype=np.int64)
+
+        for row, (query, lists) in enumerate(zip(queries, probe_lists)):
+            candidates = np.concatenate([
+                np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists
+            ])
+            if len(candidates) == 0:
+                continue
+            scores, picked = top_k((self.vectors[candidates] @ query)[None, :], k)
+            all_scores[row, :scores.shape[1]] = scores[0]
+            all_positions[row, :scores.shape[1]] = self.positions[candidates[picked[0]]]
+
+        return all_scores, all_positions
+
+    def arrays(self) -> dict:
+        return {
+            "centroids": self.centroids,
+            "vectors": self.vectors,
+            "positions": self.positions,
+            "offsets": self.offsets,
+            "nprobe": np.array(self.nprobe),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> "IVFIndex":
+        return cls(arrays["centroids"], arrays["vectors"], arrays["positions"],
+                   arrays["offsets"], int(arrays["nprobe"]))
+
+
+class QuantizedFlatIndex:
+    """
+    Exact inner-product search over a float16 or int8 matrix, typically
+    memory-mapped from a compact store (see compact_store.py). int8 rows carry
+    a per-row float32 scale. Rows are widened to float32 a small block at a
+    time into a reused buffer, so the float32 copy of the whole matrix never
+    exists and the block stays in cache for the matmul.
+    """
+
+    kind = "quantized"
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray = None, block_rows: int = 512):
+        self.codes = codes
+        self.scales = scales
+        self.block_rows = block_rows
+
+    def __len__(self):
+        return len(self.codes)
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Score every row: an (n_queries, len(self)) matrix."""
+        queries = _as_queries(queries)
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        buffer = np.empty((self.block_rows, self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(self.codes), self.block_rows):
+            block = self.codes[start:start + self.block_rows]
+            widened = buffer[:len(block)]
+            np.copyto(widened, block, casting="unsafe")
+            np.matmul(queries, widened.T, out=scores[:, start:start + len(block)])
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def search(self, queries: np.ndarray, k: int = 10):
+        """Return (scores, positions), each shaped (n_queries, k)."""
+        return top_k(self.scores(queries), k)
+
+
+POOLING_MODES = ("max", "mean")
+
+
+def pool_views(scores: np.ndarray, starts: np.ndarray, mode: str = "max") -> np.ndarray:
+    """
+    Collapse per-view scores to per-title scores. Views are stored contiguously
+    per title, so title t owns columns starts[t]:starts[t + 1] and a single
+    reduceat pools the whole (n_queries, n_views) matrix at once.
+    """
+    if mode == "max":
+        return np.maximum.reduceat(scores, starts, axis=1)
+    if mode == "mean":
+        counts = np.diff(np.append(starts, scores.shape[1]))
+        return np.add.reduceat(scores, starts, axis=1) / counts
+    raise ValueError(f"Unknown pooling mode {mode!r}; expected one of {POOLING_MODES}")
+
+
+def pool_candidates(scores: np.ndarray, positions: np.ndarray, owners: np.ndarray, n_titles: int) -> np.ndarray:
+    """
+    Max-pool the top views an approximate index returned into an
+    (n_queries, n_titles) matrix; titles with no returned view score -inf.
+    """
+    pooled = np.full((len(scores), n_titles), -np.inf, dtype=np.float32)
+    found = positions >= 0
+    rows = np.broadcast_to(np.arange(len(scores))[:, None], positions.shape)
+    np.maximum.at(pooled, (rows[found], owners[positions[found]]), scores[found])
+    return pooled
+
+
+# Backends that round-trip through save_index/load_index
+INDEX_BACKENDS = {backend.kind: backend for backend in (FlatIndex, IVFIndex)}
+
+# Arrays big enough to be worth memory-mapping rather than loading per worker
+_MMAP_KEYS = ("embeddings", "vectors")
+
+
+# Per-title and per-view columns stored next to the index arrays
+_METADATA_KEYS = ("index_kind", "version", "ids", "media_types", "titles", "years", "poster_paths",
+                  "views", "view_owners", "view_kinds")
+
+
+def save_index(path: str, index, ids, media_types, **columns):
+    """Write an index plus its id/media_type (and any extra metadata) columns to a single .npz file."""
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, index_kind=np.array(index.kind), ids=np.asarray(ids),
+             media_types=np.asarray(media_types), **columns, **index.arrays())
+    os.replace(tmp_path, path)
+
+
+def _mmap_sidecar(path: str, key: str, data) -> np.ndarray:
+    sidecar = f"{os.path.splitext(path)[0]}.{key}.npy"
+    if not os.path.exists(sidecar) or os.path.getmtime(sidecar) < os.path.getmtime(path):
+        # Per-process temp name: several workers may regenerate the sidecar at once
+        tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as handle:
+            np.save(handle, np.ascontiguousarray(data[key], dtype=np.float32))
+        os.replace(tmp_path, sidecar)
+    return np.load(sidecar, mmap_mode="r")
+
+
+def load_index(path: str, mmap: bool = True):
+    """Load (index, ids, media_types) from a file written by save_index or a builder script."""
+    with np.load(path) as data:
+        if "media_types" not in data:
+            raise ValueError(f"{path} has no media_types array; rebuild it with build_netflix_database.py")
+
+        kind = str(data["index_kind"]) if "index_kind" in data else FlatIndex.kind
+        if kind not in INDEX_BACKENDS:
+            raise ValueError(f"{path} uses unknown index kind {kind!r}")
+
+        arrays = {}
+        for key in data.files:
+            if key in _METADATA_KEYS:
+                continue
+            arrays[key] = _mmap_sidecar(path, key, data) if mmap and key in _MMAP_KEYS else data[key]
+
+        ids = data["ids"].astype(str)
+        media_types = data["media_types"].astype(str)
+
+    return INDEX_BACKENDS[kind].from_arrays(arrays), ids, media_types
@@ -4,5 +4,6 @@ struct Config {
     // Railway production API URL
     static let API_BASE_URL = "https://snapnsee-production.up.railway.app"
 
-    static let API_RECOGNIZE_ENDPOINT = "\(API_BASE_URL)/api/v1/recognize"
+    // fields=compact: only what Models.swift decodes, not the full TMDB details
+    static let API_RECOGNIZE_ENDPOINT = "\(API_BASE_URL)/api/v1/recognize?fields=compact"
 }